@@ -1,1807 +1,2969 @@
-
-def draw_boss_healthbar(surf, x, y, w, h, hp, hp_max):
-    # transparent background
-    bg = pygame.Surface((w, h), pygame.SRCALPHA)
-    bg.fill((0,0,0,120))
-    surf.blit(bg, (x, y))
-    # hp bar
-    fill = int((hp/hp_max) * (w-4))
-    pygame.draw.rect(surf, RED, (x+2, y+2, fill, h-4))
-    pygame.draw.rect(surf, WHITE, (x, y, w, h), 2)
-
-"""
-Alien Invaders The Sequel to The Prequel to The Original Sequel Continuation Remastered Enhanced Edition (with hit-flash + knockback)
-- Keeps mouse-drag + keyboard movement (unchanged from your request)
-- Shield pickup gives 3 hits
-- Prevents enemies spawning on top of the player (uses player position when spawning)
-- Repositions dynamic enemies that fly off-screen to the top instead of deleting them
-- Collision removed fuck that shit
-- Clean, ready-to-run single-file script
-
-Run: python alien_invaders_fixed_knockback.py
-Requires: pygame (pip install pygame)
-"""
-
-import pygame
-import random
-import math
-import sys
-import time
-
-# --------------------
-# Configuration
-# --------------------
-WIDTH, HEIGHT = 880, 720
-FPS = 60
-
-# Player
-PLAYER_START_X = WIDTH // 2
-PLAYER_Y = HEIGHT - 70
-PLAYER_RADIUS = 18
-PLAYER_BASE_HP = 6
-PLAYER_BASE_FIRE_DELAY_MS = 220
-PLAYER_SPEED = 260
-
-# Bullets
-PLAYER_BULLET_SPEED = -10
-ENEMY_BULLET_SPEED_BASE = 3.0
-
-# Buffs
-BUFF_CHANCE = 0.18
-BUFF_DURATION_MS = 5000
-
-# Shield duration (ms)
-SHIELD_DURATION_MS = 5000
-
-# Ultimate
-ULTIMATE_DURATION_MS = 8000
-ULTIMATE_FIRE_DELAY_MS = 180
-
-# Waves
-ENEMIES_PER_ROW = 10
-BOSS_EVERY = 5
-ENEMY_DROP = 24
-
-# Shop prices
-SHOP_FIRE_RATE_PRICE = 800
-SHOP_MAX_HP_PRICE = 1000
-SHOP_SPEED_PRICE = 700
-
-# Particles
-PARTICLE_COUNT = 14
-
-# Knockback (light = 15 px as requested)
-KNOCKBACK_PIXELS = 15
-
-# Colors
-WHITE = (255,255,255)
-BLACK = (10,10,18)
-RED = (230,60,60)
-GREEN = (80,230,120)
-YELLOW = (255,220,50)
-CYAN = (80,200,235)
-ORANGE = (255,150,60)
-GRAY = (120,120,140)
-SHIELD_BLUE = (90,180,240)
-
-FONT_NAME = "Consolas"
-
-# --------------------
-# Utility
-# --------------------
-def clamp(v, a, b):
-    return max(a, min(b, v))
-
-# --------------------
-# Background (stars & planets)
-# --------------------
-class Star:
-    def __init__(self, w, h):
-        self.x = random.uniform(0, w)
-        self.y = random.uniform(0, h)
-        self.speed = random.uniform(0.6, 2.2)
-        self.size = random.randint(1, 3)
-        self.phase = random.uniform(0, math.pi*2)
-
-    def update(self, dt, h):
-        self.y += self.speed * dt
-        self.phase += dt * 0.1
-        if self.y > h:
-            self.y = -2
-            self.x = random.uniform(0, WIDTH)
-
-    def draw(self, surf):
-        alpha = 150 + int(100 * math.sin(self.phase))
-        color = (alpha, alpha, alpha)
-        pygame.draw.circle(surf, color, (int(self.x), int(self.y)), self.size)
-
-class Planet:
-    def __init__(self, w, h):
-        self.x = random.uniform(80, w - 80)
-        self.y = random.uniform(-2000, -300)
-        self.speed = random.uniform(0.02, 0.12)
-        self.size = random.randint(40, 120)
-        self.color = (
-            random.randint(80, 230),
-            random.randint(80, 230),
-            random.randint(80, 230)
-        )
-        self.angle = random.uniform(0, math.pi*2)
-        self.spin = random.uniform(-0.6, 0.6)
-
-    def update(self, dt, h):
-        self.y += self.speed * dt
-        self.angle += self.spin * dt * 0.02
-        if self.y > h + 200:
-            self.x = random.uniform(80, WIDTH - 80)
-            self.y = random.uniform(-1200, -300)
-            self.speed = random.uniform(0.02, 0.12)
-            self.size = random.randint(40, 120)
-            self.color = (
-                random.randint(80, 230),
-                random.randint(80, 230),
-                random.randint(80, 230)
-            )
-
-    def draw(self, surf):
-        cx = int(self.x); cy = int(self.y)
-        pygame.draw.circle(surf, self.color, (cx, cy), self.size)
-        highlight_color = (min(255, self.color[0]+30), min(255, self.color[1]+30), min(255, self.color[2]+30))
-        hx = cx + int(self.size * 0.25 * math.cos(self.angle))
-        hy = cy - int(self.size * 0.25 * math.sin(self.angle))
-        pygame.draw.circle(surf, highlight_color, (hx, hy), int(self.size * 0.22))
-
-stars = [Star(WIDTH, HEIGHT) for _ in range(140)]
-planets = [Planet(WIDTH, HEIGHT) for _ in range(3)]
-
-# --------------------
-# Visual globe for menu
-# --------------------
-def draw_spinning_globe(surf, cx, cy, radius, angle):
-    pygame.draw.circle(surf, (12,60,110), (cx, cy), radius)
-    pygame.draw.circle(surf, (24,120,200), (cx, cy), radius, 2)
-    rect = pygame.Rect(cx - radius, cy - radius, radius*2, radius*2)
-    for i in range(6):
-        a = angle + i * 0.9
-        pygame.draw.arc(surf, (80,170,220), rect, a, a + math.pi, 2)
-    for j in range(-2,3):
-        w = 2 if j==0 else 1
-        ry = int(cy + j * (radius * 0.35))
-        pygame.draw.ellipse(surf, (80,160,200), (cx - int(radius*0.85), ry - 6, int(radius*1.7), 12), w)
-    for k in range(12):
-        theta = angle * 1.6 + k * (2*math.pi/12)
-        r = radius * 0.65
-        x = int(cx + math.cos(theta) * r)
-        y = int(cy + math.sin(theta) * r * 0.5)
-        pygame.draw.circle(surf, (200,230,255), (x, y), 2)
-
-# --------------------
-# Entities
-# --------------------
-class Particle:
-    def __init__(self, x, y, color, life=0.8):
-        self.x = x; self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-6, -1)
-        self.color = color
-        self.life = life; self.time = 0
-    def update(self, dt):
-        self.time += dt; self.x += self.vx; self.y += self.vy; self.vy += 10 * dt
-    def draw(self, surf):
-        alpha = clamp(1 - (self.time / self.life), 0, 1)
-        if alpha <= 0: return
-        r = int(3 * (1 - alpha) + 1)
-        s = pygame.Surface((r*2, r*2), pygame.SRCALPHA)
-        col = (*self.color, int(255 * alpha))
-        pygame.draw.circle(s, col, (r, r), r); surf.blit(s, (self.x - r, self.y - r))
-
-class Explosion:
-    def __init__(self, x, y, color=ORANGE, num=PARTICLE_COUNT):
-        self.particles = [Particle(x + random.uniform(-6,6), y + random.uniform(-6,6), color, life=random.uniform(0.5,1.1)) for _ in range(num)]
-    def update(self, dt):
-        for p in self.particles: p.update(dt)
-        self.particles = [p for p in self.particles if p.time < p.life]
-    def draw(self, surf):
-        for p in self.particles: p.draw(surf)
-
-class Bullet:
-    def __init__(self, x, y, vy, color=YELLOW, owner="player", damage=1):
-        self.x = x; self.y = y; self.vy = vy; self.color = color; self.owner = owner; self.damage = damage
-        self.radius = 4 if owner=="player" else 5
-        self.rect = pygame.Rect(x-self.radius, y-self.radius, self.radius*2, self.radius*2)
-    def update(self, dt):
-        self.y += self.vy * (dt * 60 if dt < 5 else dt)
-        self.rect.center = (int(self.x), int(self.y))
-    def draw(self, surf): pygame.draw.circle(surf, self.color, (int(self.x), int(self.y)), self.radius)
-    def offscreen(self): return self.y < -30 or self.y > HEIGHT + 30
-
-class BuffDrop:
-    def __init__(self, x, y, kind='multishot'):
-        self.x = x; self.y = y; self.kind = kind; self.vy = 2.2; self.radius = 10
-        self.rect = pygame.Rect(x - self.radius, y - self.radius, self.radius*2, self.radius*2)
-        self.angle = 0
-    def update(self, dt):
-        self.y += self.vy * (dt * 60 if dt < 5 else dt); self.angle += dt * 5; self.rect.center = (int(self.x), int(self.y))
-    def draw(self, surf):
-        x = int(self.x); y = int(self.y)
-        if self.kind == 'multishot':
-            pygame.draw.circle(surf, YELLOW, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle)); ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-        elif self.kind == 'shield':
-            pygame.draw.circle(surf, SHIELD_BLUE, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle)); ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-        else:  # heal / hp drop
-            pygame.draw.circle(surf, RED, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle))
-            ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-
-
-# --------------------
-# Player
-# --------------------
-class Player:
-    def __init__(self):
-        self.x = PLAYER_START_X; self.y = PLAYER_Y; self.radius = PLAYER_RADIUS
-        self.hp_max = PLAYER_BASE_HP; self.hp = PLAYER_BASE_HP
-        self.fire_delay_ms = PLAYER_BASE_FIRE_DELAY_MS; self.last_shot_time = 0
-        self.multishot_active = False; self.multishot_end_time = 0
-        self.score = 0; self.lives = 1
-        self.speed = PLAYER_SPEED
-        # shield: absorbs multiple hits while active
-        self.shield_active = False
-        self.shield_end_time = 0
-        self.shield_uses = 0  # time when shield effect ends
-        # hit-flash indicator (visual only)
-        self.hit_flash = False
-        self.hit_flash_end = 0
-        # micro invincibility timer
-        self.invincible_until = 0
-
-        # ultimate
-        self.ultimate_count = 0; self.ultimate_needed = 10; self.ultimate_available = False
-        self.ultimate_active = False; self.ultimate_end_time = 0; self.ultimate_fire_delay_ms = ULTIMATE_FIRE_DELAY_MS; self.last_ultimate_shot_time = 0
-
-    def update(self):
-        now = pygame.time.get_ticks()
-        # Shield expiration: ensure shield ends when timer passes
-        if getattr(self, 'shield_active', False) and getattr(self, 'shield_end_time', 0) and now > self.shield_end_time:
-            self.shield_active = False
-            self.shield_end_time = 0
-            self.shield_uses = 0
-            if hasattr(self, 'shield_uses'):
-                self.shield_uses = 0
-
-        if self.shield_active and now > self.shield_end_time:
-            self.shield_active = False
-            self.shield_end_time = 0
-            self.shield_uses = 0
-
-        if self.multishot_active and now > self.multishot_end_time:
-            self.multishot_active = False
-        if self.ultimate_active and now > self.ultimate_end_time:
-            self.ultimate_active = False; self.ultimate_end_time = 0; self.last_ultimate_shot_time = 0
-
-    def draw(self, surf):
-        x, y = int(self.x), int(self.y)
-
-        # flicker frames (visual only, no invincibility)
-        if self.hit_flash:
-            if pygame.time.get_ticks() > self.hit_flash_end:
-                self.hit_flash = False
-            else:
-                # simple flicker: skip every other frame
-                if (pygame.time.get_ticks() // 60) % 2 == 0:
-                    return  # skip drawing this frame for flicker
-
-        # normal draw
-        pts = [
-            (x, y - self.radius),
-            (x - self.radius, y + self.radius),
-            (x + self.radius, y + self.radius)
-        ]
-        pygame.draw.polygon(surf, CYAN, pts)
-        pygame.draw.polygon(surf, WHITE, pts, 2)
-
-        # shield visual
-        if self.shield_active and self.shield_uses > 0:
-            pygame.draw.circle(surf, SHIELD_BLUE, (x,y), self.radius + 10, 3)
-
-    def can_shoot(self):
-        return pygame.time.get_ticks() - self.last_shot_time >= self.fire_delay_ms
-
-    def shoot(self):
-        self.last_shot_time = pygame.time.get_ticks(); bullets = []
-        if self.multishot_active:
-            for s in (-14,0,14): bullets.append(Bullet(self.x + s, self.y - self.radius - 4, PLAYER_BULLET_SPEED, YELLOW, "player", damage=1))
-        else:
-            bullets.append(Bullet(self.x, self.y - self.radius - 6, PLAYER_BULLET_SPEED, YELLOW, "player", damage=1))
-        return bullets
-
-    def take_damage(self, amount=1, source=None, knockback=0):
-        """
-        amount: HP to remove
-        source: (sx, sy) tuple indicating position of hit origin (bullet or enemy)
-        knockback: pixels to push player away from source (visual reaction)
-        Returns True if player died
-        """
-        # shield absorbs up to its uses
-        if self.shield_active and self.shield_uses > 0:
-            self.shield_uses -= amount
-            if self.shield_uses <= 0:
-                self.shield_active = False; self.shield_uses = 0
-
-            # trigger flash and knockback even if shield absorbs
-            self.hit_flash = True
-            self.hit_flash_end = pygame.time.get_ticks() + 180
-            if source and knockback:
-                sx, sy = source
-                dx = self.x - sx; dy = self.y - sy
-                dist = math.hypot(dx, dy)
-                if dist == 0:
-                    # random small nudge if overlapping exactly
-                    angle = random.uniform(0, math.pi*2)
-                    dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
-                nx = dx / dist; ny = dy / dist
-                self.x += nx * knockback
-                self.y += ny * knockback
-                self.x = clamp(self.x, self.radius, WIDTH - self.radius)
-                self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
-            return False
-
-        # normal damage
-        self.hp -= amount
-
-        # flash feedback (NO invincibility)
-        self.hit_flash = True
-        self.hit_flash_end = pygame.time.get_ticks() + 180
-
-        # apply knockback if source provided
-        if source and knockback:
-            sx, sy = source
-            dx = self.x - sx; dy = self.y - sy
-            dist = math.hypot(dx, dy)
-            if dist == 0:
-                angle = random.uniform(0, math.pi*2)
-                dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
-            nx = dx / dist; ny = dy / dist
-            self.x += nx * knockback
-            self.y += ny * knockback
-            self.x = clamp(self.x, self.radius, WIDTH - self.radius)
-            self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
-
-        if self.hp <= 0:
-            self.hp = 0; return True
-        return False
-
-    def use_ultimate_once(self):
-        bullets = []
-        offsets = [-40, -20, 0, 20, 40]
-        for s in offsets:
-            bullets.append(Bullet(self.x + s, self.y - self.radius - 6, int(PLAYER_BULLET_SPEED * 1.6), YELLOW, "player", damage=2))
-        return bullets
-
-# --------------------
-# Enemy
-# --------------------
-class Enemy:
-    def __init__(self, x, y, etype="basic", hp=1):
-        self.base_x = x; self.base_y = y; self.x = x; self.y = y
-        self.etype = etype
-        self.w = 36; self.h = 30; self.hp = hp
-        self.hp_max = hp; self.alive = True; self.arm_state = 0
-        self.shoot_timer = random.uniform(0.4, 2.4); self.osc_phase = random.uniform(0, math.pi*2)
-        self.spin_radius = random.uniform(4, 18)
-        self.spin_speed = random.uniform(1.0, 3.0) * (0.6 if etype=="tank" else 1.0)
-        self.bob_amp = random.uniform(0.0, 4.0)
-        # physics for dynamic spawn
-        self.vx = None; self.vy = None; self.curve_phase = 0.0; self.curve_speed = 0.0; self.curve_amount = 0.0
-
-    def rect(self):
-        return pygame.Rect(int(self.x - self.w/2), int(self.y - self.h/2), self.w, self.h)
-    def toggle_arm(self): self.arm_state = 1 - self.arm_state
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        if not self.alive: return
-        # dynamic (free-moving) enemies
-        if self.vx is not None and self.vy is not None:
-            self.curve_phase += self.curve_speed * dt
-            cx = math.sin(self.curve_phase) * self.curve_amount * (0.5 if self.etype == 'fast' else 1.0)
-            self.x += (self.vx * (dt * 60))
-            self.y += (self.vy * (dt * 60))
-            self.x += cx * dt * 18
-            if self.etype == "zig":
-                self.y += math.sin(elapsed*2 + self.osc_phase) * 0.8
-            # if enemy goes far off screen, reposition them back to top (respawn behavior)
-            if self.x < -200 or self.x > WIDTH + 200 or self.y > HEIGHT + 200:
-                # reposition to top with new parameters (keeps game fun)
-                self.x = random.randint(40, WIDTH - 40)
-                self.y = -40
-                self.vx = random.uniform(-0.6, 0.6)
-                self.vy = random.uniform(1.2, 2.5)
-                self.curve_phase = random.uniform(0, math.pi*2)
-                self.curve_speed = random.uniform(0.4, 1.2)
-                self.curve_amount = random.randint(8, 38)
-            base_rate = 1.0
-            if self.etype == "fast": base_rate = 0.5
-            elif self.etype == "tank": base_rate = 1.6
-            self.shoot_timer -= dt * (1.0 / base_rate)
-            return
-
-        # formation style
-        self.base_x += step_dx; self.base_y += step_dy
-        if self.etype == "zig":
-            bob = math.sin(elapsed*2 + self.osc_phase) * 6
-        elif self.etype == "tank":
-            bob = math.sin(elapsed*1.2 + self.osc_phase) * 3
-        else:
-            bob = math.sin(elapsed*1.6 + self.osc_phase) * self.bob_amp
-        angle = elapsed * self.spin_speed + self.osc_phase
-        self.x = self.base_x + math.cos(angle) * self.spin_radius
-        self.y = self.base_y + math.sin(angle) * (self.spin_radius * 0.6) + bob
-        base_rate = 1.0
-        if self.etype == "fast": base_rate = 0.5
-        elif self.etype == "tank": base_rate = 1.6
-        self.shoot_timer -= dt * (1.0 / base_rate)
-
-    def draw(self, surf):
-        if not self.alive: return
-        px = int(self.x); py = int(self.y)
-        frame1 = ["  ██  ", " █  █ ", "██████", "█ ██ █", "█    █", " █  █ "]
-        frame2 = ["  ██  ", " █  █ ", "██████", "█ ██ █", " █  █ ", "█    █"]
-        frame = frame1 if self.arm_state==0 else frame2
-        for ry, row in enumerate(frame):
-            for rx, ch in enumerate(row):
-                if ch == "█":
-                    x = px + (rx - 3) * 3; y = py + (ry - 3) * 3
-                    pygame.draw.rect(surf, GREEN, (x, y, 3, 3))
-
-class Boss(Enemy):
-    def __init__(self, x, y, hp=18):
-        super().__init__(x,y,etype="boss", hp=hp)
-        self.w = 120; self.h = 70; self.move_timer = 0; self.dir = 1; self.shoot_timer = 1.2
-    def draw(self, surf):
-        if not self.alive: return
-        rect = pygame.Rect(self.x - self.w/2, self.y - self.h/2, self.w, self.h)
-        pygame.draw.rect(surf, (120,50,200), rect); pygame.draw.rect(surf, WHITE, rect, 3)
-        draw_boss_healthbar(surf, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
-        pygame.draw.circle(surf, BLACK, (int(self.x - 24), int(self.y - 8)), 8)
-        pygame.draw.circle(surf, BLACK, (int(self.x + 24), int(self.y - 8)), 8)
-        for i in range(-3,4): tx = int(self.x + i*10); ty = int(self.y + 16); pygame.draw.rect(surf, WHITE, (tx-3, ty, 6, 8))
-
-# --------------------
-# Wave Manager (now accepts player_pos to avoid spawning on player)
-# --------------------
-class WaveManager:
-    def __init__(self, player_pos=None):
-        self.wave_num = 0
-        self.enemies = []
-        self.step_interval = 0.8
-        self.step_acc = 0.0
-        self.direction = 1
-        self.elapsed = 0.0
-        self.base_speed = 28.0
-        self.enemy_shoot_prob = 0.006
-        self.spawn_wave(player_pos)
-
-    def spawn_wave(self, player_pos=None):
-        self.wave_num += 1
-        self.enemies = []  # Reset enemies each wave
-        total = 6 + self.wave_num * 1
-        formation_count = max(0, min(ENEMIES_PER_ROW, total // 3))
-        dynamic_count = total - formation_count
-
-        # Formation spawn
-        if formation_count > 0:
-            start_x = max(80, WIDTH // 2 - (formation_count // 2) * 50)
-            y = 90
-            for i in range(formation_count):
-                x = start_x + i * 50
-                t = random.random()
-                if t < 0.62:
-                    etype = 'basic'
-                    hp = 1
-                elif t < 0.82:
-                    etype = 'fast'
-                    hp = 1
-                elif t < 0.94:
-                    etype = 'zig'
-                    hp = 1
-                else:
-                    etype = 'tank'
-                    hp = 2 + (self.wave_num // 3)
-
-                # Create enemy and add to the list
-                e = Enemy(x, y, etype=etype, hp=hp)
-                if etype == 'tank':
-                    e.spin_radius = random.uniform(8, 22)
-                    e.spin_speed *= 0.7
-                if etype == 'fast':
-                    e.spin_radius = random.uniform(2, 8)
-                    e.spin_speed *= 1.6
-                self.enemies.append(e)
-
-        # Dynamic spawn
-        for i in range(dynamic_count):
-            etype = random.choice(['basic', 'fast', 'zig', 'tank'])
-            side = random.choice(['top', 'left', 'right'])
-
-            placed = False
-            attempts = 0
-            while not placed and attempts < 40:
-                attempts += 1
-                # Dynamic spawn logic based on side
-                if side == 'top':
-                    x = random.randint(40, WIDTH - 40)
-                    y = -40
-                    vx = random.uniform(-0.6, 0.6)
-                    vy = random.uniform(1.2, 2.5)
-                elif side == 'left':
-                    x = -40
-                    y = random.randint(60, HEIGHT - 220)
-                    vx = random.uniform(1.0, 2.6)
-                    vy = random.uniform(-0.2, 0.4)
-                else:
-                    x = WIDTH + 40
-                    y = random.randint(60, HEIGHT - 220)
-                    vx = random.uniform(-2.6, -1.0)
-                    vy = random.uniform(-0.2, 0.4)
-
-                # Avoid spawning too close to the player
-                if player_pos is None or math.hypot(x - player_pos[0], y - player_pos[1]) > 140:
-                    placed = True
-
-            # Add enemy to list
-            e = Enemy(x, y, etype=etype, hp=(2 if etype == 'tank' else 1))
-            e.vx = vx
-            e.vy = vy
-            e.curve_phase = random.uniform(0, math.pi * 2)
-            e.curve_speed = random.uniform(0.4, 1.2)
-            e.curve_amount = random.randint(8, 38)
-
-            if etype == 'fast':
-                e.vx *= 1.2
-                e.vy *= 1.1
-                e.curve_amount *= 0.6
-            if etype == 'tank':
-                e.vx *= 0.6
-                e.vy *= 0.75
-                e.curve_amount *= 1.1
-
-            self.enemies.append(e)
-
-        # Boss waves
-        if self.wave_num % BOSS_EVERY == 0:
-            boss_y = min(140, PLAYER_Y - 220)
-            boss_hp = 20 + int(self.wave_num * 3.5)
-            boss = Boss(WIDTH // 2, boss_y, hp=boss_hp)
-            self.enemies.append(boss)
-
-        # Print debug message for the wave and enemies spawned
-        print(f"Spawning wave {self.wave_num} with {len(self.enemies)} enemies.")
-    
-        # Adjust difficulty for next wave
-        self.step_interval = max(0.95 - (self.wave_num * 0.02), 0.35)
-        self.base_speed = 20 + self.wave_num * 2.2
-        self.enemy_shoot_prob = clamp(0.004 + self.wave_num * 0.0009, 0.004, 0.02)
-
-    def update(self, dt):
-        self.elapsed += dt
-        self.step_acc += dt
-        if self.step_acc >= self.step_interval:
-            times = int(self.step_acc // self.step_interval)
-            self.step_acc -= times * self.step_interval
-            step_size = self.base_speed * self.step_interval
-            for _ in range(times):
-                dx = step_size * self.direction
-                will_hit = False
-                for e in self.enemies:
-                    if not e.alive: continue
-                    if getattr(e, 'vx', None) is not None: continue
-                    nx = e.base_x + dx
-                    if nx - e.w / 2 < 20 or nx + e.w / 2 > WIDTH - 20:
-                        will_hit = True
-                        break
-                if will_hit:
-                    for e in self.enemies:
-                        if e.alive and getattr(e, 'vx', None) is None:
-                            e.base_y += ENEMY_DROP
-                            e.toggle_arm()
-                    self.direction *= -1
-                else:
-                    for e in self.enemies:
-                        if e.alive and getattr(e, 'vx', None) is None:
-                            e.base_x += dx
-                            e.toggle_arm()
-
-    def any_alive(self):
-        return any(e.alive for e in self.enemies)
-
-
-# --------------------
-# Shop
-# --------------------
-class Shop:
-    def __init__(self): pass
-    def open(self, screen, player):
-        font = pygame.font.SysFont(FONT_NAME, 24); big = pygame.font.SysFont(FONT_NAME, 40)
-        options = [("Faster Fire (reduce delay by 20ms)", SHOP_FIRE_RATE_PRICE, "fire"), ("Increase Max HP (+1)", SHOP_MAX_HP_PRICE, "hp"), ("Heal to Full (+heal)", 1300, "heal")]
-        selected = 0; clock = pygame.time.Clock()
-        while True:
-            clock.tick(FPS)
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
-                if ev.type == pygame.KEYDOWN:
-                    if ev.key == pygame.K_t: return
-                    if ev.key == pygame.K_UP: selected = (selected - 1) % len(options)
-                    if ev.key == pygame.K_DOWN: selected = (selected + 1) % len(options)
-                    if ev.key == pygame.K_RETURN:
-                        _, cost, code = options[selected]
-                        if player.score >= cost:
-                            player.score -= cost
-                            if code == "fire": """
-Alien Invaders — Fixed Edition (with hit-flash + knockback + 15s invincibility on hit)
-- Keeps mouse-drag + keyboard movement (unchanged)
-- Shield pickup gives 3 hits
-- Prevents enemies spawning on top of the player (uses player position when spawning)
-- Repositions dynamic enemies that fly off-screen to the top instead of deleting them
-- Collision: enemy body hit deals 1 HP and grants 15s temporary invincibility
-- Clean, ready-to-run single-file script
-
-Run: python alien_invaders_fixed_knockback_invincible.py
-Requires: pygame (pip install pygame)
-"""
-
-import pygame
-import random
-import math
-import sys
-import time
-
-# Optional sound: uses numpy to synthesize simple waveforms.
-try:
-    import numpy as np
-    NUMPY_AVAILABLE = True
-except Exception:
-    NUMPY_AVAILABLE = False
-
-pygame.init()
-if NUMPY_AVAILABLE:
-    try:
-        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-    except Exception:
-        pass
-
-# --------------------
-# Configuration
-# --------------------
-WIDTH, HEIGHT = 880, 720
-FPS = 60
-
-# Player
-PLAYER_START_X = WIDTH // 2
-PLAYER_Y = HEIGHT - 70
-PLAYER_RADIUS = 18
-PLAYER_BASE_HP = 6
-PLAYER_BASE_FIRE_DELAY_MS = 220
-PLAYER_SPEED = 260
-
-# Bullets
-PLAYER_BULLET_SPEED = -10
-ENEMY_BULLET_SPEED_BASE = 3.0
-
-# Buffs
-BUFF_CHANCE = 0.18
-BUFF_DURATION_MS = 5000
-
-# Ultimate
-ULTIMATE_DURATION_MS = 8000
-ULTIMATE_FIRE_DELAY_MS = 180
-
-# Waves
-ENEMIES_PER_ROW = 10
-BOSS_EVERY = 5
-ENEMY_DROP = 24
-
-# Shop prices
-SHOP_FIRE_RATE_PRICE = 800
-SHOP_MAX_HP_PRICE = 1000
-SHOP_SPEED_PRICE = 700
-
-# Particles
-PARTICLE_COUNT = 14
-
-# Knockback (light = 15 px as requested)
-KNOCKBACK_PIXELS = 15
-
-# Invincibility (milliseconds)
-INVINCIBILITY_MS = 500 # 3 seconds of invincibility after hit
-
-# Colors
-WHITE = (255,255,255)
-BLACK = (10,10,18)
-RED = (230,60,60)
-GREEN = (80,230,120)
-YELLOW = (255,220,50)
-CYAN = (80,200,235)
-ORANGE = (255,150,60)
-GRAY = (120,120,140)
-SHIELD_BLUE = (90,180,240)
-
-FONT_NAME = "Consolas"
-
-# --------------------
-# Utility
-# --------------------
-def clamp(v, a, b):
-    return max(a, min(b, v))
-
-# --------------------
-# Background (stars & planets)
-# --------------------
-class Star:
-    def __init__(self, w, h):
-        self.x = random.uniform(0, w)
-        self.y = random.uniform(0, h)
-        self.speed = random.uniform(0.6, 2.2)
-        self.size = random.randint(1, 3)
-        self.phase = random.uniform(0, math.pi*2)
-
-    def update(self, dt, h):
-        self.y += self.speed * dt
-        self.phase += dt * 0.1
-        if self.y > h:
-            self.y = -2
-            self.x = random.uniform(0, WIDTH)
-
-    def draw(self, surf):
-        alpha = 150 + int(100 * math.sin(self.phase))
-        color = (alpha, alpha, alpha)
-        pygame.draw.circle(surf, color, (int(self.x), int(self.y)), self.size)
-
-class Planet:
-    def __init__(self, w, h):
-        self.x = random.uniform(80, w - 80)
-        self.y = random.uniform(-2000, -300)
-        self.speed = random.uniform(0.02, 0.12)
-        self.size = random.randint(40, 120)
-        self.color = (
-            random.randint(80, 230),
-            random.randint(80, 230),
-            random.randint(80, 230)
-        )
-        self.angle = random.uniform(0, math.pi*2)
-        self.spin = random.uniform(-0.6, 0.6)
-
-    def update(self, dt, h):
-        self.y += self.speed * dt
-        self.angle += self.spin * dt * 0.02
-        if self.y > h + 200:
-            self.x = random.uniform(80, WIDTH - 80)
-            self.y = random.uniform(-1200, -300)
-            self.speed = random.uniform(0.02, 0.12)
-            self.size = random.randint(40, 120)
-            self.color = (
-                random.randint(80, 230),
-                random.randint(80, 230),
-                random.randint(80, 230)
-            )
-
-    def draw(self, surf):
-        cx = int(self.x); cy = int(self.y)
-        pygame.draw.circle(surf, self.color, (cx, cy), self.size)
-        highlight_color = (min(255, self.color[0]+30), min(255, self.color[1]+30), min(255, self.color[2]+30))
-        hx = cx + int(self.size * 0.25 * math.cos(self.angle))
-        hy = cy - int(self.size * 0.25 * math.sin(self.angle))
-        pygame.draw.circle(surf, highlight_color, (hx, hy), int(self.size * 0.22))
-
-stars = [Star(WIDTH, HEIGHT) for _ in range(140)]
-planets = [Planet(WIDTH, HEIGHT) for _ in range(3)]
-
-# --------------------
-# Visual globe for menu
-# --------------------
-def draw_spinning_globe(surf, cx, cy, radius, angle):
-    pygame.draw.circle(surf, (12,60,110), (cx, cy), radius)
-    pygame.draw.circle(surf, (24,120,200), (cx, cy), radius, 2)
-    rect = pygame.Rect(cx - radius, cy - radius, radius*2, radius*2)
-    for i in range(6):
-        a = angle + i * 0.9
-        pygame.draw.arc(surf, (80,170,220), rect, a, a + math.pi, 2)
-    for j in range(-2,3):
-        w = 2 if j==0 else 1
-        ry = int(cy + j * (radius * 0.35))
-        pygame.draw.ellipse(surf, (80,160,200), (cx - int(radius*0.85), ry - 6, int(radius*1.7), 12), w)
-    for k in range(12):
-        theta = angle * 1.6 + k * (2*math.pi/12)
-        r = radius * 0.65
-        x = int(cx + math.cos(theta) * r)
-        y = int(cy + math.sin(theta) * r * 0.5)
-        pygame.draw.circle(surf, (200,230,255), (x, y), 2)
-
-# --------------------
-# Entities
-# --------------------
-class Particle:
-    def __init__(self, x, y, color, life=0.8):
-        self.x = x; self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-6, -1)
-        self.color = color
-        self.life = life; self.time = 0
-    def update(self, dt):
-        self.time += dt; self.x += self.vx; self.y += self.vy; self.vy += 10 * dt
-    def draw(self, surf):
-        alpha = clamp(1 - (self.time / self.life), 0, 1)
-        if alpha <= 0: return
-        r = int(3 * (1 - alpha) + 1)
-        s = pygame.Surface((r*2, r*2), pygame.SRCALPHA)
-        col = (*self.color, int(255 * alpha))
-        pygame.draw.circle(s, col, (r, r), r); surf.blit(s, (self.x - r, self.y - r))
-
-class Explosion:
-    def __init__(self, x, y, color=ORANGE, num=PARTICLE_COUNT):
-        self.particles = [Particle(x + random.uniform(-6,6), y + random.uniform(-6,6), color, life=random.uniform(0.5,1.1)) for _ in range(num)]
-    def update(self, dt):
-        for p in self.particles: p.update(dt)
-        self.particles = [p for p in self.particles if p.time < p.life]
-    def draw(self, surf):
-        for p in self.particles: p.draw(surf)
-
-class Bullet:
-    def __init__(self, x, y, vy, color=YELLOW, owner="player", damage=1):
-        self.x = x; self.y = y; self.vy = vy; self.color = color; self.owner = owner; self.damage = damage
-        self.radius = 4 if owner=="player" else 5
-        self.rect = pygame.Rect(x-self.radius, y-self.radius, self.radius*2, self.radius*2)
-    def update(self, dt):
-        self.y += self.vy * (dt * 60 if dt < 5 else dt)
-        self.rect.center = (int(self.x), int(self.y))
-    def draw(self, surf): pygame.draw.circle(surf, self.color, (int(self.x), int(self.y)), self.radius)
-    def offscreen(self): return self.y < -30 or self.y > HEIGHT + 30
-
-class BuffDrop:
-    def __init__(self, x, y, kind='multishot'):
-        self.x = x; self.y = y; self.kind = kind; self.vy = 2.2; self.radius = 10
-        self.rect = pygame.Rect(x - self.radius, y - self.radius, self.radius*2, self.radius*2)
-        self.angle = 0
-    def update(self, dt):
-        self.y += self.vy * (dt * 60 if dt < 5 else dt); self.angle += dt * 5; self.rect.center = (int(self.x), int(self.y))
-    def draw(self, surf):
-        x = int(self.x); y = int(self.y)
-        if self.kind == 'multishot':
-            pygame.draw.circle(surf, YELLOW, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle)); ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-        elif self.kind == 'shield':
-            pygame.draw.circle(surf, SHIELD_BLUE, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle)); ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-        elif self.kind == 'heal':
-            pygame.draw.circle(surf, GREEN, (x, y), self.radius)
-            ex = int(self.x + self.radius * math.cos(self.angle)); ey = int(self.y + self.radius * math.sin(self.angle))
-            pygame.draw.line(surf, WHITE, (self.x, self.y), (ex, ey), 2)
-
-# --------------------
-# Player
-# --------------------
-class Player:
-    def __init__(self):
-        self.x = PLAYER_START_X; self.y = PLAYER_Y; self.radius = PLAYER_RADIUS
-        self.hp_max = PLAYER_BASE_HP; self.hp = PLAYER_BASE_HP
-        self.fire_delay_ms = PLAYER_BASE_FIRE_DELAY_MS; self.last_shot_time = 0
-        self.multishot_active = False; self.multishot_end_time = 0
-        self.score = 0; self.lives = 1
-        self.speed = PLAYER_SPEED
-        # shield: absorbs multiple hits while active
-        self.shield_active = False
-        self.shield_uses = 0
-        # hit-flash indicator (visual only)
-        self.hit_flash = False
-        self.hit_flash_end = 0
-        # micro invincibility timer (ms since epoch)
-        self.invincible_until = 0
-
-        # ultimate
-        self.ultimate_count = 0; self.ultimate_needed = 10; self.ultimate_available = False
-        self.ultimate_active = False; self.ultimate_end_time = 0; self.ultimate_fire_delay_ms = ULTIMATE_FIRE_DELAY_MS; self.last_ultimate_shot_time = 0
-
-    def update(self):
-        now = pygame.time.get_ticks()
-        # Shield expiration: ensure shield ends when timer passes
-        if getattr(self, 'shield_active', False) and getattr(self, 'shield_end_time', 0) and now > self.shield_end_time:
-            self.shield_active = False
-            self.shield_end_time = 0
-            self.shield_uses = 0
-            if hasattr(self, 'shield_uses'):
-                self.shield_uses = 0
-
-        if self.multishot_active and now > self.multishot_end_time:
-            self.multishot_active = False
-        if self.ultimate_active and now > self.ultimate_end_time:
-            self.ultimate_active = False; self.ultimate_end_time = 0; self.last_ultimate_shot_time = 0
-
-    def draw(self, surf):
-        x, y = int(self.x), int(self.y)
-
-        # show invincibility ring if active
-        now = pygame.time.get_ticks()
-        if now < self.invincible_until:
-            alpha = 120 + int(80 * math.sin(now * 0.01))
-            ring_s = pygame.Surface((self.radius*4, self.radius*4), pygame.SRCALPHA)
-            pygame.draw.circle(ring_s, (200,200,255,int(alpha)), (self.radius*2, self.radius*2), self.radius+14, 6)
-            surf.blit(ring_s, (x - self.radius*2, y - self.radius*2))
-
-        # flicker frames (visual only)
-        if self.hit_flash:
-            if pygame.time.get_ticks() > self.hit_flash_end:
-                self.hit_flash = False
-            else:
-                # simple flicker: skip every other frame
-                if (pygame.time.get_ticks() // 60) % 2 == 0:
-                    return  # skip drawing this frame for flicker
-
-        # normal draw
-        pts = [
-            (x, y - self.radius),
-            (x - self.radius, y + self.radius),
-            (x + self.radius, y + self.radius)
-        ]
-        pygame.draw.polygon(surf, CYAN, pts)
-        pygame.draw.polygon(surf, WHITE, pts, 2)
-
-        # shield visual
-        if self.shield_active and self.shield_uses > 0:
-            pygame.draw.circle(surf, SHIELD_BLUE, (x,y), self.radius + 10, 3)
-
-    def can_shoot(self):
-        return pygame.time.get_ticks() - self.last_shot_time >= self.fire_delay_ms
-
-    def shoot(self):
-        self.last_shot_time = pygame.time.get_ticks(); bullets = []
-        if self.multishot_active:
-            for s in (-14,0,14): bullets.append(Bullet(self.x + s, self.y - self.radius - 4, PLAYER_BULLET_SPEED, YELLOW, "player", damage=1))
-        else:
-            bullets.append(Bullet(self.x, self.y - self.radius - 6, PLAYER_BULLET_SPEED, YELLOW, "player", damage=1))
-        return bullets
-
-    def take_damage(self, amount=1, source=None, knockback=0):
-        """
-        amount: HP to remove
-        source: (sx, sy) tuple indicating position of hit origin (bullet or enemy)
-        knockback: pixels to push player away from source (visual reaction)
-        Returns True if player died
-        """
-        now = pygame.time.get_ticks()
-
-        # If currently invincible, ignore damage
-        if now < self.invincible_until:
-            # still apply a small hit flash for feedback but no HP loss
-            self.hit_flash = True
-            self.hit_flash_end = now + 180
-            return False
-
-        # shield absorbs up to its uses
-        if self.shield_active and self.shield_uses > 0:
-            self.shield_uses -= amount
-            if self.shield_uses <= 0:
-                self.shield_active = False; self.shield_uses = 0
-
-            # trigger flash and knockback even if shield absorbs
-            self.hit_flash = True
-            self.hit_flash_end = now + 180
-
-            # apply invincibility to prevent immediate follow-up hits
-            self.invincible_until = now + INVINCIBILITY_MS
-
-            if source and knockback:
-                sx, sy = source
-                dx = self.x - sx; dy = self.y - sy
-                dist = math.hypot(dx, dy)
-                if dist == 0:
-                    # random small nudge if overlapping exactly
-                    angle = random.uniform(0, math.pi*2)
-                    dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
-                nx = dx / dist; ny = dy / dist
-                self.x += nx * knockback
-                self.y += ny * knockback
-                self.x = clamp(self.x, self.radius, WIDTH - self.radius)
-                self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
-            return False
-
-        # normal damage
-        self.hp -= amount
-
-        # flash feedback
-        self.hit_flash = True
-        self.hit_flash_end = now + 180
-
-        # apply invincibility to avoid being hit again for a while
-        self.invincible_until = now + INVINCIBILITY_MS
-
-        # apply knockback if source provided
-        if source and knockback:
-            sx, sy = source
-            dx = self.x - sx; dy = self.y - sy
-            dist = math.hypot(dx, dy)
-            if dist == 0:
-                angle = random.uniform(0, math.pi*2)
-                dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
-            nx = dx / dist; ny = dy / dist
-            self.x += nx * knockback
-            self.y += ny * knockback
-            self.x = clamp(self.x, self.radius, WIDTH - self.radius)
-            self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
-
-        if self.hp <= 0:
-            self.hp = 0; return True
-        return False
-
-    def use_ultimate_once(self):
-        bullets = []
-        offsets = [-40, -20, 0, 20, 40]
-        for s in offsets:
-            bullets.append(Bullet(self.x + s, self.y - self.radius - 6, int(PLAYER_BULLET_SPEED * 1.6), YELLOW, "player", damage=2))
-        return bullets
-
-# --------------------
-# Enemy
-# --------------------
-class Enemy:
-    def __init__(self, x, y, etype="basic", hp=1):
-        self.base_x = x; self.base_y = y; self.x = x; self.y = y
-        self.etype = etype
-        self.w = 36; self.h = 30; self.hp = hp
-        self.hp_max = hp; self.alive = True; self.arm_state = 0
-        self.shoot_timer = random.uniform(0.4, 2.4); self.osc_phase = random.uniform(0, math.pi*2)
-        self.spin_radius = random.uniform(4, 18)
-        self.spin_speed = random.uniform(1.0, 3.0) * (0.6 if etype=="tank" else 1.0)
-        self.bob_amp = random.uniform(0.0, 4.0)
-        # physics for dynamic spawn
-        self.vx = None; self.vy = None; self.curve_phase = 0.0; self.curve_speed = 0.0; self.curve_amount = 0.0
-
-    def rect(self):
-        return pygame.Rect(int(self.x - self.w/2), int(self.y - self.h/2), self.w, self.h)
-    def toggle_arm(self): self.arm_state = 1 - self.arm_state
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        if not self.alive: return
-        # dynamic (free-moving) enemies
-        if self.vx is not None and self.vy is not None:
-            self.curve_phase += self.curve_speed * dt
-            cx = math.sin(self.curve_phase) * self.curve_amount * (0.5 if self.etype == 'fast' else 1.0)
-            self.x += (self.vx * (dt * 60))
-            self.y += (self.vy * (dt * 60))
-            self.x += cx * dt * 18
-            if self.etype == "zig":
-                self.y += math.sin(elapsed*2 + self.osc_phase) * 0.8
-            # if enemy goes far off screen, reposition them back to top (respawn behavior)
-            if self.x < -200 or self.x > WIDTH + 200 or self.y > HEIGHT + 200:
-                # reposition to top with new parameters (keeps game fun)
-                self.x = random.randint(40, WIDTH - 40)
-                self.y = -40
-                self.vx = random.uniform(-0.6, 0.6)
-                self.vy = random.uniform(1.2, 2.5)
-                self.curve_phase = random.uniform(0, math.pi*2)
-                self.curve_speed = random.uniform(0.4, 1.2)
-                self.curve_amount = random.randint(8, 38)
-            base_rate = 1.0
-            if self.etype == "fast": base_rate = 0.5
-            elif self.etype == "tank": base_rate = 1.6
-            self.shoot_timer -= dt * (1.0 / base_rate)
-            return
-
-        # formation style
-        self.base_x += step_dx; self.base_y += step_dy
-        if self.etype == "zig":
-            bob = math.sin(elapsed*2 + self.osc_phase) * 6
-        elif self.etype == "tank":
-            bob = math.sin(elapsed*1.2 + self.osc_phase) * 3
-        else:
-            bob = math.sin(elapsed*1.6 + self.osc_phase) * self.bob_amp
-        angle = elapsed * self.spin_speed + self.osc_phase
-        self.x = self.base_x + math.cos(angle) * self.spin_radius
-        self.y = self.base_y + math.sin(angle) * (self.spin_radius * 0.6) + bob
-        base_rate = 1.0
-        if self.etype == "fast": base_rate = 0.5
-        elif self.etype == "tank": base_rate = 1.6
-        self.shoot_timer -= dt * (1.0 / base_rate)
-
-    def draw(self, surf):
-        if not self.alive: return
-        px = int(self.x); py = int(self.y)
-        frame1 = ["  ██  ", " █  █ ", "██████", "█ ██ █", "█    █", " █  █ "]
-        frame2 = ["  ██  ", " █  █ ", "██████", "█ ██ █", " █  █ ", "█    █"]
-        frame = frame1 if self.arm_state==0 else frame2
-        for ry, row in enumerate(frame):
-            for rx, ch in enumerate(row):
-                if ch == "█":
-                    x = px + (rx - 3) * 3; y = py + (ry - 3) * 3
-                    pygame.draw.rect(surf, GREEN, (x, y, 3, 3))
-
-class Boss(Enemy):
-    def __init__(self, x, y, hp=18):
-        super().__init__(x,y,etype="boss", hp=hp)
-        self.w = 120; self.h = 70; self.move_timer = 0; self.dir = 1; self.shoot_timer = 1.2
-    def draw(self, surf):
-        if not self.alive: return
-        rect = pygame.Rect(self.x - self.w/2, self.y - self.h/2, self.w, self.h)
-        pygame.draw.rect(surf, (120,50,200), rect); pygame.draw.rect(surf, WHITE, rect, 3)
-        draw_boss_healthbar(surf, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
-        pygame.draw.circle(surf, BLACK, (int(self.x - 24), int(self.y - 8)), 8)
-        pygame.draw.circle(surf, BLACK, (int(self.x + 24), int(self.y - 8)), 8)
-        for i in range(-3,4): tx = int(self.x + i*10); ty = int(self.y + 16); pygame.draw.rect(surf, WHITE, (tx-3, ty, 6, 8))
-
-# --------------------
-# Wave Manager (now accepts player_pos to avoid spawning on player)
-# --------------------
-class WaveManager:
-    def __init__(self, player_pos=None):
-        self.wave_num = 0; self.enemies = []
-        self.step_interval = 0.8; self.step_acc = 0.0; self.direction = 1; self.elapsed = 0.0
-        self.base_speed = 28.0; self.enemy_shoot_prob = 0.006
-        self.spawn_wave(player_pos)
-
-    def spawn_wave(self, player_pos=None):
-        self.wave_num += 1
-        self.enemies = []
-        total = 6 + self.wave_num * 1
-        formation_count = max(0, min(ENEMIES_PER_ROW, total // 3))
-        dynamic_count = total - formation_count
-
-        # formation
-        if formation_count > 0:
-            start_x = max(80, WIDTH//2 - (formation_count//2)*50)
-            y = 90
-            for i in range(formation_count):
-                x = start_x + i * 50
-                t = random.random()
-                if t < 0.62: etype='basic'; hp=1
-                elif t < 0.82: etype='fast'; hp=1
-                elif t < 0.94: etype='zig'; hp=1
-                else: etype='tank'; hp=2 + (self.wave_num//3)
-                e = Enemy(x,y,etype=etype,hp=hp)
-                if etype=='tank': e.spin_radius = random.uniform(8, 22); e.spin_speed *= 0.7
-                if etype=='fast': e.spin_radius = random.uniform(2, 8); e.spin_speed *= 1.6
-                self.enemies.append(e)
-
-        # dynamic spawns
-        for i in range(dynamic_count):
-            etype = random.choice(['basic', 'fast', 'zig', 'tank'])
-            # pick side
-            side = random.choice(['top','left','right'])
-            # pick position while avoiding player's area if provided
-            placed = False
-            attempts = 0
-            while not placed and attempts < 40:
-                attempts += 1
-                if side == 'top':
-                    x = random.randint(40, WIDTH - 40); y = -40; vx = random.uniform(-0.6, 0.6); vy = random.uniform(1.2, 2.5)
-                elif side == 'left':
-                    x = -40; y = random.randint(60, HEIGHT - 220); vx = random.uniform(1.0, 2.6); vy = random.uniform(-0.2, 0.4)
-                else:
-                    x = WIDTH + 40; y = random.randint(60, HEIGHT - 220); vx = random.uniform(-2.6, -1.0); vy = random.uniform(-0.2, 0.4)
-
-                if player_pos is None:
-                    placed = True
-                else:
-                    px, py = player_pos
-                    if math.hypot(x - px, y - py) > 140:
-                        placed = True
-            e = Enemy(x, y, etype=etype, hp=(2 if etype=='tank' else 1))
-            e.vx = vx; e.vy = vy; e.curve_phase = random.uniform(0, math.pi*2)
-            e.curve_speed = random.uniform(0.4, 1.2); e.curve_amount = random.randint(8, 38)
-            if etype == 'fast': e.vx *= 1.2; e.vy *= 1.1; e.curve_amount *= 0.6
-            if etype == 'tank': e.vx *= 0.6; e.vy *= 0.75; e.curve_amount *= 1.1
-            self.enemies.append(e)
-
-        # boss waves
-        if self.wave_num % BOSS_EVERY == 0:
-            boss_y = min(140, PLAYER_Y - 220)
-            boss = Boss(WIDTH//2, boss_y, hp=12 + self.wave_num*2)
-            self.enemies.append(boss)
-
-        self.step_interval = max(0.95 - (self.wave_num*0.02), 0.35)
-        self.base_speed = 20 + self.wave_num * 2.2
-        self.enemy_shoot_prob = clamp(0.004 + self.wave_num * 0.0009, 0.004, 0.02)
-
-    def update(self, dt):
-        self.elapsed += dt; self.step_acc += dt
-        if self.step_acc >= self.step_interval:
-            times = int(self.step_acc // self.step_interval); self.step_acc -= times * self.step_interval
-            step_size = self.base_speed * (self.step_interval)
-            for _ in range(times):
-                dx = step_size * self.direction
-                will_hit = False
-                for e in self.enemies:
-                    if not e.alive: continue
-                    if getattr(e,'vx',None) is not None: continue
-                    nx = e.base_x + dx
-                    if nx - e.w/2 < 20 or nx + e.w/2 > WIDTH - 20:
-                        will_hit = True; break
-                if will_hit:
-                    for e in self.enemies:
-                        if e.alive and getattr(e,'vx',None) is None: e.base_y += ENEMY_DROP; e.toggle_arm()
-                    self.direction *= -1
-                else:
-                    for e in self.enemies:
-                        if e.alive and getattr(e,'vx',None) is None: e.base_x += dx; e.toggle_arm()
-
-    def any_alive(self):
-        return any(e.alive for e in self.enemies)
-
-# --------------------
-# Shop
-# --------------------
-class Shop:
-    def __init__(self): pass
-    def open(self, screen, player):
-        font = pygame.font.SysFont(FONT_NAME, 24); big = pygame.font.SysFont(FONT_NAME, 40)
-        options = [("Faster Fire (reduce delay by 20ms)", SHOP_FIRE_RATE_PRICE, "fire"), ("Increase Max HP (+1)", SHOP_MAX_HP_PRICE, "hp"), ("Heal to Full (+heal)", 1300, "heal")]
-        selected = 0; clock = pygame.time.Clock()
-        while True:
-            clock.tick(FPS)
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
-                if ev.type == pygame.KEYDOWN:
-                    if ev.key == pygame.K_t: return
-                    if ev.key == pygame.K_UP: selected = (selected - 1) % len(options)
-                    if ev.key == pygame.K_DOWN: selected = (selected + 1) % len(options)
-                    if ev.key == pygame.K_RETURN:
-                        _, cost, code = options[selected]
-                        if player.score >= cost:
-                            player.score -= cost
-                            if code == "fire": player.fire_delay_ms = max(80, player.fire_delay_ms - 20)
-                            elif code == "hp": player.hp_max += 1; player.hp += 1           
-                        elif code == "heal":
-                            player.hp = player.hp_max
-                if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                    mx,my = pygame.mouse.get_pos(); base_y = 240
-                    for i,op in enumerate(options):
-                        rect = pygame.Rect(180, base_y + i*60, 520, 48)
-                        if rect.collidepoint(mx,my): selected = i; _,cost,code = options[i]
-                        if player.score >= cost:
-                            player.score -= cost
-                            if code == "fire": player.fire_delay_ms = max(80, player.fire_delay_ms - 20)
-                            elif code == "hp": player.hp_max += 1; player.hp += 1                  
-                        elif code == "heal":
-                            player.hp = player.hp_max
-            screen.fill((6,6,14))
-            title = big.render("SHOP - Spend Score", True, YELLOW); screen.blit(title, (WIDTH//2 - title.get_width()//2, 80))
-            info = font.render(f"Score: {player.score}", True, WHITE); screen.blit(info, (WIDTH-160, 20))
-            base_y = 240
-            for i, (desc, cost, code) in enumerate(options):
-                rect = pygame.Rect(180, base_y + i*60, 520, 48); color = (40,40,80) if i!=selected else (70,70,120)
-                pygame.draw.rect(screen, color, rect); txt = font.render(f"{desc} — Cost: {cost}", True, WHITE); screen.blit(txt, (rect.x + 10, rect.y + 10))
-            tip = font.render("Use Up/Down, Enter to buy, or click option. Press T to continue.", True, GRAY); screen.blit(tip, (WIDTH//2 - tip.get_width()//2, HEIGHT - 80))
-            pygame.display.flip()
-
-# --------------------
-# Main Game
-# --------------------
-def main():
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("Alien Invaders The Sequel to The Prequel to The Original Sequel Continuation Remastered Enhanced Edition")
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont(FONT_NAME, 18)
-    bigfont = pygame.font.SysFont(FONT_NAME, 40)
-
-    state = 'menu'
-    menu_blink = 0.0
-    fade_alpha = 0.0
-
-    def reset_game():
-        nonlocal player, wave, bullets, enemy_bullets, drops, explosions, game_over, in_shop, time_since_wave_win, shop, start_time
-        player = Player()
-        wave = WaveManager(player_pos=(player.x, player.y))
-        shop = Shop()
-        bullets = []; enemy_bullets = []; drops = []; explosions = []
-        game_over = False; in_shop = False; time_since_wave_win = 0.0
-        start_time = pygame.time.get_ticks()
-
-    # initial setup
-    player = Player(); wave = WaveManager(player_pos=(PLAYER_START_X, PLAYER_Y)); shop = Shop()
-    bullets = []; enemy_bullets = []; drops = []; explosions = []
-    dragging = False; drag_offset_x = 0
-    game_over = False; in_shop = False; time_since_wave_win = 0.0
-    pygame.mouse.set_visible(True)
-    start_time = pygame.time.get_ticks()
-
-    while True:
-        dt_ms = clock.tick(FPS)
-        dt = dt_ms / 1000.0
-        elapsed = (pygame.time.get_ticks() - start_time)/1000.0
-        menu_blink += dt
-
-        for ev in pygame.event.get():
-            if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
-            if state == 'menu':
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_RETURN:
-                    state = 'playing'; reset_game()
-                if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                    state = 'playing'; reset_game()
-            elif state == 'playing':
-                if ev.type == pygame.KEYDOWN:
-                    if ev.key == pygame.K_p:
-                        paused = True
-                        while paused:
-                            for e in pygame.event.get():
-                                if e.type == pygame.QUIT: pygame.quit(); sys.exit()
-                                if e.type == pygame.KEYDOWN and e.key == pygame.K_p: paused = False
-                            pause_surf = bigfont.render("PAUSED — Press P to resume", True, YELLOW)
-                            screen.blit(pause_surf, (WIDTH//2 - pause_surf.get_width()//2, HEIGHT//2-24))
-                            pygame.display.flip(); clock.tick(15)
-                    if ev.key == pygame.K_ESCAPE: pygame.quit(); sys.exit()
-                    if ev.key == pygame.K_r and game_over: reset_game(); state = 'playing'
-                    if ev.key == pygame.K_SPACE:
-                        now = pygame.time.get_ticks()
-                        if player.ultimate_available and not player.ultimate_active:
-                            player.ultimate_active = True; player.ultimate_end_time = now + ULTIMATE_DURATION_MS; player.last_ultimate_shot_time = 0; player.ultimate_available = False; player.ultimate_count = 0
-                        else:
-                            if not player.ultimate_active and player.can_shoot(): bullets.extend(player.shoot())
-                if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                    mx,my = ev.pos
-                    if math.hypot(mx - player.x, my - player.y) < 120:
-                        dragging = True; drag_offset_x = player.x - mx
-                if ev.type == pygame.MOUSEBUTTONUP and ev.button == 1:
-                    dragging = False
-                if ev.type == pygame.MOUSEMOTION and dragging:
-                    mx,my = ev.pos
-                    player.x = mx; player.y = my
-                    player.x = clamp(player.x, player.radius, WIDTH - player.radius)
-                    player.y = clamp(player.y, player.radius, HEIGHT - player.radius)
-            elif state == 'gameover':
-                if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1 and fade_alpha >= 255: state = 'menu'
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_RETURN and fade_alpha >= 255: state = 'menu'
-
-        # MENU
-        if state == 'menu':
-            screen.fill(BLACK)
-            for p in planets: p.update(dt * 60, HEIGHT)
-            for s in stars: s.update(dt * 60, HEIGHT)
-            for p in planets: p.draw(screen)
-            for s in stars: s.draw(screen)
-            title = bigfont.render("ALIEN INVADERS", True, CYAN); screen.blit(title, (WIDTH//2 - title.get_width()//2, 140))
-            subtitle = font.render("Remastered Enhanced Edition", True, GRAY); screen.blit(subtitle, (WIDTH//2 - subtitle.get_width()//2, 200))
-            draw_spinning_globe(screen, WIDTH//2, 320, 80, menu_blink * 0.9)
-            prompt_surf = font.render("Press ENTER or Click to Play", True, WHITE); shadow = font.render("Press ENTER or Click to Play", True, (40,40,40))
-            screen.blit(shadow, (WIDTH//2 - prompt_surf.get_width()//2 + 2, 420 + 2)); screen.blit(prompt_surf, (WIDTH//2 - prompt_surf.get_width()//2, 420))
-            tip = font.render("YOUR PLANET IS BEING INVADED!", True, GRAY); screen.blit(tip, (WIDTH//2 - tip.get_width()//2, HEIGHT-60))
-            pygame.display.flip(); continue
-
-        # PLAYING
-        if state == 'playing':
-            keys = pygame.key.get_pressed()
-            spd = player.speed * dt * 60
-            if keys[pygame.K_LEFT] or keys[pygame.K_a]: player.x -= spd
-            if keys[pygame.K_RIGHT] or keys[pygame.K_d]: player.x += spd
-            if keys[pygame.K_UP] or keys[pygame.K_w]: player.y -= spd
-            if keys[pygame.K_DOWN] or keys[pygame.K_s]: player.y += spd
-            player.x = clamp(player.x, player.radius, WIDTH - player.radius)
-            player.y = clamp(player.y, player.radius, HEIGHT - player.radius)
-
-            player.update()
-            for p in planets: p.update(dt * 60, HEIGHT)
-            for s in stars: s.update(dt * 60, HEIGHT)
-
-            now = pygame.time.get_ticks()
-            if not game_over and not in_shop:
-                if player.ultimate_active:
-                    if player.last_ultimate_shot_time == 0 or (now - player.last_ultimate_shot_time) >= player.ultimate_fire_delay_ms:
-                        bullets.extend(player.use_ultimate_once()); player.last_ultimate_shot_time = now
-                else:
-                    if player.can_shoot(): bullets.extend(player.shoot())
-
-            wave.update(dt)
-            # enemy shooting
-
-            for e in wave.enemies:
-                if not e.alive: continue
-                base_prob = wave.enemy_shoot_prob * 2.0
-                if isinstance(e, Boss): base_prob *= 0.6
-                if e.etype == 'fast': prob = base_prob * 1.8
-                elif e.etype == 'tank': prob = base_prob * 0.6
-                else: prob = base_prob
-                # If a boss implements its own shooting (custom_shooter=True), skip default triple-shot.
-                if isinstance(e, Boss):
-                    if getattr(e, 'custom_shooter', False):
-                        # custom boss handles its own timing inside its update()
-                        pass
-                    else:
-                        e.shoot_timer -= dt
-                        if e.shoot_timer <= 0:
-                            e.shoot_timer = 0.8
-                            for a in (-1,0,1):
-                                enemy_bullets.append(Bullet(e.x + a*16, e.y + e.h//2 + 6, ENEMY_BULLET_SPEED_BASE + 1.2, RED, 'enemy', damage=1))
-                else:
-                    if random.random() < prob:
-                        dx = player.x - e.x; aim_offset = clamp(dx / (WIDTH/2), -0.6, 0.6)
-                        speed = ENEMY_BULLET_SPEED_BASE + (0.1*(1 if e.etype=='fast' else 0))
-                        enemy_bullets.append(Bullet(e.x + aim_offset*6, e.y + e.h//2 + 6, speed, RED, 'enemy', damage=1))
-
-
-            # update entities
-            for e in wave.enemies:
-                if e.alive: e.update(0,0,dt,wave,elapsed)
-            for b in bullets[:]: b.update(dt);
-            for b in bullets[:]:
-                if b.offscreen(): bullets.remove(b)
-            for b in enemy_bullets[:]: b.update(dt)
-            for b in enemy_bullets[:]:
-                if b.offscreen(): enemy_bullets.remove(b)
-            for d in drops[:]: d.update(dt);
-            for d in drops[:]:
-                if d.y > HEIGHT + 40: drops.remove(d)
-            for ex in explosions[:]: ex.update(dt)
-            for ex in explosions[:]:
-                if not ex.particles: explosions.remove(ex)
-
-            # collisions: player bullets -> enemies
-            for b in bullets[:]:
-                if b.owner != 'player': continue
-                hit = False
-                for e in wave.enemies:
-                    if not e.alive: continue
-                    if e.rect().collidepoint(b.x, b.y):
-                        e.hp -= b.damage
-                        try: bullets.remove(b)
-                        except: pass
-                        if e.hp <= 0:
-                            e.alive = False; player.score += 120 if not isinstance(e,Boss) else 1200
-                            if not player.ultimate_active:
-                                player.ultimate_count += 1
-                                if player.ultimate_count >= player.ultimate_needed: player.ultimate_available = True
-                            explosions.append(Explosion(e.x, e.y, color=ORANGE, num=PARTICLE_COUNT + (6 if isinstance(e,Boss) else 0)))
-                            if not isinstance(e,Boss) and random.random() < BUFF_CHANCE:
-                                kind = random.choice(['multishot','shield','heal'])
-                                drops.append(BuffDrop(e.x, e.y, kind=kind))
-                        hit = True; break
-                if hit: continue
-
-
-            # collisions: enemy bullets -> player
-            player_rect = pygame.Rect(player.x - player.radius, player.y - player.radius, player.radius*2, player.radius*2)
-            for b in enemy_bullets[:]:
-                if b.rect.colliderect(player_rect) or math.hypot(b.x - player.x, b.y - player.y) < (b.radius + player.radius):
-                    try: enemy_bullets.remove(b)
-                    except: pass
-                    # pass bullet position as source so knockback feels directional
-                    killed = player.take_damage(1, source=(b.x, b.y), knockback=KNOCKBACK_PIXELS)
-                    explosions.append(Explosion(player.x, player.y, color=CYAN, num=18))
-                    if killed:
-                        game_over = True; state = 'gameover'; fade_alpha = 0.0; fade_start = pygame.time.get_ticks(); break
-
-            # collisions: enemy body -> player (fixed so it does NOT instantly kill you)
-            # This handles enemy touching the player: deals 1 damage, applies knockback,
-            # grants INVINCIBILITY_MS of temporary invulnerability, and pushes player away slightly.
-            # It breaks after the first hit per frame to avoid multiple simultaneous hits.
-            for e in wave.enemies:
-                if not e.alive:
-                    continue
-
-                er = e.rect()
-
-                collide = (
-                    player_rect.colliderect(er) or
-                    math.hypot(e.x - player.x, e.y - player.y) < (player.radius + max(e.w, e.h) * 0.45)
-                )
-
-                if collide:
-                    # only apply damage if not currently invincible (handled inside take_damage)
-                    killed = player.take_damage(
-                        1,
-                        source=(e.x, e.y),
-                        knockback=KNOCKBACK_PIXELS
-                    )
-
-                    explosions.append(Explosion(player.x, player.y, color=CYAN, num=18))
-
-                    # bump player slightly out to reduce repeated collisions
-                    if player.x < e.x:
-                        player.x -= 6
-                    else:
-                        player.x += 6
-
-                    if player.y < e.y:
-                        player.y -= 6
-                    else:
-                        player.y += 6
-
-                    player.x = clamp(player.x, player.radius, WIDTH - player.radius)
-                    player.y = clamp(player.y, player.radius, HEIGHT - player.radius)
-
-                    if killed:
-                        game_over = True
-                        state = 'gameover'
-                        fade_alpha = 0.0
-                        fade_start = pygame.time.get_ticks()
-                    break
-
-            # collisions: drops -> player
-            for d in drops[:]:
-                if d.rect.colliderect(player_rect):
-                    drops.remove(d)
-                    if d.kind == 'multishot':
-                        player.multishot_active = True
-                        player.multishot_end_time = pygame.time.get_ticks() + BUFF_DURATION_MS
-
-                    elif d.kind == 'shield':
-                        player.shield_active = True
-                        player.shield_uses = 3
-                        player.shield_end_time = pygame.time.get_ticks() + SHIELD_DURATION_MS
-
-                    elif d.kind == 'heal':
-                        # heal only +1, not full
-                        player.hp = min(player.hp_max, player.hp + 1)
-        
-
-            # wave cleared -> go to shop
-            if not wave.any_alive() and not in_shop:
-                player.score += 300; in_shop = True; time_since_wave_win = 0.0
-
-            # shop handling
-            if in_shop:
-                shop.open(screen, player)
-                in_shop = False
-                # respawn wave taking into account player's current position so enemies don't spawn in player
-                wave.spawn_wave(player_pos=(player.x, player.y))
-                bullets=[]; enemy_bullets=[]; drops=[]; explosions=[];
-
-            # drawing
-            screen.fill(BLACK)
-            for p in planets: p.draw(screen)
-            for s in stars: s.draw(screen)
-
-            hud_surf = font.render(f"SCORE: {player.score}   WAVE: {wave.wave_num}   ENEMIES: {sum(1 for ee in wave.enemies if ee.alive)}", True, WHITE)
-            screen.blit(hud_surf, (12, 12))
-            hpw = 160; hp_x = WIDTH - hpw - 20; hp_y = 18
-            pygame.draw.rect(screen, GRAY, (hp_x, hp_y, hpw, 18))
-            hp_frac = player.hp / max(1, player.hp_max)
-            pygame.draw.rect(screen, RED, (hp_x, hp_y, int(hpw*hp_frac), 18))
-            hp_txt = font.render(f"HP: {player.hp}/{player.hp_max}", True, WHITE); screen.blit(hp_txt, (hp_x + 6, hp_y - 18))
-            # SHIELD TIMER (top-right)
-            if player.shield_active and player.shield_end_time > pygame.time.get_ticks():
-                rem_ms = player.shield_end_time - pygame.time.get_ticks()
-                rem_s = rem_ms / 1000.0
-                shield_txt = font.render(f"SHIELD: {rem_s:.1f}s", True, SHIELD_BLUE)
-                screen.blit(shield_txt, (WIDTH - shield_txt.get_width() - 20, hp_y + 22))
-
-            # ultimate HUD
-            if player.ultimate_active:
-                rem_ms = max(0, player.ultimate_end_time - pygame.time.get_ticks())
-                ult_text = f"ULTIMATE ACTIVE: {rem_ms//1000 + 1}s"
-                ult_surf = font.render(ult_text, True, YELLOW)
-            else:
-                ult_text = "ULTIMATE: READY! Press SPACE to use" if player.ultimate_available else f"ULTIMATE: {player.ultimate_count}/{player.ultimate_needed}"
-                ult_surf = font.render(ult_text, True, YELLOW if player.ultimate_available else GRAY)
-            screen.blit(ult_surf, (12, 36))
-
-            if player.multishot_active:
-                rem = max(0, player.multishot_end_time - pygame.time.get_ticks())
-                btxt = font.render(f"MULTISHOT: {rem//1000 + 1}s", True, YELLOW); screen.blit(btxt, (12, 56))
-
-            for e in wave.enemies: e.draw(screen)
-            for b in bullets: b.draw(screen)
-            for b in enemy_bullets: b.draw(screen)
-            for d in drops: d.draw(screen)
-            player.draw(screen)
-            for ex in explosions: ex.draw(screen)
-            if not wave.any_alive(): hint = bigfont.render("Wave Cleared! Entering SHOP...", True, YELLOW); screen.blit(hint, (WIDTH//2 - hint.get_width()//2, HEIGHT//2 - 24))
-            pygame.display.flip(); continue
-
-        # GAMEOVER (fade)
-        if state == 'gameover':
-            fade_alpha += dt * 255 / 1.0
-            if fade_alpha >= 255: fade_alpha = 255
-            screen.fill(BLACK)
-            for p in planets: p.draw(screen)
-            for s in stars: s.draw(screen)
-            hud_surf = font.render(f"SCORE: {player.score}   WAVE: {wave.wave_num}   ENEMIES: {sum(1 for ee in wave.enemies if ee.alive)}", True, WHITE)
-            screen.blit(hud_surf, (12, 12))
-            for e in wave.enemies: e.draw(screen)
-            for b in bullets: b.draw(screen)
-            for b in enemy_bullets: b.draw(screen)
-            for d in drops: d.draw(screen)
-            player.draw(screen)
-            for ex in explosions: ex.draw(screen)
-            fade_surf = pygame.Surface((WIDTH, HEIGHT)); fade_surf.set_alpha(int(fade_alpha)); fade_surf.fill((0,0,0)); screen.blit(fade_surf, (0,0))
-            if fade_alpha >= 255:
-                go = bigfont.render("GAME OVER", True, RED); sub = font.render("Press ENTER or Click to return to Menu", True, WHITE)
-                screen.blit(go, (WIDTH//2 - go.get_width()//2, HEIGHT//2 - 50)); screen.blit(sub, (WIDTH//2 - sub.get_width()//2, HEIGHT//2 + 10))
-            pygame.display.flip(); continue
-
-# --------------------
-# Run
-# --------------------
-if __name__ == '__main__':
-    main()
-
-
-# --- Extended Bullet and Boss Variants appended by patcher ---
-import math as _math
-
-class Bullet:
-    def __init__(self, x, y, vy, color=YELLOW, owner="player", damage=1, vx=0):
-        # Backwards-compatible: vy is vertical speed; vx is optional horizontal speed.
-        self.x = x
-        self.y = y
-        self.vx = vx
-        self.vy = vy
-        self.color = color
-        self.owner = owner
-        self.damage = damage
-        self.radius = 4 if owner == "player" else 5
-        self.rect = pygame.Rect(int(x - self.radius), int(y - self.radius), self.radius*2, self.radius*2)
-
-    def update(self, dt):
-        scale = (dt * 60) if dt < 5 else dt
-        self.x += self.vx * scale
-        self.y += self.vy * scale
-        self.rect.center = (int(self.x), int(self.y))
-
-    def draw(self, surf):
-        pygame.draw.circle(surf, self.color, (int(self.x), int(self.y)), self.radius)
-
-    def offscreen(self):
-        return self.x < -40 or self.x > WIDTH + 40 or self.y < -40 or self.y > HEIGHT + 40
-
-# New boss variants
-class RotatingShooterBoss(Boss):
-    def __init__(self, x, y, hp=24, bullets=8, shoot_interval=0.9, spin_speed=0.9, speed=3.4):
-        super().__init__(x, y, hp=hp)
-        self.custom_shooter = True
-        self.angle = 0.0
-        self.spin_speed = spin_speed
-        self.bullets_per_shot = bullets
-        self.shoot_interval = shoot_interval
-        self.shoot_timer = shoot_interval
-        self.bullet_speed = speed
-        self.w = 140; self.h = 80
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        if not self.alive: return
-        # basic bobbing movement (reuse parent's formation math)
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.angle += self.spin_speed * dt
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = self.shoot_interval
-            for i in range(self.bullets_per_shot):
-                a = self.angle + (i * (2*_math.pi / self.bullets_per_shot))
-                vx = _math.cos(a) * self.bullet_speed
-                vy = _math.sin(a) * self.bullet_speed
-                enemy_bullets.append(Bullet(self.x, self.y + self.h//2, vy, RED, 'enemy', damage=1, vx=vx))
-
-    def draw(self, surf):
-        if not self.alive: return
-        rect = pygame.Rect(self.x - self.w/2, self.y - self.h/2, self.w, self.h)
-        pygame.draw.ellipse(surf, (160, 60, 200), rect)
-        draw_boss_healthbar(surf, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
-        pygame.draw.ellipse(surf, WHITE, rect, 3)
-        cx = int(self.x + _math.cos(self.angle) * 24)
-        cy = int(self.y + _math.sin(self.angle) * 12)
-        pygame.draw.circle(surf, YELLOW, (cx, cy), 8)
-
-class TwinShooterBoss(Boss):
-    def __init__(self, x, y, hp=20, shoot_interval=0.55, bullet_speed=4.2, horizontal=True):
-        super().__init__(x, y, hp=hp)
-        self.custom_shooter = True
-        self.shoot_interval = shoot_interval
-        self.shoot_timer = shoot_interval
-        self.bullet_speed = bullet_speed
-        self.horizontal = horizontal
-        self.w = 120; self.h = 72
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        if not self.alive: return
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = self.shoot_interval
-            if self.horizontal:
-                enemy_bullets.append(Bullet(self.x - 12, self.y, 0, RED, 'enemy', damage=1, vx=-self.bullet_speed))
-                enemy_bullets.append(Bullet(self.x + 12, self.y, 0, RED, 'enemy', damage=1, vx=self.bullet_speed))
-            else:
-                enemy_bullets.append(Bullet(self.x, self.y - 12, -self.bullet_speed, RED, 'enemy', damage=1, vx=0))
-                enemy_bullets.append(Bullet(self.x, self.y + 12, self.bullet_speed, RED, 'enemy', damage=1, vx=0))
-
-    def draw(self, surf):
-        if not self.alive: return
-        rect = pygame.Rect(self.x - self.w/2, self.y - self.h/2, self.w, self.h)
-        pygame.draw.rect(surf, (200,90,60), rect); pygame.draw.rect(surf, WHITE, rect, 3)
-        draw_boss_healthbar(surf, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
-        pygame.draw.rect(surf, BLACK, (int(self.x - 36), int(self.y - 6), 16, 12))
-        pygame.draw.rect(surf, BLACK, (int(self.x + 20), int(self.y - 6), 16, 12))
-
-class SpiralSpreadBoss(Boss):
-    def __init__(self, x, y, hp=22, bullets=4, shoot_interval=0.35, spin_speed=2.0, bullet_speed=3.8):
-        super().__init__(x, y, hp=hp)
-        self.custom_shooter = True
-        self.angle = 0.0
-        self.spin_speed = spin_speed
-        self.bullets_per_shot = bullets
-        self.shoot_interval = shoot_interval
-        self.shoot_timer = shoot_interval
-        self.bullet_speed = bullet_speed
-        self.w = 130; self.h = 76
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        if not self.alive: return
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.angle += self.spin_speed * dt
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = self.shoot_interval
-            for i in range(self.bullets_per_shot):
-                a = self.angle + (i * (2*_math.pi / self.bullets_per_shot)) + (math.sin(elapsed * 1.3) * 0.12)
-                vx = _math.cos(a) * self.bullet_speed
-                vy = _math.sin(a) * self.bullet_speed
-                enemy_bullets.append(Bullet(self.x, self.y + self.h//2, vy, RED, 'enemy', damage=1, vx=vx))
-
-# End of appended code
-
-
-# ---- New Enemy Types ----
-class MultiShotEnemy(Enemy):
-    def __init__(self, x, y):
-        super().__init__(x, y, etype="multishot", hp=7)
-        self.shoot_timer = 1.1
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = 1.1
-            for a in (-0.4, 0, 0.4):
-                enemy_bullets.append(Bullet(self.x + a*12, self.y + self.h//2, ENEMY_BULLET_SPEED_BASE+1.2, RED, 'enemy'))
-
-class DiagonalEnemy(Enemy):
-    def __init__(self, x, y):
-        super().__init__(x, y, etype="diagonal", hp=5)
-        self.shoot_timer = 1.3
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = 1.3
-            enemy_bullets.append(Bullet(self.x, self.y, ENEMY_BULLET_SPEED_BASE, RED, 'enemy', vx=2.2))
-            enemy_bullets.append(Bullet(self.x, self.y, ENEMY_BULLET_SPEED_BASE, RED, 'enemy', vx=-2.2))
-
-class BurstEnemy(Enemy):
-    def __init__(self, x, y):
-        super().__init__(x, y, etype="burst", hp=6)
-        self.cooldown = 2.2
-        self.burst = 0
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        if self.cooldown > 0:
-            self.cooldown -= dt
-        else:
-            if self.burst < 5:
-                enemy_bullets.append(Bullet(self.x, self.y, ENEMY_BULLET_SPEED_BASE+2.5, RED, 'enemy'))
-                self.burst += 1
-            else:
-                self.burst = 0
-                self.cooldown = 2.2
-
-class SniperEnemy(Enemy):
-    def __init__(self, x, y):
-        super().__init__(x, y, etype="sniper", hp=4)
-        self.shoot_timer = 2.0
-
-    def update(self, step_dx, step_dy, dt, wave, elapsed):
-        super().update(step_dx, step_dy, dt, wave, elapsed)
-        self.shoot_timer -= dt
-        if self.shoot_timer <= 0:
-            self.shoot_timer = 2.0
-            dx = player.x - self.x
-            dy = player.y - self.y
-            import math
-            d = math.hypot(dx, dy) or 1
-            vx = dx/d * (ENEMY_BULLET_SPEED_BASE+3.5)
-            vy = dy/d * (ENEMY_BULLET_SPEED_BASE+3.5)
-
-            enemy_bullets.append(Bullet(self.x, self.y, vy, RED, 'enemy', vx=vx))
+"""
+Alien Invaders — Fixed Edition (with hit-flash + knockback + 15s invincibility on hit)
+- Keeps mouse-drag + keyboard movement (unchanged)
+- Shield pickup gives 3 hits
+- Prevents enemies spawning on top of the player (uses player position when spawning)
+- Repositions dynamic enemies that fly off-screen to the top instead of deleting them
+- Collision: enemy body hit deals 1 HP and grants 15s temporary invincibility
+- Game logic lives in GameSim (fixed timestep, injected clock, seeded RNG) and runs headless;
+  main() only turns pygame input into SimInput and renders the sim
+- Sound effects are synthesized with numpy on first run and cached (--mute to play silently)
+- Entity graphics come from one sprite atlas; a frame's world draws are batched per layer
+- Drawn at a chosen internal resolution (--render-scale) and stretched to a resizable or
+  fullscreen window; everything but drawing works in WIDTH x HEIGHT logical px
+- Two renderers behind one presenter interface: Surface blits (default) or SDL2 textured
+  quads via pygame._sdl2 (--renderer sdl2)
+- Clean, ready-to-run single-file script
+
+Run: python alien_invaders_fixed_knockback_invincible.py
+Requires: pygame, numpy (pip install pygame numpy)
+"""
+
+import time
+_STARTED = time.perf_counter()  # for --time-startup
+
+import pygame
+import random
+import math
+import sys
+import os
+import json
+import struct
+import zlib
+import io
+import multiprocessing
+import signal
+import gc
+import heapq
+import argparse
+import weakref
+from collections import OrderedDict, deque
+
+# numpy backs the bullet pool (and can synthesize simple waveforms).
+import numpy as np
+
+# pygame subsystems are started on demand (see main(), get_font(), init_audio()): headless
+# runs (replays, batches, benchmarks) never open a window, audio device or font scan.
+
+# --------------------
+# Configuration
+# --------------------
+WIDTH, HEIGHT = 880, 720  # logical px: what the sim, input and layout work in
+RENDER_SCALES = {'half': 0.5, 'native': 1.0, '2x': 2.0}  # --render-scale: canvas px per logical px
+RENDER_SCALE = 1.0
+RENDER_BACKENDS = ('software', 'sdl2')  # --renderer: Surface blits, or textured quads on an SDL2 renderer
+WINDOW_TITLE = "Alien Invaders The Sequel to The Prequel to The Original Sequel Continuation Remastered Enhanced Edition"
+FPS = 60  # render cap (--max-fps); gameplay always advances in SIM_DT ticks
+SIM_DT = 1.0 / 60  # fixed simulation step (seconds); speeds are px per 1/60 s, scaled by dt * 60
+TICK_RATE = round(1 / SIM_DT)  # sim ticks per second; converts tick counts (sim.frame, replays) to seconds
+MAX_FRAME_TIME = 0.25  # s of real time simulated per rendered frame at most; longer hitches slow the game
+
+# Player
+PLAYER_START_X = WIDTH // 2
+PLAYER_Y = HEIGHT - 70
+PLAYER_RADIUS = 18
+PLAYER_BASE_HP = 6
+PLAYER_BASE_FIRE_DELAY_MS = 220
+PLAYER_SPEED = 260
+
+# Bullets
+PLAYER_BULLET_SPEED = -10
+ENEMY_BULLET_SPEED_BASE = 3.0
+OWNER_PLAYER = 0
+OWNER_ENEMY = 1
+BULLET_RADIUS = (4, 5)  # indexed by owner
+BULLET_MARGIN = 40  # bullets are culled this far outside the screen
+
+# Buffs
+BUFF_CHANCE = 0.18
+BUFF_DURATION_MS = 5000
+DROP_RADIUS = 10
+DROP_FRAMES = 32  # rotation steps pre-rendered for a drop's spinning marker
+
+# Shield duration (ms)
+SHIELD_DURATION_MS = 5000
+
+# Ultimate
+ULTIMATE_DURATION_MS = 8000
+ULTIMATE_FIRE_DELAY_MS = 180
+
+# Waves
+ENEMIES_PER_ROW = 10
+BOSS_EVERY = 5
+ENEMY_DROP = 24
+BOSS_FIRST_VOLLEY = 0.6  # s after the wave starts, then every BOSS_VOLLEY_INTERVAL
+BOSS_VOLLEY_INTERVAL = 0.4
+
+# Shop prices
+SHOP_FIRE_RATE_PRICE = 800
+SHOP_MAX_HP_PRICE = 1000
+SHOP_SPEED_PRICE = 700
+SHOP_HEAL_PRICE = 1300
+SHOP_OPTIONS = [
+    ("Faster Fire (reduce delay by 20ms)", SHOP_FIRE_RATE_PRICE, "fire"),
+    ("Increase Max HP (+1)", SHOP_MAX_HP_PRICE, "hp"),
+    ("Heal to Full (+heal)", SHOP_HEAL_PRICE, "heal"),
+]
+
+# Background
+STAR_COUNT = 140
+PLANET_COUNT = 3
+
+# Collision broadphase
+GRID_CELL = 64  # px; a normal enemy (36x30) touches at most 4 cells
+
+# Dirty-rect presenting (off by default; --dirty-rects turns it on)
+DIRTY_RECTS = False
+DIRTY_TILE = 32  # logical px; changed regions are tracked on this grid
+DIRTY_FLIP_FRACTION = 0.45  # past this share of changed tiles a full flip is cheaper
+HUD_HEIGHT = 80
+
+# Profiling: fine-grained laps and the benchmark phase each one counts towards
+PROFILE_GROUPS = {
+    'input': 'update', 'wave': 'update', 'shooting': 'update', 'entities': 'update', 'background': 'update',
+    'player_bullets': 'collision', 'enemy_bullets': 'collision', 'bodies': 'collision', 'drops': 'collision',
+    'draw': 'draw', 'present': 'present',
+}
+PROFILER_SECONDS = 3.0  # wall time the F3 overlay graph covers, whatever the frame rate
+PROFILER_REFRESH_FRAMES = 15  # the overlay panel is re-rendered this often
+
+# Particles
+PARTICLE_COUNT = 14
+PARTICLE_ALPHA_BUCKETS = 16  # fade levels pre-rendered per (color, radius)
+
+# Knockback (light = 15 px as requested)
+KNOCKBACK_PIXELS = 15
+
+# Invincibility (milliseconds)
+INVINCIBILITY_MS = 500 # 3 seconds of invincibility after hit
+RING_ALPHA_STEP = 8  # the ring's pulsing alpha is drawn from levels this far apart, each rendered once
+
+# Colors
+WHITE = (255,255,255)
+BLACK = (10,10,18)
+RED = (230,60,60)
+GREEN = (80,230,120)
+YELLOW = (255,220,50)
+CYAN = (80,200,235)
+ORANGE = (255,150,60)
+GRAY = (120,120,140)
+SHIELD_BLUE = (90,180,240)
+BULLET_COLORS = (YELLOW, RED)  # indexed by owner
+DROP_COLORS = {'multishot': YELLOW, 'shield': SHIELD_BLUE, 'heal': GREEN}
+
+FONT_NAME = "Consolas"
+FONT_FILE = "font.ttf"  # optional, next to the script; used instead of looking FONT_NAME up
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "alien-invaders")
+TEXT_CACHE_SIZE = 256  # rendered strings kept (LRU)
+
+# Sound
+SOUND_CHANNELS = 16  # fixed voice pool; see SoundEngine
+SOUND_MIN_GAP_MS = 40  # the same sound restarts at most this often
+SOUND_VOLUME = 0.4
+SOUND_BANK_VERSION = 1  # bump when synthesize_sounds() changes so cached banks are rebuilt
+# what the sim can emit (GameSim.events) and how much each matters when voices run out
+SOUND_PRIORITY = {
+    'shot': 0, 'enemy_shot': 0, 'boss_shot': 1, 'hit': 1,
+    'pickup': 2, 'explosion': 2, 'hurt': 3, 'boss_explosion': 3,
+}
+
+# --------------------
+# Utility
+# --------------------
+def clamp(v, a, b):
+    return max(a, min(b, v))
+
+def read_cache(name):
+    try:
+        with open(os.path.join(CACHE_DIR, name), "rb") as fh: return fh.read()
+    except OSError:
+        return None
+
+def write_cache(name, data):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(os.path.join(CACHE_DIR, name), "wb") as fh: fh.write(data)
+    except OSError:
+        pass  # a read-only home only costs the lookup next start
+
+_font_path = False  # not resolved yet
+def font_path():
+    """
+    The font file every get_font() size uses: FONT_FILE if bundled, else FONT_NAME from the
+    system, else None (pygame's default). The system lookup scans every installed font
+    (fc-list on Linux), so its answer is remembered in CACHE_DIR; delete it to look again.
+    """
+    global _font_path
+    if _font_path is not False: return _font_path
+    bundled = os.path.join(os.path.dirname(os.path.abspath(__file__)), FONT_FILE)
+    if os.path.isfile(bundled):
+        _font_path = bundled; return _font_path
+    cached = read_cache("font-path")
+    if cached is not None and (not cached or os.path.isfile(cached.decode())):
+        _font_path = cached.decode() or None; return _font_path
+    _font_path = pygame.font.match_font(FONT_NAME)
+    write_cache("font-path", (_font_path or "").encode())
+    return _font_path
+
+_fonts = {}
+def get_font(size):
+    """Font for `size` logical px, rasterized at the render scale."""
+    if not pygame.font.get_init(): pygame.font.init(); _fonts.clear()
+    font = _fonts.get(size)
+    if font is None: font = _fonts[size] = pygame.font.Font(font_path(), max(1, px(size)))
+    return font
+
+def init_audio():
+    """Open the mixer on first use; False when there is no audio device."""
+    if pygame.mixer.get_init(): return True
+    try:
+        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+    except pygame.error:
+        return False
+    return True
+
+class TextCache:
+    """LRU cache of rendered text, keyed by (font, text, color); fonts key by identity."""
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize; self.surfaces = OrderedDict()
+        self.hits = 0; self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key); self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self.surfaces[key] = font.render(text, True, color)
+        if len(self.surfaces) > self.maxsize: self.surfaces.popitem(last=False)
+        return surf
+
+text_cache = TextCache()
+
+def blit_text(surf, img, x, y):
+    """Blit rendered text at logical (x, y), centred across surf when x is None; returns the canvas rect."""
+    return surf.blit(img, (surf.get_width()//2 - img.get_width()//2 if x is None else px(x), px(y)))
+
+_healthbar_bgs = {}
+def draw_boss_healthbar(batch, x, y, w, h, hp, hp_max):
+    # transparent background (one cached surface per bar size; translucent, so not on the atlas)
+    bg = _healthbar_bgs.get((w, h))
+    if bg is None:
+        bg = _healthbar_bgs[(w, h)] = pygame.Surface((px(w), px(h)), pygame.SRCALPHA)
+        bg.fill((0,0,0,120))
+    x, y = px(x), px(y); w, h = bg.get_size(); b = max(1, px(2))
+    frame, bar = healthbar_sprites(w, h, b)
+    batch.add_surface(LAYER_ENEMIES, bg, x, y)
+    # hp bar: the left `fill` px of a full-width red region
+    fill = int((hp/hp_max) * (w-2*b))
+    if fill > 0: batch.add(LAYER_ENEMIES, pygame.Rect(bar.x, bar.y, fill, bar.h), x+b, y+b)
+    batch.add(LAYER_ENEMIES, frame, x, y)
+
+# --------------------
+# Sound (synthesized once with numpy, cached in CACHE_DIR, played through a fixed voice pool)
+# --------------------
+def _sweep(f0, f1, secs, rate, shape='square'):
+    # an oscillator gliding linearly from f0 to f1 Hz; returns (wave, t)
+    t = np.arange(int(secs * rate)) / rate
+    phase = 2 * np.pi * np.cumsum(np.linspace(f0, f1, t.size)) / rate
+    if shape == 'square': wave = np.sign(np.sin(phase))
+    elif shape == 'saw': wave = (phase / np.pi) % 2.0 - 1.0
+    else: wave = np.sin(phase)
+    return wave, t
+
+def _noise(secs, rate, smooth, rng):
+    # white noise, low-passed by a `smooth`-sample moving average (loudness kept)
+    wave = rng.uniform(-1, 1, int(secs * rate))
+    if smooth > 1: wave = np.convolve(wave, np.full(smooth, 1.0 / smooth), 'same') * math.sqrt(smooth)
+    return wave, np.arange(wave.size) / rate
+
+def synthesize_sounds(rate):
+    """Mono float waveforms in [-1, 1], one per SOUND_PRIORITY name."""
+    rng = np.random.default_rng(SOUND_BANK_VERSION)
+    out = {}
+    w, t = _sweep(1500, 520, 0.07, rate); out['shot'] = w * np.exp(-t * 45) * 0.45
+    w, t = _sweep(420, 250, 0.09, rate); out['enemy_shot'] = w * np.exp(-t * 35) * 0.3
+    w, t = _sweep(170, 90, 0.16, rate, 'saw'); out['boss_shot'] = w * (1 + 0.3 * np.sin(2 * np.pi * 30 * t)) * np.exp(-t * 18) * 0.45
+    w, t = _noise(0.06, rate, 4, rng); out['hit'] = w * np.exp(-t * 60) * 0.6
+    w, t = _noise(0.55, rate, 24, rng); out['explosion'] = w * np.exp(-t * 7) * 0.8
+    w, t = _noise(1.3, rate, 64, rng); rumble, _ = _sweep(60, 28, 1.3, rate, 'sine')
+    out['boss_explosion'] = (w * 0.8 + rumble * 0.5) * np.exp(-t * 2.8)
+    w, t = _sweep(320, 70, 0.28, rate); out['hurt'] = w * np.exp(-t * 9) * 0.5
+    notes = [_sweep(f, f, 0.06, rate, 'sine') for f in (660, 880, 1320)]
+    out['pickup'] = np.concatenate([w * np.exp(-t * 25) for w, t in notes]) * 0.6
+    for name, wave in out.items():
+        fade = min(wave.size, int(rate * 0.004))  # no click at the tail
+        wave[-fade:] *= np.linspace(1, 0, fade); out[name] = np.clip(wave, -1, 1)
+    return out
+
+_PCM_TYPES = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32}
+
+class SoundBank:
+    """
+    Every game sound as a ready pygame Sound. The interleaved PCM is synthesized once per mixer
+    format and kept in CACHE_DIR; later starts just load it.
+    """
+    def __init__(self):
+        rate, size, channels = pygame.mixer.get_init()
+        name = f"sounds-v{SOUND_BANK_VERSION}-{rate}-{size}-{channels}.npz"
+        pcm = self._load(name)
+        if pcm is None:
+            dtype = _PCM_TYPES[size]
+            pcm = {k: self._to_pcm(w, dtype, channels) for k, w in synthesize_sounds(rate).items()}
+            buf = io.BytesIO(); np.savez(buf, **pcm); write_cache(name, buf.getvalue())
+        self.sounds = {}
+        for k, samples in pcm.items():
+            sound = self.sounds[k] = pygame.mixer.Sound(buffer=samples)
+            sound.set_volume(SOUND_VOLUME)
+
+    @staticmethod
+    def _to_pcm(wave, dtype, channels):
+        if dtype is not np.float32:
+            info = np.iinfo(dtype)
+            wave = np.round((wave + 1) * 0.5 * (int(info.max) - int(info.min)) + int(info.min))
+        return np.repeat(wave.astype(dtype), channels)
+
+    @staticmethod
+    def _load(name):
+        data = read_cache(name)
+        if data is None: return None
+        try:
+            with np.load(io.BytesIO(data)) as z: pcm = {k: z[k] for k in z.files}
+        except Exception:
+            return None  # a damaged cache file is just rebuilt
+        return pcm if pcm.keys() == SOUND_PRIORITY.keys() else None
+
+class SoundEngine:
+    """
+    Plays GameSim.events on SOUND_CHANNELS channels. Sounds and channels are all made up front,
+    so play() only chooses a voice: a free one, else the oldest one playing something of no
+    higher priority (stolen), else the sound is dropped. A sound restarts at most every
+    SOUND_MIN_GAP_MS, so a boss barrage is a steady rattle rather than hundreds of plays.
+    With enabled=False, or no audio device, every call is a no-op.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled and init_audio()
+        self.played = self.stolen = self.dropped = 0
+        if not self.enabled: return
+        self.bank = SoundBank().sounds
+        pygame.mixer.set_num_channels(SOUND_CHANNELS)
+        self.channels = [pygame.mixer.Channel(i) for i in range(SOUND_CHANNELS)]
+        self.started = [0.0] * SOUND_CHANNELS; self.priority = [0] * SOUND_CHANNELS
+        self.last = dict.fromkeys(SOUND_PRIORITY, -SOUND_MIN_GAP_MS)
+
+    def play(self, name, now):
+        if now - self.last[name] < SOUND_MIN_GAP_MS: return
+        prio = SOUND_PRIORITY[name]; started = self.started; pick = None
+        for i, ch in enumerate(self.channels):
+            if not ch.get_busy(): pick = i; break
+            if self.priority[i] <= prio and (pick is None or started[i] < started[pick]): pick = i
+        if pick is None: self.dropped += 1; return
+        ch = self.channels[pick]
+        if ch.get_busy(): self.stolen += 1
+        ch.play(self.bank[name])
+        started[pick] = now; self.priority[pick] = prio; self.last[name] = now; self.played += 1
+
+    def play_events(self, events):
+        if not self.enabled or not events: return
+        now = time.perf_counter() * 1000.0
+        for name in events: self.play(name, now)
+
+# --------------------
+# Sprite atlas (entity frames are rasterized once onto one sheet and drawn as regions of it)
+# --------------------
+ENEMY_FRAMES = (
+    ("  ██  ", " █  █ ", "██████", "█ ██ █", "█    █", " █  █ "),
+    ("  ██  ", " █  █ ", "██████", "█ ██ █", " █  █ ", "█    █"),
+)
+ENEMY_PIXEL = 3  # screen px per frame cell
+ENEMY_TYPES = ('basic', 'fast', 'zig', 'tank', 'multishot', 'diagonal', 'burst', 'sniper')
+SPRITE_COLORKEY = (255, 0, 255)
+ATLAS_WIDTH = 512  # logical px; the sheet grows downwards as frames are added
+LAYERS = ('enemies', 'bullets', 'drops', 'player', 'particles', 'ui')  # draw order, back to front; ui overlays the world
+LAYER_ENEMIES, LAYER_BULLETS, LAYER_DROPS, LAYER_PLAYER, LAYER_PARTICLES, LAYER_UI = range(len(LAYERS))
+
+atlas = None  # the Atlas; build_atlas() makes it once a display (and render scale) is set
+_render_scale = 1.0  # canvas px per logical px; only drawing reads it
+
+def set_render_scale(scale):
+    """Draw at `scale` canvas px per logical px from now on; cached art is rebuilt at that size."""
+    global _render_scale
+    _render_scale = scale
+    for cache in (_disc_sprites, _ring_sprites, _healthbar_bgs, _fonts, text_cache.surfaces): cache.clear()
+
+def px(v):
+    """Logical px -> canvas px."""
+    return int(v * _render_scale)
+
+def px_rect(x, y, w, h):
+    """The canvas rect covering a logical one."""
+    s = _render_scale; x0 = math.floor(x * s); y0 = math.floor(y * s)
+    return x0, y0, math.ceil((x + w) * s) - x0, math.ceil((y + h) * s) - y0
+
+def to_logical(pos):
+    """Canvas px (mouse positions) -> whole logical px."""
+    return int(pos[0] / _render_scale), int(pos[1] / _render_scale)
+
+def new_sprite_surface(w, h):
+    s = pygame.Surface((w, h))
+    s.fill(SPRITE_COLORKEY); s.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+    return s
+
+def finish_sprite(s):
+    # art is drawn in logical px: scale it to the canvas, then convert to the display format
+    # once one exists; headless sims never draw anyway
+    if _render_scale != 1: s = pygame.transform.scale(s, (max(1, px(s.get_width())), max(1, px(s.get_height()))))
+    return s.convert() if pygame.display.get_surface() is not None else s
+
+class Atlas:
+    """
+    Entity frames packed onto one colorkeyed sheet, so every world draw is a region of the
+    same surface. Shelf packing, rows top to bottom; a full sheet doubles in height and
+    regions keep their place. Plain colorkey, not RLEACCEL: RLE makes sub-rect blits from a
+    large sheet several times slower than the plain key.
+    """
+    PAD = 1  # px between regions
+
+    def __init__(self, width=None):
+        self.regions = {}; self.x = self.y = self.row_h = 0
+        self.surface = self._sheet(width or px(ATLAS_WIDTH), 64)
+
+    def _sheet(self, w, h):
+        sheet = pygame.Surface((w, h)); sheet.fill(SPRITE_COLORKEY)
+        if pygame.display.get_surface() is not None: sheet = sheet.convert()
+        sheet.set_colorkey(SPRITE_COLORKEY)
+        return sheet
+
+    def add(self, key, spr):
+        """Pack a colorkeyed sprite (canvas px) under key; returns its region."""
+        w, h = spr.get_size(); sheet = self.surface
+        if self.x + w > sheet.get_width(): self.x = 0; self.y += self.row_h + self.PAD; self.row_h = 0
+        if self.y + h > sheet.get_height():
+            grown = self._sheet(sheet.get_width(), max(sheet.get_height() * 2, self.y + h)); grown.blit(sheet, (0, 0))
+            self.surface = sheet = grown
+        region = self.regions[key] = pygame.Rect(self.x, self.y, w, h)
+        sheet.blit(spr, region)
+        self.x += w + self.PAD; self.row_h = max(self.row_h, h)
+        return region
+
+def enemy_sprite(etype, arm_state, color):
+    key = ('enemy', etype, arm_state, color)
+    region = atlas.regions.get(key)
+    if region is None:
+        frame = ENEMY_FRAMES[arm_state]
+        spr = new_sprite_surface(len(frame[0]) * ENEMY_PIXEL, len(frame) * ENEMY_PIXEL)
+        for ry, row in enumerate(frame):
+            for rx, ch in enumerate(row):
+                if ch == "█": spr.fill(color, (rx * ENEMY_PIXEL, ry * ENEMY_PIXEL, ENEMY_PIXEL, ENEMY_PIXEL))
+        region = atlas.add(key, finish_sprite(spr))
+    return region
+
+def boss_sprite(boss):
+    key = ('boss', type(boss), boss.w, boss.h)
+    region = atlas.regions.get(key)
+    if region is None:
+        region = atlas.add(key, finish_sprite(boss.render_body()))
+    return region
+
+def circle_sprite(color, r, width=0):
+    """A disc (or a ring `width` thick) of radius r canvas px, centred at (r, r) of its region."""
+    key = ('circle', color, r, width)
+    region = atlas.regions.get(key)
+    if region is None:
+        spr = new_sprite_surface(r*2 + 1, r*2 + 1); pygame.draw.circle(spr, color, (r, r), r, width)
+        region = atlas.add(key, spr)
+    return region
+
+def drop_sprite(kind, r, frame):
+    """A drop of radius r canvas px with its marker at step `frame` of DROP_FRAMES, centred at (r+1, r+1)."""
+    key = ('drop', kind, r, frame)
+    region = atlas.regions.get(key)
+    if region is None:
+        c = r + 1; a = frame * 2 * math.pi / DROP_FRAMES
+        spr = new_sprite_surface(c*2 + 1, c*2 + 1)
+        pygame.draw.circle(spr, DROP_COLORS[kind], (c, c), r)
+        pygame.draw.line(spr, WHITE, (c, c), (c + int(r * math.cos(a)), c + int(r * math.sin(a))), max(1, px(2)))
+        region = atlas.add(key, spr)
+    return region
+
+def player_sprite(r):
+    """The ship for radius r canvas px; its centre sits at (r+2, r+2) of the region."""
+    key = ('player', r)
+    region = atlas.regions.get(key)
+    if region is None:
+        c = r + 2; spr = new_sprite_surface(c*2 + 1, c*2 + 1)
+        pts = [(c, c - r), (c - r, c + r), (c + r, c + r)]
+        pygame.draw.polygon(spr, CYAN, pts); pygame.draw.polygon(spr, WHITE, pts, max(1, px(2)))
+        region = atlas.add(key, spr)
+    return region
+
+def healthbar_sprites(w, h, b):
+    """(frame, bar) regions for a w x h health bar with a b px border; the bar is the full inner width."""
+    key = ('healthbar', w, h, b)
+    frame = atlas.regions.get(key)
+    if frame is None:
+        spr = new_sprite_surface(w, h); pygame.draw.rect(spr, WHITE, (0, 0, w, h), b); frame = atlas.add(key, spr)
+        bar = new_sprite_surface(w - 2*b, h - 2*b); bar.fill(RED); atlas.add(key + ('bar',), bar)
+    return frame, atlas.regions[key + ('bar',)]
+
+def build_atlas():
+    """Lay out every entity frame up front; call once after open_display() (which sets the render scale)."""
+    global atlas
+    atlas = Atlas()
+    for etype in ENEMY_TYPES:
+        for arm_state in (0, 1): enemy_sprite(etype, arm_state, GREEN)
+    for cls in (Boss, RotatingShooterBoss, TwinShooterBoss, SpiralSpreadBoss): boss_sprite(cls(0, 0))
+    for owner in (OWNER_PLAYER, OWNER_ENEMY): circle_sprite(BULLET_COLORS[owner], px(BULLET_RADIUS[owner]))
+    for kind in DROP_COLORS:
+        for frame in range(DROP_FRAMES): drop_sprite(kind, px(DROP_RADIUS), frame)
+    player_sprite(px(PLAYER_RADIUS)); circle_sprite(SHIELD_BLUE, px(PLAYER_RADIUS + 10), max(1, px(3)))
+    circle_sprite(YELLOW, px(8)); healthbar_sprites(px(120), px(14), max(1, px(2)))
+
+# --------------------
+# Background (stars & planets)
+# --------------------
+class Planet:
+    __slots__ = ('x', 'y', 'speed', 'size', 'color', 'angle', 'spin', 'sprites', 'drawn', 'marked')
+    def __init__(self, w, h):
+        self.x = random.uniform(80, w - 80)
+        self.y = random.uniform(-2000, -300)
+        self.speed = random.uniform(0.02, 0.12)
+        self.size = random.randint(40, 120)
+        self.color = (
+            random.randint(80, 230),
+            random.randint(80, 230),
+            random.randint(80, 230)
+        )
+        self.angle = random.uniform(0, math.pi*2)
+        self.spin = random.uniform(-0.6, 0.6)
+        self.sprites = None
+        self.drawn = None; self.marked = None  # last drawn bounds / last bounds handed to a presenter
+
+    def update(self, dt, h):
+        self.y += self.speed * dt
+        self.angle += self.spin * dt * 0.02
+        if self.y > h + 200:
+            self.x = random.uniform(80, WIDTH - 80)
+            self.y = random.uniform(-1200, -300)
+            self.speed = random.uniform(0.02, 0.12)
+            self.size = random.randint(40, 120)
+            self.color = (
+                random.randint(80, 230),
+                random.randint(80, 230),
+                random.randint(80, 230)
+            )
+
+    def _render(self):
+        # body and highlight are drawn once per size/color; only their offsets move
+        body = new_sprite_surface(self.size*2 + 1, self.size*2 + 1)
+        pygame.draw.circle(body, self.color, (self.size, self.size), self.size)
+        hr = int(self.size * 0.22)
+        highlight_color = (min(255, self.color[0]+30), min(255, self.color[1]+30), min(255, self.color[2]+30))
+        highlight = new_sprite_surface(hr*2 + 1, hr*2 + 1)
+        pygame.draw.circle(highlight, highlight_color, (hr, hr), hr)
+        self.sprites = (self.size, self.color, finish_sprite(body), finish_sprite(highlight), hr)
+
+    def draw(self, surf):
+        cx = px(self.x); cy = px(self.y); size = px(self.size)
+        if cy + size < 0 or cy - size > surf.get_height(): self.drawn = None; return
+        if self.sprites is None or self.sprites[:2] != (self.size, self.color): self._render()
+        _, _, body, highlight, hr = self.sprites
+        self.drawn = surf.blit(body, (cx - size, cy - size))
+        hx = cx + px(self.size * 0.25 * math.cos(self.angle))
+        hy = cy - px(self.size * 0.25 * math.sin(self.angle))
+        self.drawn.union_ip(surf.blit(highlight, (hx - px(hr), hy - px(hr))))
+
+class Background:
+    """
+    Starfield and planets behind every screen, composited as fill -> planet sprites -> stars.
+    Stars are NumPy arrays (position, speed, size, twinkle phase) moved and twinkled in one
+    vectorized pass and written straight into the target's pixels, so the star count can
+    go into the thousands. Positions are logical px, scaled as they are drawn.
+    Cosmetic only: uses its own generator, never the sim's.
+    """
+    def __init__(self, w, h, star_count=STAR_COUNT, planet_count=PLANET_COUNT, rng=None):
+        self.w = w; self.h = h
+        self.rng = rng = rng if rng is not None else np.random.default_rng()
+        self.sx = rng.uniform(0, w, star_count); self.sy = rng.uniform(0, h, star_count)
+        self.speed = rng.uniform(0.6, 2.2, star_count)
+        self.size = rng.integers(1, 4, star_count)
+        self.phase = rng.uniform(0, math.pi*2, star_count)
+        self.planets = [Planet(w, h) for _ in range(planet_count)]
+        self.stamps = {size: circle_offsets(max(1, px(size))) for size in (1, 2, 3)}
+        self._luts = {}; self._star_sprites = {}
+
+    def update(self, dt):
+        for p in self.planets: p.update(dt, self.h)
+        self.sy += self.speed * dt
+        self.phase += dt * 0.1
+        wrapped = self.sy > self.h
+        k = int(wrapped.sum())
+        if k:
+            self.sy[wrapped] = -2
+            self.sx[wrapped] = self.rng.uniform(0, self.w, k)
+
+    def draw(self, surf):
+        surf.fill(BLACK)
+        for p in self.planets: p.draw(surf)
+        brightness = (150 + np.trunc(100 * np.sin(self.phase))).astype(np.intp)
+        if surf.get_bytesize() == 4: self._draw_stars_pixels(surf, brightness)
+        else: self._draw_stars_blits(surf, brightness)
+
+    def _draw_stars_pixels(self, surf, brightness):
+        key = surf.get_masks()
+        lut = self._luts.get(key)
+        if lut is None:
+            lut = self._luts[key] = np.array([surf.map_rgb((a, a, a)) for a in range(256)], dtype=np.int64)
+        xs = (self.sx * _render_scale).astype(np.intp); ys = (self.sy * _render_scale).astype(np.intp)
+        pixels = pygame.surfarray.pixels2d(surf)
+        pw, ph = pixels.shape
+        colors = lut[brightness].astype(pixels.dtype)
+        for size, (dx, dy) in self.stamps.items():
+            sel = self.size == size
+            if not sel.any(): continue
+            X = (xs[sel][:, None] + dx).ravel(); Y = (ys[sel][:, None] + dy).ravel()
+            C = np.repeat(colors[sel], len(dx))
+            ok = (X >= 0) & (X < pw) & (Y >= 0) & (Y < ph)
+            pixels[X[ok], Y[ok]] = C[ok]
+        del pixels  # unlock the surface
+
+    def _draw_stars_blits(self, surf, brightness):
+        # non-32-bit targets: one blits() call over cached star sprites
+        sprites = self._star_sprites; seq = []; s = _render_scale
+        for x, y, size, a in zip((self.sx * s).astype(np.intp).tolist(), (self.sy * s).astype(np.intp).tolist(), self.size.tolist(), brightness.tolist()):
+            spr = sprites.get((size, a)); r = max(1, px(size))
+            if spr is None:
+                spr = sprites[(size, a)] = new_sprite_surface(r*2 + 1, r*2 + 1)
+                pygame.draw.circle(spr, (a, a, a), (r, r), r)
+            seq.append((spr, (x - r, y - r)))
+        surf.blits(seq, doreturn=False)
+
+    def mark_dirty(self, presenter):
+        # every star moves each frame; planets only when their drawn pixels shift
+        s = _render_scale
+        presenter.mark_boxes((self.sx - 3) * s, (self.sy - 3) * s, (self.sx + 3) * s, (self.sy + 3) * s)
+        for p in self.planets:
+            if p.drawn == p.marked: continue
+            if p.marked: presenter.mark_rect(*p.marked)
+            if p.drawn: presenter.mark_rect(*p.drawn)
+            p.marked = p.drawn
+
+def circle_offsets(r):
+    """Pixel offsets pygame.draw.circle covers for radius r, as (dx, dy) arrays."""
+    s = pygame.Surface((r*2 + 3, r*2 + 3)); s.fill((0, 0, 0))
+    pygame.draw.circle(s, (255, 255, 255), (r + 1, r + 1), r)
+    dx, dy = np.nonzero(pygame.surfarray.array2d(s))
+    return dx - (r + 1), dy - (r + 1)
+
+# --------------------
+# Visual globe for menu
+# --------------------
+def draw_spinning_globe(surf, cx, cy, radius, angle):
+    cx, cy, radius = px(cx), px(cy), px(radius); thick = max(1, px(2))
+    pygame.draw.circle(surf, (12,60,110), (cx, cy), radius)
+    pygame.draw.circle(surf, (24,120,200), (cx, cy), radius, thick)
+    rect = pygame.Rect(cx - radius, cy - radius, radius*2, radius*2)
+    for i in range(6):
+        a = angle + i * 0.9
+        pygame.draw.arc(surf, (80,170,220), rect, a, a + math.pi, thick)
+    for j in range(-2,3):
+        w = thick if j==0 else 1
+        ry = int(cy + j * (radius * 0.35))
+        pygame.draw.ellipse(surf, (80,160,200), (cx - int(radius*0.85), ry - px(6), int(radius*1.7), px(12)), w)
+    for k in range(12):
+        theta = angle * 1.6 + k * (2*math.pi/12)
+        r = radius * 0.65
+        x = int(cx + math.cos(theta) * r)
+        y = int(cy + math.sin(theta) * r * 0.5)
+        pygame.draw.circle(surf, (200,230,255), (x, y), thick)
+
+# --------------------
+# Entities
+# --------------------
+class ArrayPool:
+    """
+    Structure-of-arrays storage: one NumPy array per entry in FIELDS, with only the
+    first `n` slots live. Capacity doubles when full; removal swap-fills the holes with
+    live entries from the tail, so nothing is shifted and order is not kept.
+    Spawns that fit the current capacity count as hits, ones that grow it as misses.
+    """
+    FIELDS = ()
+
+    def __init__(self, capacity=256):
+        self.n = 0; self.capacity = capacity; self.hits = 0; self.misses = 0
+        for name, dtype in self.FIELDS: setattr(self, name, np.zeros(capacity, dtype))
+
+    def __len__(self):
+        return self.n
+
+    def _reserve(self, count):
+        need = self.n + count
+        if need <= self.capacity: self.hits += 1; return
+        self.misses += 1
+        cap = self.capacity
+        while cap < need: cap *= 2
+        for name, dtype in self.FIELDS:
+            arr = np.zeros(cap, dtype); arr[:self.n] = getattr(self, name)[:self.n]; setattr(self, name, arr)
+        self.capacity = cap
+
+    def clear(self):
+        self.n = 0
+
+    def remove_indices(self, idx):
+        if len(idx) == 0: return
+        mask = np.zeros(self.n, bool); mask[idx] = True
+        self.remove_mask(mask)
+
+    def remove_mask(self, mask):
+        n = self.n
+        dead = np.flatnonzero(mask)
+        if not len(dead): return
+        k = n - len(dead)
+        # dead slots below k are refilled by the live entries found at or above k
+        holes = dead[dead < k]
+        if len(holes):
+            movers = np.flatnonzero(~mask[k:]) + k
+            for name, _ in self.FIELDS:
+                arr = getattr(self, name); arr[holes] = arr[movers]
+        self.n = k
+
+class ParticleSystem(ArrayPool):
+    """
+    Every explosion particle of a run in one pool. Particles fade out over `life`
+    seconds while growing from 1 to 4 px; drawing queues the whole pool as one batch over
+    pre-rendered discs keyed by (color, radius, alpha bucket).
+    Cosmetic only, so it draws from its own NumPy generator, not the gameplay RNG.
+    """
+    FIELDS = (("x", np.float64), ("y", np.float64), ("vx", np.float64), ("vy", np.float64),
+              ("time", np.float64), ("life", np.float64), ("color", np.int16))
+
+    def __init__(self, rng=None, capacity=512):
+        super().__init__(capacity)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.palette = []; self._color_ids = {}
+
+    def emit(self, x, y, color=ORANGE, num=PARTICLE_COUNT):
+        rng = self.rng
+        cid = self._color_ids.get(color)
+        if cid is None:
+            cid = self._color_ids[color] = len(self.palette); self.palette.append(color)
+        self._reserve(num); sl = slice(self.n, self.n + num)
+        self.x[sl] = x + rng.uniform(-6, 6, num); self.y[sl] = y + rng.uniform(-6, 6, num)
+        self.vx[sl] = rng.uniform(-3, 3, num); self.vy[sl] = rng.uniform(-6, -1, num)
+        self.time[sl] = 0.0; self.life[sl] = rng.uniform(0.5, 1.1, num); self.color[sl] = cid
+        self.n += num
+
+    def update(self, dt):
+        n = self.n
+        if not n: return
+        scale = dt * 60
+        self.time[:n] += dt; self.x[:n] += self.vx[:n] * scale; self.y[:n] += self.vy[:n] * scale; self.vy[:n] += 10 * dt
+        self.remove_mask(self.time[:n] >= self.life[:n])
+
+    def draw(self, batch):
+        n = self.n
+        if not n: return
+        alpha = np.clip(1 - self.time[:n] / self.life[:n], 0, 1)
+        r = (3 * (1 - alpha) + 1).astype(np.int32)
+        bucket = np.ceil(alpha * PARTICLE_ALPHA_BUCKETS).astype(np.int32)
+        keys, kinds = np.unique((self.color[:n] * 8 + r) * (PARTICLE_ALPHA_BUCKETS + 1) + bucket, return_inverse=True)
+        sprites = []
+        for k in keys.tolist():
+            b = k % (PARTICLE_ALPHA_BUCKETS + 1); rest = k // (PARTICLE_ALPHA_BUCKETS + 1)
+            sprites.append(disc_sprite(self.palette[rest // 8], rest % 8, b))
+        s = _render_scale; rc = np.maximum(1, (r * s).astype(np.int32))  # disc radius on the canvas
+        batch.add_many(LAYER_PARTICLES, sprites, kinds, (self.x[:n] * s - rc).astype(np.int32), (self.y[:n] * s - rc).astype(np.int32))
+
+_disc_sprites = {}
+def disc_sprite(color, r, bucket):
+    """Translucent disc of logical radius r at alpha bucket/PARTICLE_ALPHA_BUCKETS, rendered once (per-pixel alpha, so not on the atlas)."""
+    key = (color, r, bucket)
+    spr = _disc_sprites.get(key)
+    if spr is None:
+        rc = max(1, px(r))
+        spr = pygame.Surface((rc*2, rc*2), pygame.SRCALPHA)
+        pygame.draw.circle(spr, (*color, int(255 * bucket / PARTICLE_ALPHA_BUCKETS)), (rc, rc), rc)
+        if pygame.display.get_surface() is not None: spr = spr.convert_alpha()
+        _disc_sprites[key] = spr
+    return spr
+
+class BulletPool(ArrayPool):
+    """
+    Bullets as a structure of arrays (x, y, vx, vy, radius, damage, owner).
+    Integration, off-screen culling and player hit tests are single vectorized
+    operations. Velocities are in px per 1/60 s, like the old Bullet.
+    """
+    FIELDS = (("x", np.float64), ("y", np.float64), ("vx", np.float64), ("vy", np.float64),
+              ("radius", np.int16), ("damage", np.int16), ("owner", np.int8))
+
+    def spawn(self, x, y, vx, vy, owner=OWNER_ENEMY, damage=1):
+        self._reserve(1); i = self.n
+        self.x[i] = x; self.y[i] = y; self.vx[i] = vx; self.vy[i] = vy
+        self.radius[i] = BULLET_RADIUS[owner]; self.damage[i] = damage; self.owner[i] = owner
+        self.n = i + 1
+
+    def spawn_many(self, xs, ys, vxs, vys, owner=OWNER_ENEMY, damage=1):
+        """Append a whole volley at once; scalars broadcast against the arrays."""
+        xs, ys, vxs, vys = np.broadcast_arrays(xs, ys, vxs, vys)
+        k = xs.size
+        if not k: return
+        self._reserve(k); sl = slice(self.n, self.n + k)
+        self.x[sl] = xs.ravel(); self.y[sl] = ys.ravel(); self.vx[sl] = vxs.ravel(); self.vy[sl] = vys.ravel()
+        self.radius[sl] = BULLET_RADIUS[owner]; self.damage[sl] = damage; self.owner[sl] = owner
+        self.n += k
+
+    def update(self, dt):
+        n = self.n
+        scale = dt * 60
+        self.x[:n] += self.vx[:n] * scale
+        self.y[:n] += self.vy[:n] * scale
+
+    def cull(self):
+        n = self.n
+        x = self.x[:n]; y = self.y[:n]
+        self.remove_mask((x < -BULLET_MARGIN) | (x > WIDTH + BULLET_MARGIN) | (y < -BULLET_MARGIN) | (y > HEIGHT + BULLET_MARGIN))
+
+    def hits_box(self, cx, cy, half, owner=None):
+        """Indices of bullets whose box overlaps the square of half-size `half` around (cx, cy)."""
+        n = self.n
+        reach = self.radius[:n] + half
+        mask = (np.abs(self.x[:n] - cx) < reach) & (np.abs(self.y[:n] - cy) < reach)
+        if owner is not None: mask &= self.owner[:n] == owner
+        return np.flatnonzero(mask)
+
+    def draw(self, batch):
+        n = self.n
+        if not n: return
+        sprites = [circle_sprite(BULLET_COLORS[o], px(BULLET_RADIUS[o])) for o in (OWNER_PLAYER, OWNER_ENEMY)]
+        s = _render_scale; r = (self.radius[:n] * s).astype(np.int32)
+        batch.add_many(LAYER_BULLETS, sprites, self.owner[:n], (self.x[:n] * s).astype(np.int32) - r, (self.y[:n] * s).astype(np.int32) - r)
+
+class ObjectPool:
+    """
+    Free list for short-lived objects: acquire(*args) recycles a released instance through
+    its reset(*args), or builds a new one with factory(*args) when the list is empty.
+    """
+    def __init__(self, factory):
+        self.factory = factory; self.free = []
+        self.hits = 0; self.misses = 0
+
+    def acquire(self, *args):
+        if self.free:
+            self.hits += 1; obj = self.free.pop(); obj.reset(*args)
+            return obj
+        self.misses += 1
+        return self.factory(*args)
+
+    def release(self, obj): self.free.append(obj)
+    def release_all(self, objs): self.free.extend(objs)
+
+class BuffDrop:
+    __slots__ = ('x', 'y', 'kind', 'vy', 'radius', 'rect', 'angle')
+    def __init__(self, x, y, kind='multishot'):
+        self.vy = 2.2; self.radius = DROP_RADIUS
+        self.rect = pygame.Rect(0, 0, self.radius*2, self.radius*2)
+        self.reset(x, y, kind)
+    def reset(self, x, y, kind='multishot'):
+        self.x = x; self.y = y; self.kind = kind; self.angle = 0
+        self.rect.topleft = (x - self.radius, y - self.radius)
+    def update(self, dt):
+        self.y += self.vy * (dt * 60); self.angle += dt * 5; self.rect.center = (int(self.x), int(self.y))
+    def draw(self, batch):
+        if self.kind not in DROP_COLORS: return
+        r = px(self.radius); frame = int(self.angle * DROP_FRAMES / (2 * math.pi) + 0.5) % DROP_FRAMES
+        batch.add(LAYER_DROPS, drop_sprite(self.kind, r, frame), px(self.x) - r - 1, px(self.y) - r - 1)
+
+# --------------------
+# Player
+# --------------------
+_ring_sprites = {}
+
+def ring_sprite(radius, bucket):
+    """Invincibility ring around a player of logical radius `radius` at alpha bucket*RING_ALPHA_STEP, rendered once (translucent, so not on the atlas)."""
+    key = (radius, bucket)
+    spr = _ring_sprites.get(key)
+    if spr is None:
+        r = px(radius)
+        spr = pygame.Surface((r*4, r*4), pygame.SRCALPHA)
+        pygame.draw.circle(spr, (200,200,255,bucket * RING_ALPHA_STEP), (r*2, r*2), px(radius+14), px(6))
+        if pygame.display.get_surface() is not None: spr = spr.convert_alpha()
+        _ring_sprites[key] = spr
+    return spr
+
+class Player:
+    __slots__ = (
+        'clock', 'rng', 'x', 'y', 'radius', 'speed', 'hp', 'hp_max', 'score', 'lives',
+        'fire_delay_ms', 'last_shot_time', 'multishot_active', 'multishot_end_time',
+        'shield_active', 'shield_end_time', 'shield_uses', 'hit_flash', 'hit_flash_end', 'invincible_until',
+        'ultimate_count', 'ultimate_needed', 'ultimate_available', 'ultimate_active', 'ultimate_end_time',
+        'ultimate_fire_delay_ms', 'last_ultimate_shot_time',
+    )
+    def __init__(self, clock, rng=random):
+        # all timers read the sim clock (ms) instead of pygame.time.get_ticks()
+        self.clock = clock; self.rng = rng
+        self.x = PLAYER_START_X; self.y = PLAYER_Y; self.radius = PLAYER_RADIUS
+        self.hp_max = PLAYER_BASE_HP; self.hp = PLAYER_BASE_HP
+        self.fire_delay_ms = PLAYER_BASE_FIRE_DELAY_MS; self.last_shot_time = 0
+        self.multishot_active = False; self.multishot_end_time = 0
+        self.score = 0; self.lives = 1
+        self.speed = PLAYER_SPEED
+        # shield: absorbs multiple hits while active
+        self.shield_active = False
+        self.shield_end_time = 0
+        self.shield_uses = 0
+        # hit-flash indicator (visual only)
+        self.hit_flash = False
+        self.hit_flash_end = 0
+        # micro invincibility timer (sim ms)
+        self.invincible_until = 0
+
+        # ultimate
+        self.ultimate_count = 0; self.ultimate_needed = 10; self.ultimate_available = False
+        self.ultimate_active = False; self.ultimate_end_time = 0; self.ultimate_fire_delay_ms = ULTIMATE_FIRE_DELAY_MS; self.last_ultimate_shot_time = 0
+
+    def update(self):
+        now = self.clock.ticks()
+        # Shield expiration: ensure shield ends when timer passes
+        if self.shield_active and self.shield_end_time and now > self.shield_end_time:
+            self.shield_active = False
+            self.shield_end_time = 0
+            self.shield_uses = 0
+
+        if self.multishot_active and now > self.multishot_end_time:
+            self.multishot_active = False
+        if self.ultimate_active and now > self.ultimate_end_time:
+            self.ultimate_active = False; self.ultimate_end_time = 0; self.last_ultimate_shot_time = 0
+
+    def draw(self, batch):
+        x, y = px(self.x), px(self.y); r = px(self.radius)
+
+        # show invincibility ring if active (its alpha pulses through a few cached levels)
+        now = self.clock.ticks()
+        if now < self.invincible_until:
+            alpha = 120 + int(80 * math.sin(now * 0.01))
+            batch.add_surface(LAYER_PLAYER, ring_sprite(self.radius, round(alpha / RING_ALPHA_STEP)), x - r*2, y - r*2)
+
+        # flicker frames (visual only)
+        if self.hit_flash:
+            if now > self.hit_flash_end:
+                self.hit_flash = False
+            else:
+                # simple flicker: skip every other frame
+                if (now // 60) % 2 == 0:
+                    return  # skip drawing this frame for flicker
+
+        # normal draw
+        batch.add(LAYER_PLAYER, player_sprite(r), x - r - 2, y - r - 2)
+
+        # shield visual
+        if self.shield_active and self.shield_uses > 0:
+            sr = px(self.radius + 10)
+            batch.add(LAYER_PLAYER, circle_sprite(SHIELD_BLUE, sr, max(1, px(3))), x - sr, y - sr)
+
+    def can_shoot(self):
+        return self.clock.ticks() - self.last_shot_time >= self.fire_delay_ms
+
+    def shoot(self, bullets):
+        self.last_shot_time = self.clock.ticks()
+        if self.multishot_active:
+            for s in (-14,0,14): bullets.spawn(self.x + s, self.y - self.radius - 4, 0, PLAYER_BULLET_SPEED, OWNER_PLAYER, damage=1)
+        else:
+            bullets.spawn(self.x, self.y - self.radius - 6, 0, PLAYER_BULLET_SPEED, OWNER_PLAYER, damage=1)
+
+    def take_damage(self, amount=1, source=None, knockback=0):
+        """
+        amount: HP to remove
+        source: (sx, sy) tuple indicating position of hit origin (bullet or enemy)
+        knockback: pixels to push player away from source (visual reaction)
+        Returns True if player died
+        """
+        now = self.clock.ticks()
+
+        # If currently invincible, ignore damage
+        if now < self.invincible_until:
+            # still apply a small hit flash for feedback but no HP loss
+            self.hit_flash = True
+            self.hit_flash_end = now + 180
+            return False
+
+        # shield absorbs up to its uses
+        if self.shield_active and self.shield_uses > 0:
+            self.shield_uses -= amount
+            if self.shield_uses <= 0:
+                self.shield_active = False; self.shield_uses = 0
+
+            # trigger flash and knockback even if shield absorbs
+            self.hit_flash = True
+            self.hit_flash_end = now + 180
+
+            # apply invincibility to prevent immediate follow-up hits
+            self.invincible_until = now + INVINCIBILITY_MS
+
+            if source and knockback:
+                sx, sy = source
+                dx = self.x - sx; dy = self.y - sy
+                dist = math.hypot(dx, dy)
+                if dist == 0:
+                    # random small nudge if overlapping exactly
+                    angle = self.rng.uniform(0, math.pi*2)
+                    dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
+                nx = dx / dist; ny = dy / dist
+                self.x += nx * knockback
+                self.y += ny * knockback
+                self.x = clamp(self.x, self.radius, WIDTH - self.radius)
+                self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
+            return False
+
+        # normal damage
+        self.hp -= amount
+
+        # flash feedback
+        self.hit_flash = True
+        self.hit_flash_end = now + 180
+
+        # apply invincibility to avoid being hit again for a while
+        self.invincible_until = now + INVINCIBILITY_MS
+
+        # apply knockback if source provided
+        if source and knockback:
+            sx, sy = source
+            dx = self.x - sx; dy = self.y - sy
+            dist = math.hypot(dx, dy)
+            if dist == 0:
+                angle = self.rng.uniform(0, math.pi*2)
+                dx = math.cos(angle); dy = math.sin(angle); dist = 1.0
+            nx = dx / dist; ny = dy / dist
+            self.x += nx * knockback
+            self.y += ny * knockback
+            self.x = clamp(self.x, self.radius, WIDTH - self.radius)
+            self.y = clamp(self.y, self.radius, HEIGHT - self.radius)
+
+        if self.hp <= 0:
+            self.hp = 0; return True
+        return False
+
+    def use_ultimate_once(self, bullets):
+        offsets = np.array([-40, -20, 0, 20, 40])
+        bullets.spawn_many(self.x + offsets, self.y - self.radius - 6, 0, int(PLAYER_BULLET_SPEED * 1.6), OWNER_PLAYER, damage=2)
+
+# --------------------
+# Bullet patterns (declarative boss volleys, each fired with one spawn_many)
+# --------------------
+def _over_time(v, t):
+    # a number, or (base, rate[, amp, freq]): base + rate*t + amp*sin(freq*t), t in seconds
+    if not isinstance(v, tuple): return v
+    base, rate, amp, freq = v + (0.0,) * (4 - len(v))
+    return base + rate * t + amp * math.sin(freq * t)
+
+class Pattern:
+    """
+    One kind of volley, fired every `interval` seconds:
+      'ring'  `count` bullets evenly round the circle, the first one at `angle`
+      'fan'   `count` bullets across `spread` radians, centred on `angle`
+    Angles are radians, 0 = right, pi/2 = down; aim=True turns `angle` towards the player.
+    rounds > 1 fires the shape that many times at once, each round `speed_step` faster, so it
+    leaves as a burst of trailing lines. Bullets start `radius` px out from the shooter + `origin`.
+    Any number may change over time as (base, rate[, amp, freq]), see _over_time().
+    """
+    __slots__ = ('kind', 'count', 'speed', 'interval', 'angle', 'spread', 'aim', 'rounds', 'speed_step', 'radius', 'origin')
+    def __init__(self, kind, count, speed, interval, angle=math.pi/2, spread=0.0, aim=False,
+                 rounds=1, speed_step=0.0, radius=0.0, origin=(0, 0)):
+        if kind not in ('ring', 'fan'): raise ValueError(f"unknown pattern kind {kind!r}")
+        self.kind = kind; self.count = count; self.speed = speed; self.interval = interval
+        self.angle = angle; self.spread = spread; self.aim = aim
+        self.rounds = rounds; self.speed_step = speed_step; self.radius = radius; self.origin = origin
+
+    def volley(self, x, y, t, target=None):
+        """Arrays (xs, ys, vxs, vys) of one volley fired from (x, y) at pattern time t."""
+        count = max(1, int(_over_time(self.count, t))); rounds = max(1, int(_over_time(self.rounds, t)))
+        ox = x + self.origin[0]; oy = y + self.origin[1]
+        angle = _over_time(self.angle, t)
+        if self.aim and target is not None: angle += math.atan2(target[1] - oy, target[0] - ox)
+        if self.kind == 'ring': a = angle + np.arange(count) * (2 * math.pi / count)
+        else: a = angle + np.linspace(-0.5, 0.5, count) * _over_time(self.spread, t) if count > 1 else np.full(1, angle)
+        cos = np.cos(a); sin = np.sin(a); radius = _over_time(self.radius, t)
+        speed = _over_time(self.speed, t) + np.arange(rounds)[:, None] * _over_time(self.speed_step, t)
+        return ox + cos * radius, oy + sin * radius, cos * speed, sin * speed
+
+class Barrage:
+    """
+    Plays Patterns for one shooter: a shared clock and a countdown per pattern. Each pattern
+    first fires one interval in, then every interval, on the tick that completes it.
+    """
+    __slots__ = ('patterns', 't', 'timers')
+    def __init__(self, patterns):
+        self.patterns = list(patterns); self.t = 0.0
+        self.timers = [_over_time(p.interval, 0.0) for p in self.patterns]  # the first volley's offset
+
+    def update(self, dt, pool, x, y, target=None):
+        self.t += dt; timers = self.timers
+        for i, p in enumerate(self.patterns):
+            timers[i] -= dt
+            if timers[i] <= 1e-9:  # float drift: an interval of exactly n ticks fires on tick n, not n+1
+                timers[i] = _over_time(p.interval, self.t)
+                pool.spawn_many(*p.volley(x, y, self.t, target))
+
+# --------------------
+# Enemy
+# --------------------
+_BOB = {'zig': (2.0, 6.0), 'tank': (1.2, 3.0)}  # etype -> (bob frequency, amplitude); others use 1.6 and bob_amp
+
+class Enemy:
+    __slots__ = (
+        '_base_x', '_base_y', 'x', 'y', 'etype', 'w', 'h', 'hp', 'hp_max', 'alive', '_arm_state',
+        'shoot_timer', 'osc_phase', 'spin_radius', 'spin_speed', 'bob_amp', 'custom_shooter',
+        'vx', 'vy', 'curve_phase', 'curve_speed', 'curve_amount', 'formation', 'slot',
+    )
+    def __init__(self, x, y, etype="basic", hp=1, rng=random):
+        self.formation = None; self.slot = -1  # set by Formation, which then owns base_x / base_y / arm_state
+        self._base_x = x; self._base_y = y; self.x = x; self.y = y
+        self.etype = etype
+        self.w = 36; self.h = 30; self.hp = hp
+        self.hp_max = hp; self.alive = True; self._arm_state = 0
+        self.shoot_timer = 0.0; self.osc_phase = rng.uniform(0, math.pi*2)  # shoot_timer: subclasses' own countdowns
+        self.spin_radius = rng.uniform(4, 18)
+        self.spin_speed = rng.uniform(1.0, 3.0) * (0.6 if etype=="tank" else 1.0)
+        self.bob_amp = rng.uniform(0.0, 4.0)
+        self.custom_shooter = False  # True: fires on its own timer in update(), skips the sim's default volley
+        # physics for dynamic spawn
+        self.vx = None; self.vy = None; self.curve_phase = 0.0; self.curve_speed = 0.0; self.curve_amount = 0.0
+
+    @property
+    def base_x(self):
+        f = self.formation
+        return self._base_x if f is None else float(f.home_x[self.slot]) + f.off_x
+    @base_x.setter
+    def base_x(self, v):
+        if self.formation is None: self._base_x = v
+        else: self.formation.move_home(self.slot, v - self.formation.off_x, None)
+    @property
+    def base_y(self):
+        f = self.formation
+        return self._base_y if f is None else float(f.home_y[self.slot]) + f.off_y
+    @base_y.setter
+    def base_y(self, v):
+        if self.formation is None: self._base_y = v
+        else: self.formation.move_home(self.slot, None, v - self.formation.off_y)
+    @property
+    def arm_state(self):
+        f = self.formation
+        return self._arm_state if f is None else f.arm_state
+    @arm_state.setter
+    def arm_state(self, v):
+        if self.formation is None: self._arm_state = v
+        else: self.formation.arm_state = v
+
+    def rect(self):
+        return pygame.Rect(int(self.x - self.w/2), int(self.y - self.h/2), self.w, self.h)
+    def toggle_arm(self): self.arm_state = 1 - self.arm_state
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        if not self.alive: return
+        # dynamic (free-moving) enemies
+        if self.vx is not None and self.vy is not None:
+            self.curve_phase += self.curve_speed * dt
+            cx = math.sin(self.curve_phase) * self.curve_amount * (0.5 if self.etype == 'fast' else 1.0)
+            self.x += (self.vx * (dt * 60))
+            self.y += (self.vy * (dt * 60))
+            self.x += cx * dt * 18
+            if self.etype == "zig":
+                self.y += math.sin(elapsed*2 + self.osc_phase) * 0.8
+            # if enemy goes far off screen, reposition them back to top (respawn behavior)
+            if self.x < -200 or self.x > WIDTH + 200 or self.y > HEIGHT + 200:
+                # reposition to top with new parameters (keeps game fun)
+                rng = wave.rng
+                self.x = rng.randint(40, WIDTH - 40)
+                self.y = -40
+                self.vx = rng.uniform(-0.6, 0.6)
+                self.vy = rng.uniform(1.2, 2.5)
+                self.curve_phase = rng.uniform(0, math.pi*2)
+                self.curve_speed = rng.uniform(0.4, 1.2)
+                self.curve_amount = rng.randint(8, 38)
+            return
+
+        # formation style; members of a Formation were already placed by Formation.update()
+        if self.formation is None:
+            self._base_x += step_dx; self._base_y += step_dy
+            freq, amp = _BOB.get(self.etype, (1.6, None))
+            bob = math.sin(elapsed*freq + self.osc_phase) * (self.bob_amp if amp is None else amp)
+            angle = elapsed * self.spin_speed + self.osc_phase
+            self.x = self._base_x + math.cos(angle) * self.spin_radius
+            self.y = self._base_y + math.sin(angle) * (self.spin_radius * 0.6) + bob
+
+    def draw(self, batch):
+        if not self.alive: return
+        batch.add(LAYER_ENEMIES, enemy_sprite(self.etype, self.arm_state, GREEN), px(self.x) - px(3 * ENEMY_PIXEL), px(self.y) - px(3 * ENEMY_PIXEL))
+
+class Boss(Enemy):
+    __slots__ = ('move_timer', 'dir')
+    def __init__(self, x, y, hp=18, rng=random):
+        super().__init__(x,y,etype="boss", hp=hp, rng=rng)
+        self.w = 120; self.h = 70; self.move_timer = 0; self.dir = 1
+    def render_body(self):
+        # static body in local coords; boss_sprite() caches it per (class, w, h)
+        s = new_sprite_surface(self.w, self.h); cx = self.w // 2; cy = self.h // 2
+        rect = pygame.Rect(0, 0, self.w, self.h)
+        pygame.draw.rect(s, (120,50,200), rect); pygame.draw.rect(s, WHITE, rect, 3)
+        pygame.draw.circle(s, BLACK, (cx - 24, cy - 8), 8)
+        pygame.draw.circle(s, BLACK, (cx + 24, cy - 8), 8)
+        for i in range(-3,4): tx = cx + i*10; ty = cy + 16; pygame.draw.rect(s, WHITE, (tx-3, ty, 6, 8))
+        return s
+    def draw(self, batch):
+        if not self.alive: return
+        batch.add(LAYER_ENEMIES, boss_sprite(self), px(self.x - self.w/2), px(self.y - self.h/2))
+        draw_boss_healthbar(batch, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
+
+# Boss variants (custom_shooter=True: they fire their own patterns inside update())
+# shoot_interval defaults are the cadences these fired at while Enemy.update also ran their timers down
+class PatternBoss(Boss):
+    """A boss that fires a list of Patterns; new bosses only need new patterns."""
+    __slots__ = ('barrage',)
+    def __init__(self, x, y, patterns, hp=24, rng=random):
+        super().__init__(x, y, hp=hp, rng=rng)
+        self.custom_shooter = True
+        self.barrage = Barrage(patterns)
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        if not self.alive: return
+        # basic bobbing movement (reuse parent's formation math)
+        super().update(step_dx, step_dy, dt, wave, elapsed)
+        player = wave.sim.player
+        self.barrage.update(dt, wave.sim.enemy_bullets, self.x, self.y, (player.x, player.y))
+
+class RotatingShooterBoss(PatternBoss):
+    __slots__ = ()
+    def __init__(self, x, y, hp=24, bullets=8, shoot_interval=0.45, spin_speed=0.9, speed=3.4, rng=random):
+        super().__init__(x, y, [Pattern('ring', bullets, speed, shoot_interval, angle=(0.0, spin_speed), origin=(0, 40))], hp=hp, rng=rng)
+        self.spin_speed = spin_speed
+        self.w = 140; self.h = 80
+
+    def render_body(self):
+        s = new_sprite_surface(self.w, self.h)
+        rect = pygame.Rect(0, 0, self.w, self.h)
+        pygame.draw.ellipse(s, (160, 60, 200), rect)
+        pygame.draw.ellipse(s, WHITE, rect, 3)
+        return s
+
+    def draw(self, batch):
+        if not self.alive: return
+        batch.add(LAYER_ENEMIES, boss_sprite(self), px(self.x - self.w/2), px(self.y - self.h/2))
+        draw_boss_healthbar(batch, int(self.x-60), int(self.y-self.h//2-20), 120, 14, self.hp, self.hp_max)
+        angle = _over_time(self.barrage.patterns[0].angle, self.barrage.t)  # the turret tracks the ring
+        cx = px(self.x + math.cos(angle) * 24)
+        cy = px(self.y + math.sin(angle) * 12)
+        r = px(8); batch.add(LAYER_ENEMIES, circle_sprite(YELLOW, r), cx - r, cy - r)
+
+class TwinShooterBoss(PatternBoss):
+    __slots__ = ()
+    def __init__(self, x, y, hp=20, shoot_interval=0.275, bullet_speed=4.2, horizontal=True, rng=random):
+        # a two-bullet ring: left then right, or up then down
+        pattern = Pattern('ring', 2, bullet_speed, shoot_interval, angle=math.pi if horizontal else 1.5*math.pi, radius=12)
+        super().__init__(x, y, [pattern], hp=hp, rng=rng)
+        self.w = 120; self.h = 72
+
+    def render_body(self):
+        s = new_sprite_surface(self.w, self.h); cx = self.w // 2; cy = self.h // 2
+        rect = pygame.Rect(0, 0, self.w, self.h)
+        pygame.draw.rect(s, (200,90,60), rect); pygame.draw.rect(s, WHITE, rect, 3)
+        pygame.draw.rect(s, BLACK, (cx - 36, cy - 6, 16, 12))
+        pygame.draw.rect(s, BLACK, (cx + 20, cy - 6, 16, 12))
+        return s
+
+class SpiralSpreadBoss(PatternBoss):
+    __slots__ = ()
+    def __init__(self, x, y, hp=22, bullets=4, shoot_interval=0.175, spin_speed=2.0, bullet_speed=3.8, rng=random):
+        pattern = Pattern('ring', bullets, bullet_speed, shoot_interval, angle=(0.0, spin_speed, 0.12, 1.3), origin=(0, 38))
+        super().__init__(x, y, [pattern], hp=hp, rng=rng)
+        self.spin_speed = spin_speed
+        self.w = 130; self.h = 76
+
+# ---- New Enemy Types ----
+# shoot_timer intervals are the cadences these fired at while Enemy.update also ran the timer down
+class MultiShotEnemy(Enemy):
+    __slots__ = ()
+    def __init__(self, x, y, rng=random):
+        super().__init__(x, y, etype="multishot", hp=7, rng=rng)
+        self.shoot_timer = 0.55
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        super().update(step_dx, step_dy, dt, wave, elapsed)
+        self.shoot_timer -= dt
+        if self.shoot_timer <= 0:
+            self.shoot_timer = 0.55
+            for a in (-0.4, 0, 0.4):
+                wave.sim.enemy_bullets.spawn(self.x + a*12, self.y + self.h//2, 0, ENEMY_BULLET_SPEED_BASE+1.2)
+
+class DiagonalEnemy(Enemy):
+    __slots__ = ()
+    def __init__(self, x, y, rng=random):
+        super().__init__(x, y, etype="diagonal", hp=5, rng=rng)
+        self.shoot_timer = 0.65
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        super().update(step_dx, step_dy, dt, wave, elapsed)
+        self.shoot_timer -= dt
+        if self.shoot_timer <= 0:
+            self.shoot_timer = 0.65
+            wave.sim.enemy_bullets.spawn(self.x, self.y, 2.2, ENEMY_BULLET_SPEED_BASE)
+            wave.sim.enemy_bullets.spawn(self.x, self.y, -2.2, ENEMY_BULLET_SPEED_BASE)
+
+class BurstEnemy(Enemy):
+    __slots__ = ('burst', 'cooldown')
+    def __init__(self, x, y, rng=random):
+        super().__init__(x, y, etype="burst", hp=6, rng=rng)
+        self.cooldown = 2.2
+        self.burst = 0
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        super().update(step_dx, step_dy, dt, wave, elapsed)
+        if self.cooldown > 0:
+            self.cooldown -= dt
+        else:
+            if self.burst < 5:
+                wave.sim.enemy_bullets.spawn(self.x, self.y, 0, ENEMY_BULLET_SPEED_BASE+2.5)
+                self.burst += 1
+            else:
+                self.burst = 0
+                self.cooldown = 2.2
+
+class SniperEnemy(Enemy):
+    __slots__ = ()
+    def __init__(self, x, y, rng=random):
+        super().__init__(x, y, etype="sniper", hp=4, rng=rng)
+        self.shoot_timer = 1.0
+
+    def update(self, step_dx, step_dy, dt, wave, elapsed):
+        super().update(step_dx, step_dy, dt, wave, elapsed)
+        self.shoot_timer -= dt
+        if self.shoot_timer <= 0:
+            self.shoot_timer = 1.0
+            player = wave.sim.player
+            dx = player.x - self.x
+            dy = player.y - self.y
+            d = math.hypot(dx, dy) or 1
+            vx = dx/d * (ENEMY_BULLET_SPEED_BASE+3.5)
+            vy = dy/d * (ENEMY_BULLET_SPEED_BASE+3.5)
+
+            wave.sim.enemy_bullets.spawn(self.x, self.y, vx, vy)
+
+class Formation:
+    """
+    The live formation block (enemies without vx/vy) as one group: a shared offset and arm
+    state, per-member home positions and motion parameters in parallel arrays (slot i =
+    members[i]), and the block's bounding box relative to the offset. Stepping the block is
+    O(1) on off_x / off_y; the box is only rescanned when a member on its edge dies.
+    update() places every member in one numpy pass -- the spin and bob Enemy.update() used
+    to compute per enemy -- and writes x / y back, so the rest of the game reads them as
+    plain attributes. Members' base_x / base_y / arm_state are views onto this group.
+    """
+    _ARRAYS = ('home_x', 'home_y', 'half_w', 'phase', 'spin_speed', 'spin_x', 'spin_y', 'bob_freq', 'bob_amp')
+
+    def __init__(self, members):
+        self.members = list(members)
+        for i, e in enumerate(self.members): e.formation = self; e.slot = i
+        f = lambda values: np.array(values, dtype=np.float64)
+        self.off_x = 0.0; self.off_y = 0.0; self.arm_state = 0
+        self.home_x = f([e._base_x for e in members]); self.home_y = f([e._base_y for e in members])
+        self.half_w = f([e.w / 2 for e in members])
+        self.phase = f([e.osc_phase for e in members]); self.spin_speed = f([e.spin_speed for e in members])
+        self.spin_x = f([e.spin_radius for e in members]); self.spin_y = self.spin_x * 0.6
+        bob = [_BOB.get(e.etype, (1.6, e.bob_amp)) for e in members]
+        self.bob_freq = f([b[0] for b in bob]); self.bob_amp = f([b[1] for b in bob])
+        self._bounds()
+
+    def _bounds(self):
+        # left / right edge of the block, relative to off_x
+        if self.members:
+            self.left = float((self.home_x - self.half_w).min()); self.right = float((self.home_x + self.half_w).max())
+        else:
+            self.left = self.right = 0.0
+
+    def move_home(self, i, x, y):
+        if x is not None: self.home_x[i] = x; self._bounds()
+        if y is not None: self.home_y[i] = y
+
+    def remove(self, e):
+        # a dead member leaves with its last base position and arm; the arrays close the gap
+        i = e.slot
+        e._base_x = float(self.home_x[i]) + self.off_x; e._base_y = float(self.home_y[i]) + self.off_y
+        e._arm_state = self.arm_state; e.formation = None
+        on_edge = self.home_x[i] - self.half_w[i] <= self.left or self.home_x[i] + self.half_w[i] >= self.right
+        for name in self._ARRAYS: setattr(self, name, np.delete(getattr(self, name), i))
+        del self.members[i]
+        for j in range(i, len(self.members)): self.members[j].slot = j
+        if on_edge: self._bounds()
+
+    def step(self, dx, times, direction):
+        """
+        Take `times` marching steps of dx * direction: sideways, or down ENEMY_DROP and turn
+        around when the block would pass a wall. Every step toggles the arm. Returns the new
+        direction.
+        """
+        if not self.members: return direction
+        lo = 20 - self.left; hi = WIDTH - 20 - self.right  # allowed range of off_x
+        off_x = self.off_x
+        for _ in range(times):
+            nx = off_x + dx * direction
+            if nx < lo or nx > hi: self.off_y += ENEMY_DROP; direction = -direction
+            else: off_x = nx
+        self.off_x = off_x
+        if times & 1: self.arm_state = 1 - self.arm_state
+        return direction
+
+    def update(self, elapsed):
+        if not self.members: return
+        phase = self.phase
+        angle = elapsed * self.spin_speed + phase
+        bob = np.sin(elapsed * self.bob_freq + phase) * self.bob_amp
+        xs = (self.home_x + self.off_x) + np.cos(angle) * self.spin_x
+        ys = (self.home_y + self.off_y) + np.sin(angle) * self.spin_y + bob
+        for e, x, y in zip(self.members, xs.tolist(), ys.tolist()): e.x = x; e.y = y
+
+class FireScheduler:
+    """
+    When each enemy fires next, as a heap of (due tick, order, enemy); a frame only pops the
+    enemies that are due. A regular enemy used to roll rng.random() < p every frame: the wait
+    until that first succeeds is geometric, so roll() draws it once per shot instead.
+    Entries of enemies that died are dropped when they come up.
+    """
+    def __init__(self, rng):
+        self.rng = rng; self.heap = []; self.order = 0
+
+    def clear(self):
+        self.heap.clear()
+
+    def after(self, e, tick, ticks):
+        heapq.heappush(self.heap, (tick + ticks, self.order, e)); self.order += 1
+
+    def roll(self, e, tick, prob):
+        # P(k ticks) = (1-p)^(k-1) * p, k >= 1
+        if prob <= 0: return
+        k = 1 if prob >= 1 else int(math.log(1.0 - self.rng.random()) / math.log(1.0 - prob)) + 1
+        self.after(e, tick, k)
+
+    def due(self, tick):
+        heap = self.heap
+        while heap and heap[0][0] <= tick: yield heapq.heappop(heap)[2]
+
+# --------------------
+# Wave Manager (now accepts player_pos to avoid spawning on player)
+# --------------------
+class WaveManager:
+    def __init__(self, player_pos=None, rng=random):
+        self.rng = rng; self.sim = None  # set by GameSim; custom shooters emit into sim.enemy_bullets
+        self.wave_num = 0; self.enemies = []; self.alive_count = 0; self.formation = Formation([])
+        self.fire = FireScheduler(rng); self.ticks = 0  # ticks: update() calls, the fire schedule's clock
+        self.step_interval = 0.8; self.step_acc = 0.0; self.direction = 1; self.elapsed = 0.0
+        self.base_speed = 28.0; self.enemy_shoot_prob = 0.006
+        self.spawn_wave(player_pos)
+
+    def spawn_wave(self, player_pos=None):
+        rng = self.rng
+        self.wave_num += 1
+        self.enemies = []
+        total = 6 + self.wave_num * 1
+        formation_count = max(0, min(ENEMIES_PER_ROW, total // 3))
+        dynamic_count = total - formation_count
+
+        # formation
+        if formation_count > 0:
+            start_x = max(80, WIDTH//2 - (formation_count//2)*50)
+            y = 90
+            for i in range(formation_count):
+                x = start_x + i * 50
+                t = rng.random()
+                if t < 0.62: etype='basic'; hp=1
+                elif t < 0.82: etype='fast'; hp=1
+                elif t < 0.94: etype='zig'; hp=1
+                else: etype='tank'; hp=2 + (self.wave_num//3)
+                e = Enemy(x,y,etype=etype,hp=hp,rng=rng)
+                if etype=='tank': e.spin_radius = rng.uniform(8, 22); e.spin_speed *= 0.7
+                if etype=='fast': e.spin_radius = rng.uniform(2, 8); e.spin_speed *= 1.6
+                self.enemies.append(e)
+
+        # dynamic spawns
+        for i in range(dynamic_count):
+            etype = rng.choice(['basic', 'fast', 'zig', 'tank'])
+            # pick side
+            side = rng.choice(['top','left','right'])
+            # pick position while avoiding player's area if provided
+            placed = False
+            attempts = 0
+            while not placed and attempts < 40:
+                attempts += 1
+                if side == 'top':
+                    x = rng.randint(40, WIDTH - 40); y = -40; vx = rng.uniform(-0.6, 0.6); vy = rng.uniform(1.2, 2.5)
+                elif side == 'left':
+                    x = -40; y = rng.randint(60, HEIGHT - 220); vx = rng.uniform(1.0, 2.6); vy = rng.uniform(-0.2, 0.4)
+                else:
+                    x = WIDTH + 40; y = rng.randint(60, HEIGHT - 220); vx = rng.uniform(-2.6, -1.0); vy = rng.uniform(-0.2, 0.4)
+
+                if player_pos is None:
+                    placed = True
+                else:
+                    px, py = player_pos
+                    if math.hypot(x - px, y - py) > 140:
+                        placed = True
+            e = Enemy(x, y, etype=etype, hp=(2 if etype=='tank' else 1), rng=rng)
+            e.vx = vx; e.vy = vy; e.curve_phase = rng.uniform(0, math.pi*2)
+            e.curve_speed = rng.uniform(0.4, 1.2); e.curve_amount = rng.randint(8, 38)
+            if etype == 'fast': e.vx *= 1.2; e.vy *= 1.1; e.curve_amount *= 0.6
+            if etype == 'tank': e.vx *= 0.6; e.vy *= 0.75; e.curve_amount *= 1.1
+            self.enemies.append(e)
+
+        # boss waves
+        if self.wave_num % BOSS_EVERY == 0:
+            boss_y = min(140, PLAYER_Y - 220)
+            boss = Boss(WIDTH//2, boss_y, hp=12 + self.wave_num*2, rng=rng)
+            self.enemies.append(boss)
+
+        self.step_interval = max(0.95 - (self.wave_num*0.02), 0.35)
+        self.base_speed = 20 + self.wave_num * 2.2
+        self.enemy_shoot_prob = clamp(0.004 + self.wave_num * 0.0009, 0.004, 0.02)
+        self.set_enemies(self.enemies)
+
+    def set_enemies(self, enemies):
+        """Start `enemies` as the wave: formation, alive count and fire schedule follow."""
+        self.enemies = enemies; self.alive_count = sum(1 for e in enemies if e.alive)
+        self.formation = Formation([e for e in enemies if e.alive and e.vx is None])
+        self.fire.clear()
+        for e in enemies:
+            if not e.alive or e.custom_shooter: continue
+            if isinstance(e, Boss): self.fire.after(e, self.ticks, round(BOSS_FIRST_VOLLEY / SIM_DT))
+            else: self.fire.roll(e, self.ticks, self.fire_prob(e))
+
+    def fire_prob(self, e):
+        # chance per tick that a regular enemy fires
+        prob = self.enemy_shoot_prob * 2.0
+        if e.etype == 'fast': return prob * 1.8
+        if e.etype == 'tank': return prob * 0.6
+        return prob
+
+    def update(self, dt):
+        self.elapsed += dt; self.step_acc += dt; self.ticks += 1
+        if self.step_acc >= self.step_interval:
+            times = int(self.step_acc // self.step_interval); self.step_acc -= times * self.step_interval
+            step_size = self.base_speed * (self.step_interval)
+            self.direction = self.formation.step(step_size, times, self.direction)
+
+    def kill(self, e):
+        e.alive = False; self.alive_count -= 1
+        if e.formation is not None: e.formation.remove(e)
+
+    def any_alive(self):
+        return self.alive_count > 0
+
+# --------------------
+# Collision broadphase
+# --------------------
+class SpatialGrid:
+    """
+    Uniform hash grid of live enemy rects, rebuilt every frame.
+    Each enemy is stored in every cell its rect overlaps (in wave order), so a
+    bullet point only has to be tested against the enemies of its own cell.
+    """
+    def __init__(self, cell=GRID_CELL):
+        self.cell = cell
+        self.cells = {}
+
+    def rebuild(self, enemies):
+        c = self.cell
+        cells = self.cells = {}
+        for e in enemies:
+            if not e.alive: continue
+            r = e.rect()
+            entry = (e, r)
+            for cx in range(r.left // c, (r.right - 1) // c + 1):
+                for cy in range(r.top // c, (r.bottom - 1) // c + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket is None: cells[(cx, cy)] = [entry]
+                    else: bucket.append(entry)
+
+    def query(self, x, y):
+        # int() truncates like Rect.collidepoint does, so the cell always holds every rect that can contain (x, y)
+        c = self.cell
+        return self.cells.get((int(x) // c, int(y) // c), ())
+
+# --------------------
+# Simulation core (no display needed)
+# --------------------
+class SimClock:
+    """Millisecond clock that only moves when the simulation steps."""
+    def __init__(self, start_ms=0.0):
+        self.ms = start_ms
+    def advance(self, dt):
+        self.ms += dt * 1000.0
+    def ticks(self):
+        return int(self.ms)
+
+class SimInput:
+    """
+    One tick of player input, already translated from pygame events/keys.
+    drag: (x, y) the player was dragged to this tick, or None
+    space: SPACE pressed this tick (ultimate if ready, otherwise shoot)
+    purchases / close_shop: shop codes bought and whether the shop was left (only read while in_shop)
+    """
+    def __init__(self, left=False, right=False, up=False, down=False, drag=None, space=False, purchases=(), close_shop=False):
+        self.left = left; self.right = right; self.up = up; self.down = down
+        self.drag = drag; self.space = space
+        self.purchases = purchases; self.close_shop = close_shop
+
+NO_INPUT = SimInput()
+
+class PhaseTimer:
+    """
+    Wall time per frame, split into named laps (see PROFILE_GROUPS). GameSim.step laps
+    its own stages into sim.profiler when one is attached; the caller laps the rest.
+    With `seconds` only the frames started in that much recent wall time are kept, with
+    their start times in stamps.
+    """
+    def __init__(self, seconds=None):
+        self.frames = deque() if seconds else []; self.stamps = deque(); self.seconds = seconds
+        self.current = {}; self.t = self.started = 0.0
+
+    def start(self):
+        self.current = {}; self.t = self.started = time.perf_counter()
+
+    def skip(self):
+        # don't charge time spent blocked (pause, shop) to the next lap
+        self.t = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + (now - self.t); self.t = now
+
+    def end_frame(self):
+        self.frames.append(self.current)
+        if self.seconds:
+            self.stamps.append(self.started); old = self.started - self.seconds
+            while self.stamps[0] < old: self.stamps.popleft(); self.frames.popleft()
+
+    def clear(self):
+        self.frames.clear(); self.stamps.clear()
+
+class GameSim:
+    """
+    Everything that makes up a run: player, wave, bullets, drops and explosion particles.
+    Advances only through step(inputs, dt) on its own SimClock and seeded RNG, so the
+    same seed + inputs always replay the same game, with or without a window.
+    """
+    def __init__(self, seed=None):
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.reset()
+
+    def reset(self):
+        self.rng = random.Random(self.seed)
+        self.clock = SimClock()
+        self.player = Player(self.clock, self.rng)
+        self.wave = WaveManager(player_pos=(self.player.x, self.player.y), rng=self.rng)
+        self.wave.sim = self
+        self.bullets = BulletPool(); self.enemy_bullets = BulletPool(); self.drops = []; self.drop_pool = ObjectPool(BuffDrop)
+        self.particles = ParticleSystem(np.random.default_rng(self.seed))
+        self.game_over = False; self.in_shop = False
+        self.frame = 0
+        self.grid = SpatialGrid()
+        self.profiler = None  # a PhaseTimer while benchmarking / profiling
+        self.events = []  # SOUND_PRIORITY names raised by the last step; output only, never read back
+
+    @property
+    def elapsed(self):
+        return self.clock.ms / 1000.0
+
+    def step(self, inputs, dt=SIM_DT):
+        events = self.events; events.clear()
+        if self.in_shop:
+            for code in inputs.purchases: self.buy(code)
+            if inputs.close_shop: self.leave_shop()
+            return
+        if self.game_over: return
+        self.clock.advance(dt); self.frame += 1
+        player = self.player; prof = self.profiler
+
+        if inputs.drag is not None:
+            player.x = clamp(inputs.drag[0], player.radius, WIDTH - player.radius)
+            player.y = clamp(inputs.drag[1], player.radius, HEIGHT - player.radius)
+        if inputs.space:
+            if player.ultimate_available and not player.ultimate_active:
+                player.ultimate_active = True; player.ultimate_end_time = self.clock.ticks() + ULTIMATE_DURATION_MS; player.last_ultimate_shot_time = 0; player.ultimate_available = False; player.ultimate_count = 0
+            else:
+                if not player.ultimate_active and player.can_shoot(): player.shoot(self.bullets); events.append('shot')
+
+        spd = player.speed * dt * 60
+        if inputs.left: player.x -= spd
+        if inputs.right: player.x += spd
+        if inputs.up: player.y -= spd
+        if inputs.down: player.y += spd
+        player.x = clamp(player.x, player.radius, WIDTH - player.radius)
+        player.y = clamp(player.y, player.radius, HEIGHT - player.radius)
+
+        player.update()
+        now = self.clock.ticks()
+        if player.ultimate_active:
+            if player.last_ultimate_shot_time == 0 or (now - player.last_ultimate_shot_time) >= player.ultimate_fire_delay_ms:
+                player.use_ultimate_once(self.bullets); player.last_ultimate_shot_time = now; events.append('shot')
+        else:
+            if player.can_shoot(): player.shoot(self.bullets); events.append('shot')
+        if prof: prof.lap('input')
+
+        self.wave.update(dt)
+        if prof: prof.lap('wave')
+        eb = self.enemy_bullets; volleys = eb.hits + eb.misses  # one reserve per spawn call
+        self._enemy_shooting(dt)
+        if prof: prof.lap('shooting')
+        self._update_entities(dt)
+        if prof: prof.lap('entities')
+        if eb.hits + eb.misses != volleys: events.append('boss_shot' if self.wave.wave_num % BOSS_EVERY == 0 else 'enemy_shot')
+        self._collide_player_bullets()
+        if prof: prof.lap('player_bullets')
+        self._collide_enemy_bullets()
+        if prof: prof.lap('enemy_bullets')
+        self._collide_enemy_bodies()
+        if prof: prof.lap('bodies')
+        self._collect_drops()
+        if prof: prof.lap('drops')
+
+        # wave cleared -> go to shop
+        if not self.wave.any_alive() and not self.in_shop:
+            player.score += 300; self.in_shop = True
+
+    def buy(self, code):
+        for _, cost, c in SHOP_OPTIONS:
+            if c != code: continue
+            player = self.player
+            if player.score < cost: return False
+            player.score -= cost
+            if code == "fire": player.fire_delay_ms = max(80, player.fire_delay_ms - 20)
+            elif code == "hp": player.hp_max += 1; player.hp += 1
+            elif code == "heal": player.hp = player.hp_max
+            return True
+        return False
+
+    def leave_shop(self):
+        self.in_shop = False
+        # respawn wave taking into account player's current position so enemies don't spawn in player
+        self.wave.spawn_wave(player_pos=(self.player.x, self.player.y))
+        self.drop_pool.release_all(self.drops)
+        self.bullets.clear(); self.enemy_bullets.clear(); self.drops.clear(); self.particles.clear()
+
+    def _enemy_shooting(self, dt):
+        # only the enemies wave.fire has due this tick; custom shooters time themselves in update()
+        wave = self.wave; player = self.player; fire = wave.fire; tick = wave.ticks
+        for e in fire.due(tick):
+            if not e.alive: continue
+            if isinstance(e, Boss):
+                for a in (-1,0,1):
+                    self.enemy_bullets.spawn(e.x + a*16, e.y + e.h//2 + 6, 0, ENEMY_BULLET_SPEED_BASE + 1.2)
+                fire.after(e, tick, round(BOSS_VOLLEY_INTERVAL / SIM_DT))
+            else:
+                dx = player.x - e.x; aim_offset = clamp(dx / (WIDTH/2), -0.6, 0.6)
+                speed = ENEMY_BULLET_SPEED_BASE + (0.1*(1 if e.etype=='fast' else 0))
+                self.enemy_bullets.spawn(e.x + aim_offset*6, e.y + e.h//2 + 6, 0, speed)
+                fire.roll(e, tick, wave.fire_prob(e))
+
+    def _update_entities(self, dt):
+        elapsed = self.elapsed
+        self.wave.formation.update(elapsed)
+        for e in self.wave.enemies:
+            if e.alive: e.update(0,0,dt,self.wave,elapsed)
+        self.bullets.update(dt); self.bullets.cull()
+        self.enemy_bullets.update(dt); self.enemy_bullets.cull()
+        for d in self.drops: d.update(dt)
+        live = [d for d in self.drops if d.y <= HEIGHT + 40]
+        if len(live) != len(self.drops):
+            self.drop_pool.release_all(d for d in self.drops if d.y > HEIGHT + 40); self.drops[:] = live
+        self.particles.update(dt)
+
+    def _player_rect(self):
+        player = self.player
+        return pygame.Rect(player.x - player.radius, player.y - player.radius, player.radius*2, player.radius*2)
+
+    def _kill_enemy(self, e):
+        player = self.player
+        self.wave.kill(e); player.score += 120 if not isinstance(e,Boss) else 1200
+        self.events.append('boss_explosion' if isinstance(e,Boss) else 'explosion')
+        if not player.ultimate_active:
+            player.ultimate_count += 1
+            if player.ultimate_count >= player.ultimate_needed: player.ultimate_available = True
+        self.particles.emit(e.x, e.y, color=ORANGE, num=PARTICLE_COUNT + (6 if isinstance(e,Boss) else 0))
+        if not isinstance(e,Boss) and self.rng.random() < BUFF_CHANCE:
+            kind = self.rng.choice(['multishot','shield','heal'])
+            self.drops.append(self.drop_pool.acquire(e.x, e.y, kind))
+
+    def _collide_player_bullets(self):
+        # collisions: player bullets -> enemies (grid broadphase, first enemy in wave order wins)
+        pool = self.bullets; n = pool.n
+        if not n: return
+        grid = self.grid
+        grid.rebuild(self.wave.enemies)
+        xs = pool.x[:n].tolist(); ys = pool.y[:n].tolist()
+        owners = pool.owner[:n].tolist(); damages = pool.damage[:n].tolist()
+        hit = []
+        for i in range(n):
+            if owners[i] != OWNER_PLAYER: continue
+            x = xs[i]; y = ys[i]
+            for e, r in grid.query(x, y):
+                if not e.alive: continue
+                if r.collidepoint(x, y):
+                    e.hp -= damages[i]
+                    hit.append(i)
+                    if e.hp <= 0: self._kill_enemy(e)
+                    else: self.events.append('hit')
+                    break
+        pool.remove_indices(hit)
+
+    def _collide_enemy_bullets(self):
+        # collisions: enemy bullets -> player
+        # one vectorized box test against the player; the (few) hits are then handled in order
+        player = self.player
+        pool = self.enemy_bullets
+        hits = pool.hits_box(player.x, player.y, player.radius, owner=OWNER_ENEMY).tolist()
+        if not hits: return
+        xs = pool.x; ys = pool.y
+        done = []
+        for i in hits:
+            done.append(i)
+            # pass bullet position as source so knockback feels directional
+            guarded = player.invincible_until
+            killed = player.take_damage(1, source=(float(xs[i]), float(ys[i])), knockback=KNOCKBACK_PIXELS)
+            if player.invincible_until != guarded: self.events.append('hurt')
+            self.particles.emit(player.x, player.y, color=CYAN, num=18)
+            if killed:
+                self.game_over = True; break
+        pool.remove_indices(done)
+
+    def _collide_enemy_bodies(self):
+        # collisions: enemy body -> player (fixed so it does NOT instantly kill you)
+        # This handles enemy touching the player: deals 1 damage, applies knockback,
+        # grants INVINCIBILITY_MS of temporary invulnerability, and pushes player away slightly.
+        # It breaks after the first hit per frame to avoid multiple simultaneous hits.
+        player = self.player
+        player_rect = self._player_rect()
+        for e in self.wave.enemies:
+            if not e.alive:
+                continue
+
+            er = e.rect()
+
+            collide = (
+                player_rect.colliderect(er) or
+                math.hypot(e.x - player.x, e.y - player.y) < (player.radius + max(e.w, e.h) * 0.45)
+            )
+
+            if collide:
+                # only apply damage if not currently invincible (handled inside take_damage)
+                guarded = player.invincible_until
+                killed = player.take_damage(
+                    1,
+                    source=(e.x, e.y),
+                    knockback=KNOCKBACK_PIXELS
+                )
+                if player.invincible_until != guarded: self.events.append('hurt')
+
+                self.particles.emit(player.x, player.y, color=CYAN, num=18)
+
+                # bump player slightly out to reduce repeated collisions
+                if player.x < e.x:
+                    player.x -= 6
+                else:
+                    player.x += 6
+
+                if player.y < e.y:
+                    player.y -= 6
+                else:
+                    player.y += 6
+
+                player.x = clamp(player.x, player.radius, WIDTH - player.radius)
+                player.y = clamp(player.y, player.radius, HEIGHT - player.radius)
+
+                if killed:
+                    self.game_over = True
+                break
+
+    def _collect_drops(self):
+        # collisions: drops -> player
+        player = self.player
+        player_rect = self._player_rect()
+        now = self.clock.ticks()
+        for d in self.drops[:]:
+            if d.rect.colliderect(player_rect):
+                self.drops.remove(d); self.drop_pool.release(d); self.events.append('pickup')
+                if d.kind == 'multishot':
+                    player.multishot_active = True
+                    player.multishot_end_time = now + BUFF_DURATION_MS
+
+                elif d.kind == 'shield':
+                    player.shield_active = True
+                    player.shield_uses = 3
+                    player.shield_end_time = now + SHIELD_DURATION_MS
+
+                elif d.kind == 'heal':
+                    # heal only +1, not full
+                    player.hp = min(player.hp_max, player.hp + 1)
+
+# --------------------
+# Replays: seed + per-tick SimInput stream in a compact binary log
+# --------------------
+# File: magic, version, varint seed, varint tick count, u32 crc of the final sim state, then
+# records. A record is a flags byte, then
+#   plain tick (no drag/shop): varint run length -- identical consecutive ticks share one record
+#   DRAG: zigzag varint dx, dy from the previous drag position
+#   SHOP: varint (purchase count * 2 + close_shop), then one varint per SHOP_OPTIONS index
+REPLAY_MAGIC = b"AIRP"
+REPLAY_VERSION = 1
+_R_LEFT, _R_RIGHT, _R_UP, _R_DOWN, _R_SPACE, _R_PAUSE, _R_DRAG, _R_SHOP = (1 << i for i in range(8))
+_SHOP_CODES = [code for _, _, code in SHOP_OPTIONS]
+
+def _put_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80); n >>= 7
+    buf.append(n)
+
+def _get_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]; pos += 1
+        n |= (b & 0x7F) << shift; shift += 7
+        if b < 0x80: return n, pos
+
+def _zigzag(n): return (n << 1) ^ (n >> 63)
+def _unzigzag(n): return (n >> 1) ^ -(n & 1)
+
+def sim_digest(sim):
+    """CRC of the state a replay must reproduce exactly."""
+    p = sim.player; w = sim.wave
+    state = (sim.frame, w.wave_num, w.alive_count, p.score, p.hp, p.hp_max, p.x, p.y,
+             sim.bullets.n, sim.enemy_bullets.n, len(sim.drops), sim.game_over, sim.rng.getstate())
+    return zlib.crc32(repr(state).encode())
+
+class ReplayRecorder:
+    """Encodes one run's inputs as they are stepped; save() writes the replay file."""
+    def __init__(self, seed):
+        self.seed = seed; self.buf = bytearray(); self.ticks = 0; self.saved = False
+        self.run_flags = None; self.run_len = 0; self.last_drag = (0, 0)
+
+    def record(self, inputs, paused=False):
+        f = ((_R_LEFT if inputs.left else 0) | (_R_RIGHT if inputs.right else 0) | (_R_UP if inputs.up else 0)
+             | (_R_DOWN if inputs.down else 0) | (_R_SPACE if inputs.space else 0) | (_R_PAUSE if paused else 0))
+        self.ticks += 1; self.saved = False
+        if inputs.drag is None and not inputs.purchases and not inputs.close_shop:
+            if f == self.run_flags: self.run_len += 1; return
+            self._flush(); self.run_flags = f; self.run_len = 1
+            return
+        self._flush(); buf = self.buf
+        if inputs.drag is not None: f |= _R_DRAG
+        if inputs.purchases or inputs.close_shop: f |= _R_SHOP
+        buf.append(f)
+        if inputs.drag is not None:
+            x, y = int(inputs.drag[0]), int(inputs.drag[1])
+            _put_varint(buf, _zigzag(x - self.last_drag[0])); _put_varint(buf, _zigzag(y - self.last_drag[1]))
+            self.last_drag = (x, y)
+        if f & _R_SHOP:
+            _put_varint(buf, len(inputs.purchases) * 2 + bool(inputs.close_shop))
+            for code in inputs.purchases: _put_varint(buf, _SHOP_CODES.index(code))
+
+    def _flush(self):
+        if self.run_len:
+            self.buf.append(self.run_flags); _put_varint(self.buf, self.run_len)
+        self.run_flags = None; self.run_len = 0
+
+    def save(self, path, sim):
+        self._flush()
+        head = bytearray(REPLAY_MAGIC); head.append(REPLAY_VERSION)
+        _put_varint(head, self.seed); _put_varint(head, self.ticks); head += struct.pack("<I", sim_digest(sim))
+        with open(path, "wb") as fh: fh.write(head + self.buf)
+        self.saved = True
+
+class Replay:
+    """A loaded replay file; inputs() yields the recorded SimInputs in step order."""
+    def __init__(self, seed, ticks, digest, body):
+        self.seed = seed; self.ticks = ticks; self.digest = digest; self.body = body
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fh: data = fh.read()
+        if data[:4] != REPLAY_MAGIC: raise ValueError(f"{path}: not a replay file")
+        if data[4] != REPLAY_VERSION: raise ValueError(f"{path}: replay version {data[4]}, expected {REPLAY_VERSION}")
+        seed, pos = _get_varint(data, 5); ticks, pos = _get_varint(data, pos)
+        digest, = struct.unpack_from("<I", data, pos)
+        return cls(seed, ticks, digest, data[pos + 4:])
+
+    def inputs(self):
+        data = self.body; pos = 0; end = len(data); dx = dy = 0
+        while pos < end:
+            f = data[pos]; pos += 1
+            keys = dict(left=bool(f & _R_LEFT), right=bool(f & _R_RIGHT), up=bool(f & _R_UP), down=bool(f & _R_DOWN), space=bool(f & _R_SPACE))
+            if not f & (_R_DRAG | _R_SHOP):
+                run, pos = _get_varint(data, pos)
+                inputs = SimInput(**keys)
+                for _ in range(run): yield inputs
+                continue
+            drag = None; purchases = (); close = False
+            if f & _R_DRAG:
+                zx, pos = _get_varint(data, pos); zy, pos = _get_varint(data, pos)
+                dx += _unzigzag(zx); dy += _unzigzag(zy); drag = (dx, dy)
+            if f & _R_SHOP:
+                n, pos = _get_varint(data, pos); close = bool(n & 1); codes = []
+                for _ in range(n >> 1):
+                    i, pos = _get_varint(data, pos); codes.append(_SHOP_CODES[i])
+                purchases = tuple(codes)
+            yield SimInput(drag=drag, purchases=purchases, close_shop=close, **keys)
+
+def play_replay(path, profile=False):
+    """Re-run a replay headlessly as fast as possible and check it lands on the recorded state."""
+    rep = Replay.load(path)
+    sim = GameSim(rep.seed)
+    if profile: sim.profiler = PhaseTimer()
+    t0 = time.perf_counter()
+    for inputs in rep.inputs():
+        if profile: sim.profiler.start()
+        sim.step(inputs)
+        if profile: sim.profiler.end_frame()
+    secs = time.perf_counter() - t0
+    ok = sim_digest(sim) == rep.digest
+    print(f"{path}: {rep.ticks} ticks in {secs:.2f}s ({rep.ticks / max(secs, 1e-9):.0f} ticks/s, {rep.ticks / TICK_RATE / max(secs, 1e-9):.1f}x real time)")
+    print(f"wave {sim.wave.wave_num}, score {sim.player.score}, game over {sim.game_over}; final state {'matches' if ok else 'DIFFERS from'} the recording")
+    if profile and sim.profiler.frames:
+        for lap in PROFILE_GROUPS:
+            ms = np.array([f.get(lap, 0.0) for f in sim.profiler.frames]) * 1000.0
+            if ms.any(): print(f"  {lap:<15} p50 {np.percentile(ms, 50):7.3f}  p99 {np.percentile(ms, 99):7.3f}  max {ms.max():7.3f} ms")
+    return ok
+
+# --------------------
+# Shop
+# --------------------
+class Shop:
+    def __init__(self): pass
+    def open(self, screen, player, presenter=None):
+        """
+        Blocking shop screen. Returns the purchase codes picked; GameSim.buy applies them.
+        Sleeps in pygame.event.wait() between inputs and redraws only when something changed.
+        """
+        font, big = get_font(24), get_font(40)
+        options = SHOP_OPTIONS
+        selected = 0
+        score = player.score; purchases = []
+        presenter = presenter or FlipPresenter(); presenter.invalidate()
+        shown = None  # (selected, score) currently on screen; the shop only redraws when it changes
+        events = ()
+        while True:
+            for ev in events:
+                if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
+                if ev.type in EXPOSE_EVENTS: presenter.invalidate(); presenter.present()
+                buy = None
+                if ev.type == pygame.KEYDOWN:
+                    if ev.key == pygame.K_t: return purchases
+                    if ev.key == pygame.K_UP: selected = (selected - 1) % len(options)
+                    if ev.key == pygame.K_DOWN: selected = (selected + 1) % len(options)
+                    if ev.key == pygame.K_RETURN: buy = selected
+                if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
+                    mx,my = to_logical(ev.pos); base_y = 240
+                    for i,op in enumerate(options):
+                        rect = pygame.Rect(180, base_y + i*60, 520, 48)
+                        if rect.collidepoint(mx,my): selected = i; buy = i
+                if buy is not None:
+                    _, cost, code = options[buy]
+                    if score >= cost:
+                        score -= cost; purchases.append(code)
+            if shown == (selected, score): events = [pygame.event.wait()] + pygame.event.get(); continue
+            if shown is not None:
+                presenter.mark_rect(*px_rect(180, 240, 520, len(options) * 60)); presenter.mark_rect(*px_rect(WIDTH - 160, 20, 160, 30))
+            shown = (selected, score)
+            screen.fill((6,6,14))
+            title = text_cache.render(big, "SHOP - Spend Score", YELLOW); blit_text(screen, title, None, 80)
+            info = text_cache.render(font, f"Score: {score}", WHITE); blit_text(screen, info, WIDTH-160, 20)
+            base_y = 240
+            for i, (desc, cost, code) in enumerate(options):
+                rect = pygame.Rect(180, base_y + i*60, 520, 48); color = (40,40,80) if i!=selected else (70,70,120)
+                pygame.draw.rect(screen, color, px_rect(*rect)); txt = text_cache.render(font, f"{desc} — Cost: {cost}", WHITE); blit_text(screen, txt, rect.x + 10, rect.y + 10)
+            tip = text_cache.render(font, "Use Up/Down, Enter to buy, or click option. Press T to continue.", GRAY); blit_text(screen, tip, None, HEIGHT - 80)
+            presenter.present()
+            events = [pygame.event.wait()] + pygame.event.get()
+
+# --------------------
+# Rendering (reads a GameSim, never mutates gameplay state)
+# --------------------
+class SpriteBatch:
+    """
+    One frame's world draw list. Entities queue (atlas region, position) commands into their
+    layer; anything wholly off the canvas is dropped as it is queued (dynamic enemies wait at
+    y=-40 or x=+-200, bullets live until 40 px out). flush() then submits each layer, in LAYERS
+    order, with a single Surface.blits() call; a TexturePresenter instead draws the same
+    commands as textured quads. The few translucent extras (health-bar shade, invincibility
+    ring, particles) and the UI drawn over the world queue their own surfaces the same way.
+    """
+    def __init__(self, size):
+        self.w, self.h = size; self.layers = [[] for _ in LAYERS]
+
+    def add(self, layer, region, x, y):
+        """Queue an atlas region with its top-left at canvas (x, y)."""
+        if x < self.w and y < self.h and x + region.w > 0 and y + region.h > 0:
+            self.layers[layer].append((atlas.surface, (x, y), region))
+
+    def add_surface(self, layer, surf, x, y):
+        if x < self.w and y < self.h and x + surf.get_width() > 0 and y + surf.get_height() > 0:
+            self.layers[layer].append((surf, (x, y)))
+
+    def add_many(self, layer, sprites, kinds, xs, ys):
+        """Queue sprites[kinds[i]] at (xs[i], ys[i]) for whole arrays; sprites are atlas regions or surfaces."""
+        regions = [isinstance(spr, pygame.Rect) for spr in sprites]
+        size = np.array([spr.size if reg else spr.get_size() for spr, reg in zip(sprites, regions)]).reshape(-1, 2)[kinds]
+        on = (xs < self.w) & (ys < self.h) & (xs + size[:, 0] > 0) & (ys + size[:, 1] > 0)
+        src = [(atlas.surface, spr) if reg else (spr, None) for spr, reg in zip(sprites, regions)]
+        self.layers[layer].extend([(src[k][0], (x, y), src[k][1]) for k, x, y in zip(kinds[on].tolist(), xs[on].tolist(), ys[on].tolist())])
+
+    def flush(self, surf):
+        for layer in self.layers:
+            if layer: surf.blits(layer, doreturn=False); layer.clear()
+
+def draw_world(sim, batch):
+    """Queue the frame's entities; presenter.draw() (or batch.flush()) puts them on screen."""
+    for e in sim.wave.enemies: e.draw(batch)
+    sim.bullets.draw(batch)
+    sim.enemy_bullets.draw(batch)
+    for d in sim.drops: d.draw(batch)
+    sim.player.draw(batch)
+    sim.particles.draw(batch)
+
+class Hud:
+    """
+    Score/HP/timer strip as one cached layer. Each frame only the displayed values are
+    compared (timers as rounded on screen); the layer is redrawn when one of them changes.
+    """
+    def __init__(self, font):
+        self.font = font; self.values = None; self.changed = True
+        self.layer = pygame.Surface((px(WIDTH), px(HUD_HEIGHT)), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None: self.layer = self.layer.convert_alpha()
+
+    def displayed(self, sim):
+        player = sim.player; wave = sim.wave; now = sim.clock.ticks()
+        status = f"SCORE: {player.score}   WAVE: {wave.wave_num}   ENEMIES: {wave.alive_count}"
+        shield = None
+        if player.shield_active and player.shield_end_time > now:
+            shield = f"SHIELD: {(player.shield_end_time - now) / 1000.0:.1f}s"
+        if player.ultimate_active:
+            ult = (f"ULTIMATE ACTIVE: {max(0, player.ultimate_end_time - now)//1000 + 1}s", YELLOW)
+        elif player.ultimate_available:
+            ult = ("ULTIMATE: READY! Press SPACE to use", YELLOW)
+        else:
+            ult = (f"ULTIMATE: {player.ultimate_count}/{player.ultimate_needed}", GRAY)
+        multi = f"MULTISHOT: {max(0, player.multishot_end_time - now)//1000 + 1}s" if player.multishot_active else None
+        return (status, player.hp, player.hp_max, shield, ult, multi)
+
+    def draw(self, surf, sim):
+        values = self.displayed(sim)
+        self.changed = values != self.values
+        if self.changed: self.values = values; self.redraw(values)
+        surf.blit(self.layer, (0, 0))
+
+    def redraw(self, values):
+        status, hp, hp_max, shield, ult, multi = values
+        layer = self.layer; font = self.font
+        layer.fill((0, 0, 0, 0))
+        def put(text, color, x, y):
+            # the layer is clear under each string, so MAX copies the text's own alpha
+            txt = text_cache.render(font, text, color)
+            layer.blit(txt, (px(x) if x >= 0 else layer.get_width() - txt.get_width() + px(x), px(y)), special_flags=pygame.BLEND_RGBA_MAX)
+        put(status, WHITE, 12, 12)
+        hpw = 160; hp_x = WIDTH - hpw - 20; hp_y = 18
+        pygame.draw.rect(layer, GRAY, px_rect(hp_x, hp_y, hpw, 18))
+        pygame.draw.rect(layer, RED, px_rect(hp_x, hp_y, int(hpw * hp / max(1, hp_max)), 18))
+        put(f"HP: {hp}/{hp_max}", WHITE, hp_x + 6, hp_y - 18)
+        if shield: put(shield, SHIELD_BLUE, -20, hp_y + 22)  # top-right
+        put(ult[0], ult[1], 12, 36)
+        if multi: put(multi, YELLOW, 12, 56)
+
+class Interpolator:
+    """
+    Draws the sim `alpha` of a tick past its previous state, so motion stays smooth whatever
+    the render rate. capture() runs before a frame's last tick; apply() moves everything drawn
+    to the blended position (pooled bullets and particles step back along their velocity) and
+    restore() puts the exact simulated values back, so drawing never feeds into the sim.
+    """
+    SNAP = 120  # px; a bigger jump in one tick (respawn at the top) is drawn as is
+
+    def __init__(self):
+        self.prev = None; self.saved = None
+
+    def capture(self, sim):
+        p = sim.player
+        self.prev = ((p, p.x, p.y), [(e, e.x, e.y) for e in sim.wave.enemies if e.alive], [(d, d.x, d.y) for d in sim.drops])
+
+    def apply(self, sim, alpha):
+        if self.prev is None: return
+        player, enemies, drops = self.prev
+        objs = []
+        for o, x, y in (player, *enemies, *drops):
+            objs.append((o, o.x, o.y))
+            if abs(o.x - x) + abs(o.y - y) < self.SNAP: o.x = x + (o.x - x) * alpha; o.y = y + (o.y - y) * alpha
+        back = (1.0 - alpha) * SIM_DT * 60; pools = []
+        for pool in (sim.bullets, sim.enemy_bullets, sim.particles):
+            n = pool.n; pools.append((pool, pool.x[:n].copy(), pool.y[:n].copy()))
+            pool.x[:n] -= pool.vx[:n] * back; pool.y[:n] -= pool.vy[:n] * back
+        self.saved = (objs, pools)
+
+    def restore(self):
+        if self.saved is None: return
+        objs, pools = self.saved; self.saved = None
+        for o, x, y in objs: o.x = x; o.y = y
+        for pool, x, y in pools: pool.x[:x.size] = x; pool.y[:y.size] = y
+
+def mark_world(presenter, sim, hud=None):
+    """Hand this frame's entity bounds (in canvas px) to a tracking presenter (and the HUD strip if it changed)."""
+    for e in sim.wave.enemies:
+        if not e.alive: continue
+        presenter.mark_rect(*px_rect(int(e.x - e.w/2), int(e.y - e.h/2), e.w, e.h))
+        if isinstance(e, Boss): presenter.mark_rect(*px_rect(int(e.x - 60), int(e.y - e.h//2 - 20), 120, 14))
+    s = _render_scale
+    for pool in (sim.bullets, sim.enemy_bullets):
+        n = pool.n; r = pool.radius[:n]
+        presenter.mark_boxes((pool.x[:n] - r) * s, (pool.y[:n] - r) * s, (pool.x[:n] + r) * s, (pool.y[:n] + r) * s)
+    pts = sim.particles; n = pts.n
+    presenter.mark_boxes((pts.x[:n] - 4) * s, (pts.y[:n] - 4) * s, (pts.x[:n] + 4) * s, (pts.y[:n] + 4) * s)
+    for d in sim.drops: presenter.mark_rect(*px_rect(int(d.x) - d.radius - 2, int(d.y) - d.radius - 2, d.radius*2 + 5, d.radius*2 + 5))
+    p = sim.player; r2 = p.radius * 2
+    presenter.mark_rect(*px_rect(int(p.x) - r2, int(p.y) - r2, r2*2 + 1, r2*2 + 1))
+    if hud is None or hud.changed: presenter.mark_rect(*px_rect(0, 0, WIDTH, HUD_HEIGHT))
+
+class ProfilerOverlay:
+    """
+    F3 frame profiler: rolling per-lap timings, a frame-time graph of the last few seconds
+    and entity counts. While hidden, main() leaves sim.profiler as None so nothing is timed.
+    The graph's budget line is the max_fps cap's frame time, or, uncapped or with vsync,
+    that of the frame rate measured over the graph.
+    """
+    def __init__(self, font, max_fps=FPS, vsync=False, seconds=PROFILER_SECONDS):
+        self.font = font; self.enabled = False
+        self.timer = PhaseTimer(seconds=seconds); self.seconds = seconds
+        self.cap = max_fps if max_fps > 0 and not vsync else None
+        self.panel = None; self.refresh = 0
+        self.line_h = font.get_linesize()
+        self.rect = pygame.Rect(px(8), px(HUD_HEIGHT), px(300), self.line_h * (len(PROFILE_GROUPS) + 6) + px(84))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.timer.clear(); self.panel = None
+
+    def draw(self, batch, sim):
+        self.refresh -= 1
+        if self.panel is None or self.refresh <= 0:
+            self.panel = self.render(sim); self.refresh = PROFILER_REFRESH_FRAMES
+        batch.add_surface(LAYER_UI, self.panel, *self.rect.topleft)
+
+    def render(self, sim):
+        panel = pygame.Surface(self.rect.size, pygame.SRCALPHA); panel.fill((0, 0, 0, 170))
+        frames = list(self.timer.frames); stamps = list(self.timer.stamps)
+        totals = [sum(f.values()) * 1000.0 for f in frames]
+        last = len([t for t in stamps if t >= stamps[-1] - 1.0]) if stamps else 0  # frames in the last second
+        recent = frames[-last:] if last else [{}]
+        y = px(6)
+        def line(text, color=WHITE):
+            nonlocal y
+            panel.blit(self.font.render(text, True, color), (px(8), y)); y += self.line_h
+        # live numbers change every refresh, so they bypass text_cache
+        line(f"FRAME  avg {sum(totals[-last:]) / max(1, last):5.2f} ms  max {max(totals, default=0):5.2f} ms", YELLOW)
+        for lap in PROFILE_GROUPS:
+            line(f"  {lap:<15}{sum(f.get(lap, 0.0) for f in recent) * 1000.0 / len(recent):6.3f} ms", GRAY if lap in ('background', 'present') else WHITE)
+        line(f"enemies {sim.wave.alive_count}  drops {len(sim.drops)}", CYAN)
+        line(f"bullets {sim.bullets.n}  enemy_bullets {sim.enemy_bullets.n}", CYAN)
+        line(f"particles {sim.particles.n}", CYAN)
+        line("pools hit/miss " + "  ".join(f"{p.hits}/{p.misses}" for p in (sim.bullets, sim.enemy_bullets, sim.drop_pool, sim.particles)), GRAY)
+        # frame-time graph, 0..2 frame budgets tall, with the budget line
+        gx, gy, gw, gh = px(8), y + px(8), self.rect.w - px(16), px(64)
+        fps = self.cap or ((len(stamps) - 1) / (stamps[-1] - stamps[0]) if len(stamps) > 1 and stamps[-1] > stamps[0] else FPS)
+        budget = 1000.0 / fps
+        pygame.draw.rect(panel, (30, 30, 50, 220), (gx, gy, gw, gh))
+        pygame.draw.line(panel, (90, 90, 120), (gx, gy + gh // 2), (gx + gw - 1, gy + gh // 2))
+        if len(totals) > 1:
+            t0 = stamps[-1] - self.seconds  # x is time: the newest frame at the right edge
+            pts = [(gx + (s - t0) / self.seconds * (gw - 1), gy + gh - 1 - min(gh - 1, t / (2 * budget) * gh)) for s, t in zip(stamps, totals)]
+            pygame.draw.lines(panel, GREEN, False, pts)
+        return panel
+
+# --------------------
+# Presenting (getting the finished frame onto the window)
+# --------------------
+# the window lost its contents (uncovered, restored, resized); static screens answer with a full present
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED)
+
+def open_window(scale=RENDER_SCALE, fullscreen=False, vsync=False, stretch=True):
+    """
+    The display surface is the canvas: WIDTH x HEIGHT at `scale` canvas px per logical px.
+    With stretch, SDL scales it to a resizable window (or the whole screen), letterboxed, and
+    reports mouse positions in canvas px, so the window's real size never reaches the game.
+    Without it the window is exactly the canvas (partial updates need that).
+    """
+    set_render_scale(scale)
+    size = (px(WIDTH), px(HEIGHT))
+    if stretch: flags = pygame.SCALED | (pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE)
+    else: flags = pygame.FULLSCREEN if fullscreen else 0
+    pygame.display.set_caption(WINDOW_TITLE)
+    if vsync:
+        # vsync keeps the stretch choice: an unstretched window (dirty rects) must stay unscaled
+        try: return pygame.display.set_mode(size, flags, vsync=1)
+        except pygame.error: pass  # no vsync-capable renderer; fall back to the max_fps cap
+    return pygame.display.set_mode(size, flags)
+
+def open_display(scale=RENDER_SCALE, fullscreen=False, vsync=False, dirty_rects=False, backend='software', stretch=True):
+    """
+    The canvas frames are drawn on (background, HUD, menus) and the presenter that takes
+    each frame's world batch and gets it all to the window. 'sdl2' falls back to 'software'
+    where pygame._sdl2 or a window for it isn't available.
+    """
+    if backend == 'sdl2':
+        set_render_scale(scale)
+        try: presenter = TexturePresenter((px(WIDTH), px(HEIGHT)), fullscreen, vsync)
+        except (ImportError, RuntimeError) as e: print(f"sdl2 renderer unavailable ({e}); using software")
+        else: return presenter.canvas, presenter
+    # dirty rects only pay off when the window is the canvas itself, so they keep it unstretched
+    screen = open_window(scale, fullscreen, vsync, stretch=stretch and not dirty_rects)
+    return screen, (DirtyRectPresenter(*screen.get_size()) if dirty_rects else FlipPresenter())
+
+class FlipPresenter:
+    """
+    Default: flip the whole window every frame. Marks are ignored. Every presenter takes
+    the frame's world batch through draw(); the software ones blit it onto the canvas.
+    """
+    tracks = False
+    def draw(self, batch, canvas): batch.flush(canvas)
+    def bake(self, canvas): pass  # the last world is already on the canvas
+    def mark_rect(self, x, y, w, h): pass
+    def mark_boxes(self, x0, y0, x1, y1): pass
+    def invalidate(self): pass
+    def present(self): pygame.display.flip()
+
+    def toggle_fullscreen(self):
+        try: pygame.display.toggle_fullscreen()
+        except pygame.error: pass  # the video driver can't switch (dummy, some X11 setups)
+
+class DirtyRectPresenter(FlipPresenter):
+    """
+    Presents only what changed with pygame.display.update(rects), for CPU-only machines on
+    the software renderer. Marks land on a coarse tile grid; a present pushes this frame's
+    tiles plus last frame's (the old bounds that now need erasing) as per-row runs. Past
+    flip_fraction of the window, or after invalidate(), it flips the whole window instead.
+    """
+    tracks = True
+    def __init__(self, w, h, tile=None, flip_fraction=DIRTY_FLIP_FRACTION):
+        tile = tile or max(8, px(DIRTY_TILE))  # w, h and marks are canvas px
+        self.w = w; self.h = h; self.tile = tile; self.flip_fraction = flip_fraction
+        self.cols = -(-w // tile); self.rows = -(-h // tile)
+        self.cur = np.zeros((self.rows, self.cols), dtype=bool); self.prev = np.zeros_like(self.cur)
+        self.full = True
+        self.flips = 0; self.updates = 0
+
+    def invalidate(self): self.full = True
+
+    def mark_rect(self, x, y, w, h):
+        t = self.tile
+        c0 = max(0, x // t); r0 = max(0, y // t)
+        c1 = min(self.cols - 1, (x + w - 1) // t); r1 = min(self.rows - 1, (y + h - 1) // t)
+        if c0 <= c1 and r0 <= r1: self.cur[r0:r1 + 1, c0:c1 + 1] = True
+
+    def mark_boxes(self, x0, y0, x1, y1):
+        # many small boxes at once; each spans at most two tiles per axis, so its corners cover it
+        on = (x1 >= 0) & (x0 < self.w) & (y1 >= 0) & (y0 < self.h)
+        if not on.any(): return
+        t = self.tile
+        c0 = np.clip(x0[on] // t, 0, self.cols - 1).astype(np.intp); c1 = np.clip(x1[on] // t, 0, self.cols - 1).astype(np.intp)
+        r0 = np.clip(y0[on] // t, 0, self.rows - 1).astype(np.intp); r1 = np.clip(y1[on] // t, 0, self.rows - 1).astype(np.intp)
+        cur = self.cur
+        cur[r0, c0] = True; cur[r0, c1] = True; cur[r1, c0] = True; cur[r1, c1] = True
+
+    def present(self):
+        dirty = self.cur | self.prev
+        if self.full or dirty.mean() > self.flip_fraction:
+            pygame.display.flip(); self.flips += 1
+        else:
+            rects = self.dirty_rects(dirty)
+            if rects: pygame.display.update(rects); self.updates += 1
+        self.prev, self.cur = self.cur, self.prev
+        self.cur[:] = False; self.full = False
+
+    def dirty_rects(self, dirty):
+        t = self.tile; bounds = pygame.Rect(0, 0, self.w, self.h); rects = []
+        for r in np.flatnonzero(dirty.any(axis=1)).tolist():
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], dirty[r].view(np.int8), [0]))))
+            for a, b in zip(edges[::2].tolist(), edges[1::2].tolist()):
+                rects.append(pygame.Rect(a * t, r * t, (b - a) * t, t).clip(bounds))
+        return rects
+
+class TexturePresenter:
+    """
+    Presents through an SDL2 renderer (pygame._sdl2.video) instead of the display surface.
+    Sprite surfaces (the atlas sheet, discs, shades) are uploaded to textures once, on first
+    use; the world batch is kept as-is by draw() and replayed as textured quads over the
+    canvas, which is streamed up as one texture per present. The renderer's logical size
+    letterboxes the canvas into the window and maps mouse positions back to canvas px.
+    Without an accelerated renderer (headless CI, the dummy driver) SDL's software one is used.
+    """
+    tracks = False
+    def __init__(self, size, fullscreen=False, vsync=False):
+        from pygame._sdl2 import video
+        self.Texture = video.Texture
+        self.window = video.Window(WINDOW_TITLE, size=size, resizable=True, fullscreen_desktop=fullscreen)
+        for accelerated in (1, 0):
+            try: self.renderer = video.Renderer(self.window, accelerated=accelerated, vsync=vsync and accelerated); break
+            except video.error:
+                if not accelerated: self.window.destroy(); raise
+        self.accelerated = bool(accelerated); self.fullscreen = fullscreen
+        self.renderer.logical_size = size
+        self.canvas = pygame.Surface(size)
+        self.canvas_tex = video.Texture(self.renderer, size, streaming=True)
+        self.textures = weakref.WeakKeyDictionary()  # sprite surface -> (Texture, atlas frames when uploaded)
+        self.world = []; self.shown = []  # queued draw commands; the last presented ones
+
+    def texture(self, surf):
+        # the atlas sheet is uploaded again if frames were added to it since
+        frames = len(atlas.regions) if surf is atlas.surface else 0
+        tex, uploaded = self.textures.get(surf, (None, None))
+        if uploaded != frames: tex = self.Texture.from_surface(self.renderer, surf); self.textures[surf] = (tex, frames)
+        return tex
+
+    def draw(self, batch, canvas):
+        for layer in batch.layers: self.world.extend(layer); layer.clear()
+
+    def bake(self, canvas):
+        """Blit the last presented world onto the canvas, which then stands alone (pause, shop)."""
+        canvas.blits(self.shown, doreturn=False)
+
+    def mark_rect(self, x, y, w, h): pass
+    def mark_boxes(self, x0, y0, x1, y1): pass
+    def invalidate(self): pass
+
+    def present(self):
+        self.canvas_tex.update(self.canvas)
+        self.renderer.clear(); self.canvas_tex.draw()
+        last = tex = None
+        for cmd in self.world:
+            src = cmd[0]
+            if src is not last: tex = self.texture(src); last = src
+            area = cmd[2] if len(cmd) > 2 else None
+            if area is None: tex.draw(None, cmd[1])
+            else: tex.draw(area, (*cmd[1], area.w, area.h))
+        self.renderer.present()
+        self.shown, self.world = self.world, []
+
+    def toggle_fullscreen(self):
+        self.fullscreen = not self.fullscreen
+        if self.fullscreen: self.window.set_fullscreen(desktop=True)
+        else: self.window.set_windowed()
+
+# --------------------
+# Main Game
+# --------------------
+def main(dirty_rects=DIRTY_RECTS, record=None, time_startup=False, sound=True, max_fps=FPS, vsync=False,
+         render_scale=RENDER_SCALE, fullscreen=False, backend='software'):
+    """
+    Gameplay runs in fixed SIM_DT ticks, as many per frame as real time calls for; frames are
+    drawn interpolated between the last two ticks at up to max_fps (0 = as fast as possible),
+    or at the display's refresh rate with vsync. Frames are drawn at render_scale canvas px per
+    logical px and stretched to the window; F11 toggles fullscreen. `backend` picks the
+    renderer (RENDER_BACKENDS); the loop only ever talks to its presenter.
+    """
+    pygame.display.init()
+    screen, presenter = open_display(render_scale, fullscreen, vsync, dirty_rects, backend)
+    build_atlas()
+    clock = pygame.time.Clock()
+    font = get_font(18)
+    bigfont = get_font(40)
+    background = Background(WIDTH, HEIGHT)
+    cw, ch = screen.get_size(); batch = SpriteBatch((cw, ch))
+    # everything allocated so far lives for the whole session; keep it out of GC passes
+    gc.collect(); gc.freeze()
+
+    state = 'menu'
+    menu_blink = 0.0
+    fade_alpha = 0.0
+    fade_surf = pygame.Surface((cw, ch)); fade_surf.fill((0,0,0))
+    frozen = None  # the last gameplay frame, kept while the game-over screen fades over it
+    idle = False  # the screen is static: block in event.wait() until the next input
+
+    sim = GameSim(); shop = Shop(); hud = Hud(font); overlay = ProfilerOverlay(font, max_fps, vsync)
+    recorder = None  # ReplayRecorder for the current run when recording
+    sounds = None  # SoundEngine, opened once the menu is up so it never delays the first frame
+    def new_run():
+        nonlocal sounds
+        if sounds is None: sounds = SoundEngine(enabled=sound)  # RETURN / a click in the first events skips the menu frame
+        run = GameSim()
+        return run, (ReplayRecorder(run.seed) if record else None)
+    shown_state = None
+    dragging = False; drag_offset_x = 0
+    pygame.mouse.set_visible(True)
+    acc = 0.0; lerp = Interpolator()  # real time not yet simulated; blends the last two ticks for drawing
+    space = False; drag = None; paused_tick = False  # one-shot inputs, held until a tick consumes them
+
+    try:
+        while True:
+            dt_ms = clock.tick(max_fps)
+            dt = dt_ms / 1000.0
+            menu_blink += dt
+            prof = overlay.timer if overlay.enabled else None
+            if prof: prof.start()
+
+            events = pygame.event.get()
+            if idle and not events: events = [pygame.event.wait()] + pygame.event.get()
+            idle = False; exposed = False
+            for ev in events:
+                if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
+                if ev.type in EXPOSE_EVENTS: presenter.invalidate(); exposed = True
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F11: presenter.toggle_fullscreen(); presenter.invalidate(); exposed = True
+                if state == 'menu':
+                    if ev.type == pygame.KEYDOWN and ev.key == pygame.K_RETURN:
+                        state = 'playing'; sim, recorder = new_run()
+                    if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
+                        state = 'playing'; sim, recorder = new_run()
+                elif state == 'playing':
+                    player = sim.player
+                    if ev.type == pygame.KEYDOWN:
+                        if ev.key == pygame.K_p:
+                            paused = True; paused_tick = True
+                            pause_surf = text_cache.render(bigfont, "PAUSED — Press P to resume", YELLOW)
+                            presenter.bake(screen)
+                            presenter.mark_rect(*blit_text(screen, pause_surf, None, HEIGHT//2-24))
+                            presenter.present()
+                            while paused:
+                                e = pygame.event.wait()
+                                if e.type == pygame.QUIT: pygame.quit(); sys.exit()
+                                if e.type == pygame.KEYDOWN and e.key == pygame.K_p: paused = False
+                                if e.type == pygame.KEYDOWN and e.key == pygame.K_F11: presenter.toggle_fullscreen(); presenter.invalidate(); presenter.present()
+                                if e.type in EXPOSE_EVENTS: presenter.invalidate(); presenter.present()
+                            clock.tick()  # the pause is not simulated
+                            if prof: prof.skip()
+                        if ev.key == pygame.K_F3: overlay.toggle(); presenter.invalidate()
+                        if ev.key == pygame.K_ESCAPE: pygame.quit(); sys.exit()
+                        if ev.key == pygame.K_r and sim.game_over: sim, recorder = new_run(); state = 'playing'
+                        if ev.key == pygame.K_SPACE: space = True
+                    if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
+                        mx,my = to_logical(ev.pos)
+                        if math.hypot(mx - player.x, my - player.y) < 120:
+                            dragging = True; drag_offset_x = player.x - mx
+                    if ev.type == pygame.MOUSEBUTTONUP and ev.button == 1:
+                        dragging = False
+                    if ev.type == pygame.MOUSEMOTION and dragging:
+                        drag = to_logical(ev.pos)
+                elif state == 'gameover':
+                    if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1 and fade_alpha >= 255: state = 'menu'
+                    if ev.type == pygame.KEYDOWN and ev.key == pygame.K_RETURN and fade_alpha >= 255: state = 'menu'
+
+            if state != shown_state: presenter.invalidate(); shown_state = state
+
+            # MENU
+            if state == 'menu':
+                background.update(dt * 60)
+                background.draw(screen)
+                title = text_cache.render(bigfont, "ALIEN INVADERS", CYAN); blit_text(screen, title, None, 140)
+                subtitle = text_cache.render(font, "Remastered Enhanced Edition", GRAY); blit_text(screen, subtitle, None, 200)
+                draw_spinning_globe(screen, WIDTH//2, 320, 80, menu_blink * 0.9)
+                prompt_surf = text_cache.render(font, "Press ENTER or Click to Play", WHITE); shadow = text_cache.render(font, "Press ENTER or Click to Play", (40,40,40))
+                screen.blit(shadow, (cw//2 - prompt_surf.get_width()//2 + px(2), px(420 + 2))); blit_text(screen, prompt_surf, None, 420)
+                tip = text_cache.render(font, "YOUR PLANET IS BEING INVADED!", GRAY); blit_text(screen, tip, None, HEIGHT-60)
+                if presenter.tracks:
+                    background.mark_dirty(presenter); presenter.mark_rect(*px_rect(WIDTH//2 - 80, 320 - 80, 161, 161))
+                presenter.present()
+                if time_startup:
+                    print(f"time to first frame: {(time.perf_counter() - _STARTED) * 1000:.0f} ms"); return
+                if sounds is None: sounds = SoundEngine(enabled=sound)
+                acc = 0.0; lerp.prev = None
+                continue
+
+            # PLAYING
+            if state == 'playing':
+                keys = pygame.key.get_pressed()
+                if prof: prof.lap('input')
+                sim.profiler = prof
+                # fixed ticks for the real time that passed; a frame may run none, one or several
+                acc += min(dt, MAX_FRAME_TIME)
+                while acc >= SIM_DT and state == 'playing':
+                    acc -= SIM_DT
+                    if acc < SIM_DT: lerp.capture(sim)
+                    inputs = SimInput(
+                        left=keys[pygame.K_LEFT] or keys[pygame.K_a], right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+                        up=keys[pygame.K_UP] or keys[pygame.K_w], down=keys[pygame.K_DOWN] or keys[pygame.K_s],
+                        drag=drag, space=space)
+                    if recorder: recorder.record(inputs, paused_tick)
+                    space = False; drag = None; paused_tick = False
+                    sim.step(inputs, SIM_DT)
+                    sounds.play_events(sim.events)
+
+                    if sim.game_over:
+                        state = 'gameover'; fade_alpha = 0.0; frozen = None
+                        acc = 0.0; lerp.prev = None  # the loop stops early: no capture for the unspent time
+                        if recorder: recorder.save(record, sim)
+
+                    # shop handling
+                    if sim.in_shop:
+                        presenter.bake(screen)
+                        inputs = SimInput(purchases=tuple(shop.open(screen, sim.player, presenter)), close_shop=True)
+                        if recorder: recorder.record(inputs)
+                        sim.step(inputs, SIM_DT)
+                        presenter.invalidate()
+                        clock.tick(); acc = 0.0; lerp.prev = None  # time spent shopping is not simulated
+                        if prof: prof.skip()
+                background.update(dt * 60)
+                if prof: prof.lap('background')
+
+                # drawing
+                background.draw(screen)
+                hud.draw(screen, sim)
+                lerp.apply(sim, acc / SIM_DT)
+                draw_world(sim, batch)
+                if not sim.wave.any_alive():
+                    hint = text_cache.render(bigfont, "Wave Cleared! Entering SHOP...", YELLOW)
+                    hx, hy = cw//2 - hint.get_width()//2, px(HEIGHT//2 - 24)
+                    batch.add_surface(LAYER_UI, hint, hx, hy); presenter.mark_rect(hx, hy, *hint.get_size())
+                if overlay.enabled: overlay.draw(batch, sim); presenter.mark_rect(*overlay.rect)
+                presenter.draw(batch, screen)
+                if prof: prof.lap('draw')
+                if presenter.tracks: background.mark_dirty(presenter); mark_world(presenter, sim, hud)
+                lerp.restore()
+                presenter.present()
+                if prof: prof.lap('present'); prof.end_frame()
+                continue
+
+            # GAMEOVER (fade)
+            # the final gameplay frame is drawn once; the fade runs over that snapshot, then the
+            # finished screen just sits there until ENTER / click
+            if state == 'gameover':
+                if frozen is None:
+                    background.draw(screen)
+                    hud_surf = text_cache.render(font, f"SCORE: {sim.player.score}   WAVE: {sim.wave.wave_num}   ENEMIES: {sim.wave.alive_count}", WHITE)
+                    blit_text(screen, hud_surf, 12, 12)
+                    draw_world(sim, batch); batch.flush(screen)
+                    frozen = screen.copy()
+                elif fade_alpha >= 255:
+                    if exposed: presenter.present()
+                    idle = True; continue
+                fade_alpha = min(255.0, fade_alpha + dt * 255 / 1.0)
+                screen.blit(frozen, (0, 0)); fade_surf.set_alpha(int(fade_alpha)); screen.blit(fade_surf, (0, 0))
+                if fade_alpha >= 255:
+                    go = text_cache.render(bigfont, "GAME OVER", RED); sub = text_cache.render(font, "Press ENTER or Click to return to Menu", WHITE)
+                    blit_text(screen, go, None, HEIGHT//2 - 50); blit_text(screen, sub, None, HEIGHT//2 + 10)
+                presenter.invalidate()  # the fade touches every pixel
+                presenter.present(); continue
+    finally:
+        # quitting mid-run still leaves a replay of it
+        if recorder and not recorder.saved: recorder.save(record, sim)
+
+# --------------------
+# Benchmarks
+# --------------------
+def _collide_player_bullets_naive(sim):
+    # the pre-grid pass: every bullet against every enemy
+    pool = sim.bullets; n = pool.n
+    hit = []
+    for i, (x, y) in enumerate(zip(pool.x[:n].tolist(), pool.y[:n].tolist())):
+        for e in sim.wave.enemies:
+            if not e.alive: continue
+            if e.rect().collidepoint(x, y):
+                e.hp -= int(pool.damage[i])
+                hit.append(i)
+                break
+    pool.remove_indices(hit)
+
+def bench_collisions(enemy_counts=(50, 200, 1000), bullet_count=200, frames=200, seed=1234):
+    """Time the player-bullet -> enemy pass, brute force vs SpatialGrid, on the same seeded scene."""
+    print(f"player bullets -> enemies, {bullet_count} bullets, mean of {frames} frames")
+    print(f"{'enemies':>8} {'naive ms':>10} {'grid ms':>10} {'speedup':>8}")
+    for count in enemy_counts:
+        rng = random.Random(seed)
+        sim = GameSim(seed)
+        # enemies never die so every frame tests the same scene
+        sim.wave.set_enemies([Enemy(rng.uniform(20, WIDTH - 20), rng.uniform(20, HEIGHT - 120), hp=10**9, rng=rng) for _ in range(count)])
+        bx = [rng.uniform(0, WIDTH) for _ in range(bullet_count)]; by = [rng.uniform(0, HEIGHT) for _ in range(bullet_count)]
+        results = []
+        for collide in (_collide_player_bullets_naive, GameSim._collide_player_bullets):
+            total = 0.0
+            for _ in range(frames):
+                sim.bullets.clear(); sim.bullets.spawn_many(bx, by, 0, PLAYER_BULLET_SPEED, OWNER_PLAYER)
+                t0 = time.perf_counter(); collide(sim); total += time.perf_counter() - t0
+            results.append(total / frames * 1000.0)
+        print(f"{count:>8} {results[0]:>10.3f} {results[1]:>10.3f} {results[0] / results[1]:>7.1f}x")
+
+def _slot_names(cls):
+    return [name for c in cls.__mro__ for name in getattr(c, '__slots__', ())]
+
+def bench_memory(count=20000, repeat=5):
+    """
+    Bytes per entity and attribute-access time for the slotted entity classes against a
+    dict-backed twin holding the same attributes (the pre-__slots__ layout). Both copies
+    share their attribute values, so only the per-instance storage is compared.
+    """
+    import tracemalloc
+    samples = [
+        ('Enemy', lambda: Enemy(100, 100)), ('Boss', lambda: Boss(100, 100)),
+        ('RotatingShooterBoss', lambda: RotatingShooterBoss(100, 100)), ('TwinShooterBoss', lambda: TwinShooterBoss(100, 100)),
+        ('SpiralSpreadBoss', lambda: SpiralSpreadBoss(100, 100)), ('BurstEnemy', lambda: BurstEnemy(100, 100)),
+        ('BuffDrop', lambda: BuffDrop(100, 100)), ('Player', lambda: Player(SimClock())), ('Planet', lambda: Planet(WIDTH, HEIGHT)),
+    ]
+    print(f"{count} live entities per class; access = read x, y and write x on each, best of {repeat}")
+    print(f"{'class':<20} {'dict B':>7} {'slots B':>8} {'saved':>6} {'dict ns':>8} {'slots ns':>9}")
+    for name, make in samples:
+        proto = make(); cls = type(proto); names = _slot_names(cls)
+        values = [(n, getattr(proto, n)) for n in names]
+        twin_cls = type(name + "Dict", (), {})
+        def build(kind):
+            objs = [None] * count
+            for i in range(count):
+                o = kind.__new__(kind)
+                for n, v in values: setattr(o, n, v)
+                objs[i] = o
+            return objs
+        row = []
+        for kind in (twin_cls, cls):
+            gc.collect(); tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]; objs = build(kind)
+            per = (tracemalloc.get_traced_memory()[0] - before) / count
+            tracemalloc.stop()
+            best = float('inf')
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                for o in objs: o.x = o.x + o.y * 0.001
+                best = min(best, time.perf_counter() - t0)
+            row.append((per, best / count * 1e9)); del objs
+        (db, dns), (sb, sns) = row
+        print(f"{name:<20} {db:>7.0f} {sb:>8.0f} {1 - sb / db:>6.0%} {dns:>8.1f} {sns:>9.1f}")
+
+# Frame benchmark: seeded scenarios, each a setup(sim) and an optional per-frame hook(sim, frame, rng)
+def _bench_wave(num):
+    def setup(sim):
+        sim.wave.wave_num = num - 1; sim.wave.spawn_wave((sim.player.x, sim.player.y))
+    return setup
+
+def _bench_spiral_boss(sim):
+    boss = SpiralSpreadBoss(WIDTH//2, 140, hp=10**9, bullets=8, shoot_interval=0.15, rng=sim.rng)
+    sim.wave.set_enemies([boss])
+
+def _bench_mega_volley(sim):
+    # 600-bullet volleys: 5 rounds of a 120-bullet ring, plus an aimed fan
+    boss = PatternBoss(WIDTH//2, 140, [
+        Pattern('ring', 120, 2.5, 0.5, angle=(0.0, 0.7), rounds=5, speed_step=0.6, origin=(0, 36)),
+        Pattern('fan', 9, 5.0, 0.25, angle=0.0, spread=0.9, aim=True),
+    ], hp=10**9, rng=sim.rng)
+    sim.wave.set_enemies([boss])
+
+def _bench_barrage(sim):
+    _bench_wave(30)(sim)
+    p = sim.player
+    p.multishot_active = True; p.multishot_end_time = 10**12
+    p.ultimate_active = True; p.ultimate_end_time = 10**12; p.ultimate_fire_delay_ms = 0
+
+def _bench_barrage_frame(sim, frame, rng):
+    # ultimate volleys come from the sim; add a multishot volley every frame on top
+    sim.player.shoot(sim.bullets)
+
+def _bench_storm_frame(sim, frame, rng):
+    pts = sim.particles
+    while pts.n < 5000:
+        pts.emit(rng.uniform(40, WIDTH - 40), rng.uniform(60, HEIGHT - 60), color=ORANGE, num=min(200, 5000 - pts.n))
+
+BENCH_SCENARIOS = {
+    'wave1': (_bench_wave(1), None),
+    'wave50': (_bench_wave(50), None),
+    'spiral_boss': (_bench_spiral_boss, None),
+    'mega_volley': (_bench_mega_volley, None),
+    'barrage': (_bench_barrage, _bench_barrage_frame),
+    'particle_storm': (_bench_wave(1), _bench_storm_frame),
+}
+BENCH_PHASES = ('update', 'collision', 'draw', 'present')
+
+def bench_frames(frames=600, warmup=30, seed=1234, out="bench.json", dirty_rects=False, scenarios=None, render_scale=RENDER_SCALE,
+                 backends=RENDER_BACKENDS):
+    """
+    Play each scenario headlessly (dummy SDL driver) with scripted input and report
+    p50/p95/p99 frame time per phase in ms. The player can't die and a cleared wave is
+    respawned, so every frame measures the same load. Each backend runs every scenario, so
+    their draw + present times compare directly. Results also go to `out` as JSON.
+    """
+    if os.environ.get("SDL_VIDEODRIVER") != "dummy":
+        pygame.display.quit(); os.environ["SDL_VIDEODRIVER"] = "dummy"; pygame.display.init()
+    results = {}
+    for backend in backends:
+        results[backend] = _bench_backend(backend, frames, warmup, seed, dirty_rects, scenarios, render_scale)
+    if len(results) > 1:
+        print("draw + present p50, ms: " + " vs ".join(results))
+        for name in scenarios or BENCH_SCENARIOS:
+            print(f"{name:<15}" + "".join(f"{rows[name]['draw']['p50'] + rows[name]['present']['p50']:>10.2f}" for rows in results.values()))
+    report = {
+        'frames': frames, 'warmup': warmup, 'seed': seed, 'presenter': 'dirty-rects' if dirty_rects else 'flip', 'render_scale': render_scale,
+        'python': sys.version.split()[0], 'pygame': pygame.version.ver, 'numpy': np.__version__,
+        'backends': results,
+    }
+    if out:
+        with open(out, "w") as fh: json.dump(report, fh, indent=2)
+        print(f"wrote {out}")
+    return report
+
+def _bench_backend(backend, frames, warmup, seed, dirty_rects, scenarios, render_scale):
+    screen, presenter = open_display(render_scale, dirty_rects=dirty_rects, backend=backend, stretch=False)
+    label = type(presenter).__name__ + (f" ({'accelerated' if presenter.accelerated else 'software'} SDL renderer)" if isinstance(presenter, TexturePresenter) else "")
+    build_atlas(); batch = SpriteBatch(screen.get_size())
+    hud = Hud(get_font(18))
+    results = {}
+    print(f"{label}: {frames} frames per scenario after {warmup} warm-up, ms (p50/p95/p99)")
+    print(f"{'scenario':<15}" + "".join(f"{ph:>21}" for ph in BENCH_PHASES + ('frame',)))
+    for name in scenarios or BENCH_SCENARIOS:
+        setup, per_frame = BENCH_SCENARIOS[name]
+        random.seed(seed)  # planets draw from the global generator
+        bg = Background(WIDTH, HEIGHT, rng=np.random.default_rng(seed))
+        script = random.Random(seed)
+        presenter.invalidate()
+        sim = GameSim(seed); sim.player.hp = sim.player.hp_max = 10**9
+        setup(sim)
+        prof = sim.profiler = PhaseTimer(); counts = []
+        for f in range(warmup + frames):
+            prof.start()
+            if per_frame: per_frame(sim, f, script)
+            left = (f // 45) % 2 == 0
+            sim.step(SimInput(left=left, right=not left, space=f % 240 == 0))
+            if sim.in_shop:
+                sim.wave.wave_num -= 1; sim.step(SimInput(close_shop=True)); presenter.invalidate()
+            bg.update(1.0); prof.lap('background')
+            bg.draw(screen); hud.draw(screen, sim); draw_world(sim, batch); presenter.draw(batch, screen); prof.lap('draw')
+            if presenter.tracks: bg.mark_dirty(presenter); mark_world(presenter, sim, hud)
+            presenter.present(); prof.lap('present')
+            prof.end_frame()
+            counts.append((sim.wave.alive_count, sim.bullets.n + sim.enemy_bullets.n, sim.particles.n))
+        timed = prof.frames[warmup:]
+        row = {}
+        for ph in BENCH_PHASES + ('frame',):
+            ms = np.array([sum(v for k, v in t.items() if ph == 'frame' or PROFILE_GROUPS[k] == ph) for t in timed]) * 1000.0
+            p50, p95, p99 = np.percentile(ms, (50, 95, 99)).tolist()
+            row[ph] = {'p50': p50, 'p95': p95, 'p99': p99, 'mean': float(ms.mean())}
+        c = np.array(counts[warmup:])
+        row['entities'] = dict(zip(('enemies', 'bullets', 'particles'), c.mean(axis=0).round(1).tolist()))
+        row['pools'] = {name: {'hits': pool.hits, 'misses': pool.misses} for name, pool in
+                        (('bullets', sim.bullets), ('enemy_bullets', sim.enemy_bullets), ('drops', sim.drop_pool), ('particles', sim.particles))}
+        results[name] = row
+        print(f"{name:<15}" + "".join(f"{row[ph]['p50']:>7.2f}/{row[ph]['p95']:>6.2f}/{row[ph]['p99']:>6.2f}" for ph in BENCH_PHASES + ('frame',)))
+    return results
+
+# --------------------
+# Batch simulation (difficulty tuning): seeded bot games across a process pool
+# --------------------
+def bot_input(sim):
+    """Scripted player: sidestep bullets closing in from above, otherwise line up under the nearest enemy."""
+    p = sim.player; eb = sim.enemy_bullets; n = eb.n; move = 0
+    if n:
+        dx = eb.x[:n] - p.x; dy = p.y - eb.y[:n]
+        danger = (dy > -10) & (dy < 160) & (np.abs(dx) < 36) & (eb.vy[:n] > 0)
+        if danger.any():
+            move = -1 if dx[danger].mean() > 0 else 1
+            if (move < 0 and p.x < 60) or (move > 0 and p.x > WIDTH - 60): move = -move
+    if not move:
+        targets = [e.x for e in sim.wave.enemies if e.alive and e.y < p.y]
+        if targets:
+            tx = min(targets, key=lambda x: abs(x - p.x))
+            if abs(tx - p.x) > 8: move = 1 if tx > p.x else -1
+    return SimInput(left=move < 0, right=move > 0, space=p.ultimate_available)
+
+def bot_purchases(player):
+    """Shop picks by priority (heal when hurt, faster fire, then max HP) until the score runs out."""
+    score = player.score; hp = player.hp; delay = player.fire_delay_ms; picks = []
+    prices = {code: cost for _, cost, code in SHOP_OPTIONS}
+    while len(picks) < 5:
+        if hp < player.hp_max and score >= prices["heal"]: code = "heal"; hp = player.hp_max
+        elif delay > 80 and score >= prices["fire"]: code = "fire"; delay -= 20
+        elif score >= prices["hp"]: code = "hp"
+        else: break
+        score -= prices[code]; picks.append(code)
+    return tuple(picks)
+
+def run_bot_game(task):
+    """One headless game (worker side). Returns the run summary with per-wave stats."""
+    seed, max_waves, max_ticks = task
+    sim = GameSim(seed); player = sim.player
+    waves = []; start = 0; damage = 0; score0 = 0; prev_hp = player.hp
+    while sim.frame < max_ticks and not sim.game_over:
+        sim.step(bot_input(sim))
+        if player.hp < prev_hp: damage += prev_hp - player.hp
+        prev_hp = player.hp
+        if sim.in_shop:
+            waves.append({'wave': sim.wave.wave_num, 'cleared': True, 'secs': (sim.frame - start) / TICK_RATE,
+                          'damage': damage, 'score': player.score - score0})
+            if sim.wave.wave_num >= max_waves: break
+            sim.step(SimInput(purchases=bot_purchases(player), close_shop=True))
+            start = sim.frame; damage = 0; score0 = player.score; prev_hp = player.hp
+    if not sim.in_shop:
+        waves.append({'wave': sim.wave.wave_num, 'cleared': False, 'secs': (sim.frame - start) / TICK_RATE,
+                      'damage': damage, 'score': player.score - score0})
+    return {'seed': seed, 'wave_reached': sim.wave.wave_num, 'waves_cleared': sum(w['cleared'] for w in waves),
+            'score': player.score, 'ticks': sim.frame, 'died': sim.game_over,
+            'timeout': sim.frame >= max_ticks and not sim.game_over, 'waves': waves}
+
+def _batch_worker_init():
+    # if the parent ever started SDL video, its SIGTERM handler would swallow Pool.terminate()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def batch_run(runs, workers=None, out="batch.jsonl", seed=0, max_waves=30, max_ticks=TICK_RATE * 60 * 10):
+    """
+    Play `runs` seeded bot games on a process pool, one JSON line per run written as it
+    finishes, and print per-wave survival, time-to-clear and damage. Only per-wave counters
+    are kept in this process, so memory stays flat however many runs there are.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = ((s, max_waves, max_ticks) for s in range(seed, seed + runs))
+    chunk = max(1, min(16, runs // (workers * 8)))
+    reached = [0] * (max_waves + 1); cleared = [0] * (max_waves + 1)
+    secs = [0.0] * (max_waves + 1); damage = [0] * (max_waves + 1)
+    t0 = time.perf_counter(); done = 0
+    with open(out, "w", buffering=1) as fh, multiprocessing.Pool(workers, initializer=_batch_worker_init) as pool:
+        for res in pool.imap_unordered(run_bot_game, tasks, chunksize=chunk):
+            fh.write(json.dumps(res) + "\n"); done += 1
+            for w in res['waves']:
+                i = w['wave']; reached[i] += 1; damage[i] += w['damage']
+                if w['cleared']: cleared[i] += 1; secs[i] += w['secs']
+            if done % max(1, runs // 10) == 0: print(f"{done}/{runs} runs, {done / (time.perf_counter() - t0):.1f} runs/s")
+    print(f"{runs} runs on {workers} workers in {time.perf_counter() - t0:.1f}s -> {out}")
+    print(f"{'wave':>4} {'reached':>8} {'cleared':>8} {'survival':>9} {'clear s':>8} {'damage':>7}")
+    for i in range(1, max_waves + 1):
+        if not reached[i]: break
+        print(f"{i:>4} {reached[i]:>8} {cleared[i]:>8} {cleared[i] / reached[i]:>8.1%} {secs[i] / max(1, cleared[i]):>8.1f} {damage[i] / reached[i]:>7.2f}")
+
+# --------------------
+# Run
+# --------------------
+if __name__ == '__main__':
+    # a frozen (PyInstaller) build re-executes itself for each --batch worker; this runs the worker, not the game
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Alien Invaders")
+    parser.add_argument("--bench-collisions", action="store_true", help="benchmark player-bullet collisions at 50/200/1000 enemies and exit")
+    parser.add_argument("--mute", action="store_true", help="play without sound (also the fallback when there is no audio device)")
+    parser.add_argument("--time-startup", action="store_true", help="print the time from launch to the first presented frame and exit")
+    parser.add_argument("--bench-memory", action="store_true", help="compare bytes per entity and attribute access, slotted vs dict-backed, and exit")
+    parser.add_argument("--max-fps", type=int, default=FPS, metavar="N", help=f"render at most N frames per second, 0 = as fast as possible (default {FPS}); gameplay speed does not change")
+    parser.add_argument("--vsync", action="store_true", help="render at the display's refresh rate instead (falls back to --max-fps where unsupported)")
+    parser.add_argument("--dirty-rects", action="store_true", help="present only changed regions (helps the software renderer on slow machines; the window is not stretched)")
+    parser.add_argument("--render-scale", choices=RENDER_SCALES, default='native', help="internal resolution: half draws a quarter of the pixels, 2x is sharper on big screens (default native)")
+    parser.add_argument("--fullscreen", action="store_true", help="start fullscreen (F11 toggles)")
+    parser.add_argument("--renderer", choices=RENDER_BACKENDS, help="software: Surface blits (default); sdl2: textured quads on an SDL2 renderer, "
+                        "accelerated where available (ignores --dirty-rects). --bench runs both unless one is given")
+    parser.add_argument("--record", metavar="PATH", help="record each run's seed and inputs to a replay file (the latest run is kept)")
+    parser.add_argument("--replay", metavar="PATH", help="play a replay back headlessly, as fast as possible, and verify the end state")
+    parser.add_argument("--replay-profile", action="store_true", help="with --replay: print per-lap sim timings")
+    parser.add_argument("--batch", type=int, metavar="N", help="play N seeded bot games headlessly across a process pool and exit")
+    parser.add_argument("--batch-workers", type=int, metavar="N", help="worker processes for --batch (default: all cores)")
+    parser.add_argument("--batch-out", default="batch.jsonl", metavar="PATH", help="JSON-lines file --batch streams run results to")
+    parser.add_argument("--batch-seed", type=int, default=0, help="first seed for --batch (runs use seed, seed+1, ...)")
+    parser.add_argument("--batch-waves", type=int, default=30, metavar="N", help="stop a --batch run after clearing this wave")
+    parser.add_argument("--bench", action="store_true", help="run the seeded frame-time scenarios headlessly and exit")
+    parser.add_argument("--bench-frames", type=int, default=600, metavar="N", help="timed frames per scenario (default 600)")
+    parser.add_argument("--bench-out", default="bench.json", metavar="PATH", help="where --bench writes its JSON results")
+    parser.add_argument("--bench-scenarios", metavar="NAMES", help="comma-separated subset of: " + ", ".join(BENCH_SCENARIOS))
+    args = parser.parse_args()
+    if args.bench_collisions:
+        bench_collisions()
+    elif args.bench_memory:
+        bench_memory()
+    elif args.batch:
+        batch_run(args.batch, args.batch_workers, args.batch_out, args.batch_seed, args.batch_waves)
+    elif args.replay:
+        sys.exit(0 if play_replay(args.replay, profile=args.replay_profile) else 1)
+    elif args.bench:
+        bench_frames(args.bench_frames, out=args.bench_out, dirty_rects=args.dirty_rects,
+                     scenarios=args.bench_scenarios.split(",") if args.bench_scenarios else None, render_scale=RENDER_SCALES[args.render_scale],
+                     backends=(args.renderer,) if args.renderer else RENDER_BACKENDS)
+    else:
+        main(dirty_rects=args.dirty_rects or DIRTY_RECTS, record=args.record, time_startup=args.time_startup, sound=not args.mute,
+             max_fps=args.max_fps, vsync=args.vsync, render_scale=RENDER_SCALES[args.render_scale], fullscreen=args.fullscreen,
+             backend=args.renderer or 'software')
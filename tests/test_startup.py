@@ -0,0 +1,65 @@
+"""
+Headless checks of the game's main loop: run with `python -m unittest discover tests`
+(or pytest). The game is a single script with spaces in its name, so it is loaded by path.
+"""
+import importlib.util
+import os
+import pathlib
+import tempfile
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+GAME = pathlib.Path(__file__).resolve().parent.parent / "Alien Invaders The Sequel to The Prequel to The Original Sequel Continuation Remastered Enhanced Edition.py"
+
+
+def load_game():
+    spec = importlib.util.spec_from_file_location("alien_invaders", GAME)
+    game = importlib.util.module_from_spec(spec); spec.loader.exec_module(game)
+    return game
+
+
+class FirstEventsTest(unittest.TestCase):
+    def setUp(self):
+        # the game caches its sound bank and font path under XDG_CACHE_HOME; keep them out of ~/.cache
+        self.cache = tempfile.TemporaryDirectory()
+        self.old_cache_home = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = self.cache.name
+
+    def tearDown(self):
+        if self.old_cache_home is None: os.environ.pop("XDG_CACHE_HOME", None)
+        else: os.environ["XDG_CACHE_HOME"] = self.old_cache_home
+        self.cache.cleanup()
+
+    def run_main(self, first_events, polls=40):
+        """Run main() with first_events in the first event batch, then QUIT after `polls` polls."""
+        game = load_game(); calls = []
+        self.assertTrue(game.CACHE_DIR.startswith(self.cache.name))
+        real_get = pygame.event.get
+        def fake_get(*args, **kwargs):
+            calls.append(None); events = list(real_get(*args, **kwargs))
+            if len(calls) == 1: events += first_events
+            if len(calls) >= polls: events.append(pygame.event.Event(pygame.QUIT))
+            return events
+        pygame.event.get = fake_get
+        try:
+            with self.assertRaises(SystemExit): game.main(sound=True)
+        finally:
+            pygame.event.get = real_get; pygame.quit()
+        return len(calls)
+
+    def test_return_in_first_batch_starts_a_run(self):
+        # the run starts before the menu has ever been drawn; ticks must still find a sound engine
+        key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN, mod=0, unicode="\r", scancode=0)
+        self.assertEqual(self.run_main([key]), 40)
+
+    def test_click_in_first_batch_starts_a_run(self):
+        click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(10, 10))
+        self.assertEqual(self.run_main([click]), 40)
+
+
+if __name__ == "__main__":
+    unittest.main()